@@ -1,10 +1,15 @@
 """API routes for Proto-Gen."""
 
-from fastapi import APIRouter, HTTPException, Header, UploadFile, File
-from typing import Optional
+import json
+from fastapi import APIRouter, HTTPException, Header, UploadFile, File, Request, Query
+from fastapi.responses import StreamingResponse, JSONResponse
+from typing import AsyncIterator, Optional
 from app.models.protocol import (
     ProtocolGenerationRequest,
+    BatchProtocolRequest,
     TroubleshootingRequest,
+    TroubleshootingFollowUpRequest,
+    TroubleshootingResponse,
     ProtocolResponse,
     RouteGenRequest,
     RouteGenResponse,
@@ -21,15 +26,60 @@ from app.models.protocol import (
 from app.services.protocol_service import protocol_service
 from app.services.local_ai_service import local_ai_service
 from app.services.llm_service import llm_service
+from app.services.admission import ProviderOverloadedError
+from app.services.job_service import job_service, FINISHED_STATES
+from app.services.vendor_catalog import vendor_catalog
 from app.core.config import settings
 
 router = APIRouter()
 
+# Long generations that can also run as background jobs
+job_service.register("generate", ProtocolGenerationRequest, protocol_service.generate_protocol)
+job_service.register("troubleshoot", TroubleshootingRequest, protocol_service.troubleshoot_protocol)
+job_service.register("routes", RouteGenRequest, protocol_service.generate_routes)
+job_service.register("tools", ToolGenRequest, local_ai_service.generate_tools)
+job_service.register("generate-procurement", ProcurementRequest, protocol_service.generate_procurement)
+
+
+async def _event_stream(events: AsyncIterator[dict], request: Request) -> StreamingResponse:
+    """
+    Serialize service events as Server-Sent Events or NDJSON.
+    
+    Clients that send ``Accept: application/x-ndjson`` get one JSON object
+    per line; everyone else gets SSE frames named after the event type.
+    The first event is awaited before the response starts, so an
+    admission or circuit breaker rejection raised before it becomes a real
+    429/503 with Retry-After rather than an error inside a 200 stream.
+    """
+    ndjson = "application/x-ndjson" in request.headers.get("accept", "")
+    
+    def serialize(event: dict) -> str:
+        if ndjson:
+            return json.dumps(event) + "\n"
+        return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+    
+    try:
+        first = await events.__anext__()
+    except StopAsyncIteration:
+        first = None
+    
+    async def body():
+        if first is not None:
+            yield serialize(first)
+        async for event in events:
+            yield serialize(event)
+    
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson" if ndjson else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint."""
-    # Check if local AI stack is available
+    # Cached state from the background health monitor
     local_ai_health = local_ai_service.get_health_status()
     
     if local_ai_health.get("overall", False):
@@ -47,6 +97,35 @@ async def health_check():
         )
 
 
+@router.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive", "version": settings.app_version}
+
+
+@router.get("/health/ready")
+async def readiness():
+    """
+    Readiness probe: at least one generation backend can take requests.
+    
+    Returns 503 when neither an external LLM provider nor the local AI stack
+    is usable. Includes the cached local component state and probe history.
+    """
+    providers = llm_service.get_available_providers()
+    local_ready = local_ai_service.is_local_mode
+    ready = bool(providers) or local_ready
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "llm_providers": providers,
+            "local_ai_stack": local_ready,
+            "components": local_ai_service.monitor.state()
+        }
+    )
+
+
 @router.post("/generate", response_model=ProtocolResponse)
 async def generate_protocol(request: ProtocolGenerationRequest):
     """
@@ -66,6 +145,8 @@ async def generate_protocol(request: ProtocolGenerationRequest):
         
         return response
     
+    except ProviderOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -89,10 +170,85 @@ async def troubleshoot_protocol(request: TroubleshootingRequest):
         
         return response
     
+    except ProviderOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/troubleshoot/sessions", response_model=TroubleshootingResponse)
+async def start_troubleshooting_session(request: TroubleshootingRequest):
+    """
+    Troubleshoot a failed protocol on the local AI stack and keep the conversation.
+    
+    The response carries a ``session_id`` for follow-up questions. Follow-ups
+    reuse the conversation Ollama has already evaluated, so the original
+    protocol is not processed again.
+    """
+    response = await local_ai_service.troubleshoot_protocol(request)
+    if not response.success:
+        raise HTTPException(status_code=500, detail=response.error)
+    return response
+
+
+@router.post("/troubleshoot/sessions/{session_id}", response_model=TroubleshootingResponse)
+async def follow_up_troubleshooting_session(session_id: str, request: TroubleshootingFollowUpRequest):
+    """Ask a follow-up question in a troubleshooting session."""
+    if not local_ai_service.has_session(session_id):
+        raise HTTPException(status_code=404, detail="Troubleshooting session not found or expired")
+    response = await local_ai_service.troubleshoot_follow_up(session_id, request)
+    if not response.success:
+        raise HTTPException(status_code=500, detail=response.error)
+    return response
+
+
+@router.delete("/troubleshoot/sessions/{session_id}")
+async def end_troubleshooting_session(session_id: str):
+    """End a troubleshooting session and free its history."""
+    if not local_ai_service.end_session(session_id):
+        raise HTTPException(status_code=404, detail="Troubleshooting session not found or expired")
+    return {"success": True, "session_id": session_id}
+
+
+@router.post("/generate/batch")
+async def generate_protocol_batch(request: BatchProtocolRequest, http_request: Request):
+    """
+    Generate several protocols concurrently.
+    
+    Results are streamed as Server-Sent Events (or NDJSON with
+    ``Accept: application/x-ndjson``) in the order they complete. Each
+    ``result`` event carries the index of its request and its own success
+    flag, so one failed protocol does not fail the batch.
+    
+    Args:
+        request: List of protocol generation requests and optional parallelism
+        
+    Returns:
+        Streaming response with start, result and done events
+    """
+    return await _event_stream(
+        protocol_service.generate_protocol_batch(request.requests, request.max_parallel),
+        http_request
+    )
+
+
+@router.post("/generate/stream")
+async def generate_protocol_stream(request: ProtocolGenerationRequest, http_request: Request):
+    """
+    Stream a laboratory protocol token by token.
+    
+    Emits ``start``, ``token``, ``done`` and ``error`` events as SSE, or as
+    NDJSON when requested via the Accept header.
+    """
+    return await _event_stream(protocol_service.generate_protocol_stream(request), http_request)
+
+
+@router.post("/troubleshoot/stream")
+async def troubleshoot_protocol_stream(request: TroubleshootingRequest, http_request: Request):
+    """Stream a troubleshooting analysis token by token."""
+    return await _event_stream(protocol_service.troubleshoot_protocol_stream(request), http_request)
+
+
 @router.get("/techniques")
 async def get_techniques():
     """Get list of supported techniques."""
@@ -129,6 +285,8 @@ async def generate_routes(request: RouteGenRequest):
         
         return response
     
+    except ProviderOverloadedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -160,6 +318,24 @@ async def generate_tools(request: ToolGenRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/routes/stream")
+async def generate_routes_stream(request: RouteGenRequest, http_request: Request):
+    """Stream experimental routes token by token."""
+    return await _event_stream(protocol_service.generate_routes_stream(request), http_request)
+
+
+@router.post("/tools/stream")
+async def generate_tools_stream(request: ToolGenRequest, http_request: Request):
+    """
+    Stream computational tool recommendations token by token.
+    
+    Unlike /tools, which asks the local AI stack for one structured answer,
+    this streams from the cloud LLM provider in ``request.llm_provider``, so
+    it needs that provider's API key and may recommend different tools.
+    """
+    return await _event_stream(protocol_service.generate_tools_stream(request), http_request)
+
+
 @router.get("/providers")
 async def get_providers():
     """Get list of available LLM providers."""
@@ -168,6 +344,58 @@ async def get_providers():
     }
 
 
+@router.get("/providers/router")
+async def get_provider_router_state():
+    """Get the adaptive router's per-provider statistics and recent routing decisions."""
+    return llm_service.router.state()
+
+
+@router.get("/local-ai/models")
+async def get_local_models():
+    """Get load state, residency and latency breakdown of the warm Ollama models."""
+    return await local_ai_service.get_model_status()
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """Get runtime metrics for the LLM pipeline."""
+    return {
+        "llm_cache": await llm_service.cache.stats() if llm_service.cache else {"enabled": False},
+        "admission": llm_service.admission.stats(),
+        "hedging": llm_service.latency.stats(),
+        "circuit_breakers": {
+            provider: breaker.stats() for provider, breaker in llm_service.breakers.items()
+        },
+        "coalescing": {
+            "requests": protocol_service.inflight.stats(),
+            "llm_calls": llm_service.inflight.stats()
+        },
+        "jobs": await job_service.stats(),
+        "ollama_warm_pool": local_ai_service.local_ai.warm_pool.stats(),
+        "ollama_backends": local_ai_service.local_ai.ollama.stats(),
+        "local_prompt_tokens": local_ai_service.local_ai.prompt_token_stats(),
+        "troubleshoot_sessions": local_ai_service.local_ai.sessions.stats(),
+        "vendor_catalog": vendor_catalog.stats(),
+        "web_search_cache": await local_ai_service.local_ai.gemini_search.cache.stats()
+        if local_ai_service.local_ai.gemini_search.cache else {"enabled": False}
+    }
+
+
+def _check_procurement_pipeline(x_processing_agent: Optional[str], x_llm_backend: Optional[str]):
+    """Validate the processing pipeline headers sent with procurement requests."""
+    if x_processing_agent != "ollama":
+        raise HTTPException(
+            status_code=400, 
+            detail="Invalid processing agent. Expected 'ollama'"
+        )
+    
+    if x_llm_backend != "gemini":
+        raise HTTPException(
+            status_code=400, 
+            detail="Invalid LLM backend. Expected 'gemini'"
+        )
+
+
 @router.post("/generate-procurement", response_model=ProcurementResponse)
 async def generate_procurement(
     request: ProcurementRequest,
@@ -192,18 +420,7 @@ async def generate_procurement(
         Structured procurement data with vendor comparisons and cost analysis
     """
     try:
-        # Validate processing pipeline headers
-        if x_processing_agent != "ollama":
-            raise HTTPException(
-                status_code=400, 
-                detail="Invalid processing agent. Expected 'ollama'"
-            )
-        
-        if x_llm_backend != "gemini":
-            raise HTTPException(
-                status_code=400, 
-                detail="Invalid LLM backend. Expected 'gemini'"
-            )
+        _check_procurement_pipeline(x_processing_agent, x_llm_backend)
         
         # Process procurement request through Ollama + Gemini pipeline
         response = await protocol_service.generate_procurement(request)
@@ -222,6 +439,101 @@ async def generate_procurement(
         )
 
 
+@router.post("/generate-procurement/stream")
+async def generate_procurement_stream(
+    request: ProcurementRequest,
+    http_request: Request,
+    x_processing_agent: Optional[str] = Header(None),
+    x_llm_backend: Optional[str] = Header(None)
+):
+    """
+    Stream a procurement analysis one material at a time.
+    
+    Sends a ``material`` event with each material's vendor comparison as soon
+    as it is ready, then a ``summary`` event with the total cost and analysis.
+    """
+    _check_procurement_pipeline(x_processing_agent, x_llm_backend)
+    return await _event_stream(protocol_service.generate_procurement_stream(request), http_request)
+
+
+@router.post("/jobs/generate", status_code=202)
+async def submit_generate_job(request: ProtocolGenerationRequest):
+    """Queue protocol generation as a background job and return its ID."""
+    return await job_service.submit("generate", request)
+
+
+@router.post("/jobs/troubleshoot", status_code=202)
+async def submit_troubleshoot_job(request: TroubleshootingRequest):
+    """Queue a troubleshooting analysis as a background job and return its ID."""
+    return await job_service.submit("troubleshoot", request)
+
+
+@router.post("/jobs/routes", status_code=202)
+async def submit_routes_job(request: RouteGenRequest):
+    """Queue route generation as a background job and return its ID."""
+    return await job_service.submit("routes", request)
+
+
+@router.post("/jobs/tools", status_code=202)
+async def submit_tools_job(request: ToolGenRequest):
+    """Queue tool recommendations as a background job and return its ID."""
+    return await job_service.submit("tools", request)
+
+
+@router.post("/jobs/generate-procurement", status_code=202)
+async def submit_procurement_job(
+    request: ProcurementRequest,
+    x_processing_agent: Optional[str] = Header(None),
+    x_llm_backend: Optional[str] = Header(None)
+):
+    """Queue a procurement analysis as a background job and return its ID."""
+    _check_procurement_pipeline(x_processing_agent, x_llm_backend)
+    return await job_service.submit("generate-procurement", request)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=60)):
+    """
+    Get a job's status and, once finished, its result.
+    
+    Args:
+        job_id: ID returned when the job was submitted
+        wait: Seconds to long-poll for the job to finish before answering
+    """
+    job = await job_service.get(job_id, wait=wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.get("/jobs/{job_id}/events")
+async def subscribe_job(job_id: str, http_request: Request):
+    """
+    Subscribe to a job's completion.
+    
+    Streams a ``status`` event straight away and a ``done`` event with the
+    result when the job finishes, as Server-Sent Events or NDJSON. An
+    ``error`` event ends the stream if the job is deleted meanwhile.
+    """
+    job = await job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    async def events():
+        current = job
+        yield {"event": "status", **current}
+        while current["status"] not in FINISHED_STATES:
+            current = await job_service.get(job_id, wait=15)
+            if current is None:
+                yield {"event": "error", "error": f"Job {job_id} no longer exists"}
+                return
+            if current["status"] not in FINISHED_STATES:
+                yield {"event": "status", **current}
+        yield {"event": "done", **current}
+    
+    return await _event_stream(events(), http_request)
+
+
 @router.post("/upload-inventory", response_model=InventoryUploadResponse)
 async def upload_inventory(file: UploadFile = File(...)):
     """
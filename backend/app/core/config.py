@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Union
+from typing import Dict, List, Union
 from pydantic import field_validator
 
 
@@ -19,6 +19,108 @@ class Settings(BaseSettings):
     # CORS Settings
     cors_origins: Union[list[str], str] = "http://localhost:5173,http://localhost:3000"
     
+    # Local Ollama Provider
+    ollama_enabled: bool = False
+    ollama_url: str = "http://localhost:11434"
+    ollama_model: str = "llama3.1:8b"
+    ollama_connect_timeout: float = 10.0
+    ollama_read_timeout: float = 300.0
+    ollama_max_connections: int = 10
+    ollama_num_parallel: int = 0  # 0 = read OLLAMA_NUM_PARALLEL, else 4
+    
+    # Ollama Backends (local stack load balancing; empty = ollama_url only)
+    ollama_urls: Union[List[str], str] = []  # Comma-separated or JSON list
+    ollama_eject_failures: int = 3
+    ollama_eject_seconds: float = 30.0
+    
+    # Ollama Warm Pool (models preloaded at startup and kept resident)
+    ollama_warm_enabled: bool = True
+    ollama_warm_models: List[str] = []
+    ollama_keep_alive: str = "30m"
+    ollama_warm_interval: float = 60.0
+    
+    # Local AI Prompt Context (token budget for web research added to prompts)
+    ollama_context_window: int = 4096
+    context_token_budget: int = 600
+    context_snippet_tokens: int = 160
+    response_reserve_tokens: int = 1536
+    
+    # Local AI Troubleshooting Sessions (chat history kept for follow-ups)
+    troubleshoot_session_idle_seconds: float = 1800.0
+    troubleshoot_session_max_bytes: int = 20_000_000
+    
+    # Local AI Health Monitor
+    health_probe_interval: float = 15.0
+    health_probe_timeout: float = 3.0
+    health_probe_max_backoff: float = 120.0
+    
+    # Local AI Web Search (Gemini grounding used by the local stack)
+    web_search_deadline: float = 20.0
+    web_search_cache_path: str = "search_cache.sqlite3"
+    web_search_cache_ttl: int = 86400
+    web_search_cache_max_entries: int = 2000
+    
+    # Vendor Catalog (local supplier data for procurement; empty seed = bundled CSV)
+    vendor_catalog_path: str = "vendor_catalog.sqlite3"
+    vendor_catalog_seed_path: str = ""
+    
+    # Procurement Optimizer (vendor assignment under budget_limit)
+    procurement_shipment_cost: float = 15.0  # Charged per vendor shipped from, in dollars
+    procurement_exact_max_subsets: int = 1024  # Vendor subsets searched exactly before switching to the heuristic
+    
+    # LLM Client Settings
+    llm_request_timeout: float = 120.0
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 20
+    
+    # LLM Admission Control (defaults apply to every provider; override per
+    # provider with e.g. LLM_PROVIDER_LIMITS='{"gemini": {"requests_per_minute": 15}}')
+    llm_max_concurrency: int = 8
+    llm_requests_per_minute: int = 60
+    llm_tokens_per_minute: int = 400000
+    llm_queue_size: int = 32
+    llm_queue_timeout: float = 30.0
+    llm_provider_limits: Dict[str, Dict[str, Union[int, float]]] = {}
+    
+    # Hedged Requests (send a backup request to a second provider when the
+    # first is slower than its learned latency percentile)
+    llm_hedging_enabled: bool = False
+    llm_hedge_percentile: float = 0.95
+    llm_hedge_min_delay: float = 2.0
+    llm_hedge_default_delay: float = 20.0
+    llm_hedge_min_samples: int = 20
+    
+    # Adaptive Provider Routing
+    llm_router_ewma_alpha: float = 0.2
+    llm_router_unhealthy_error_rate: float = 0.5
+    llm_router_prior_latency: float = 15.0
+    llm_router_recovery_seconds: float = 60.0
+    
+    # Retries and Circuit Breakers
+    llm_retry_max_attempts: int = 3
+    llm_retry_base_delay: float = 0.5
+    llm_retry_max_delay: float = 8.0
+    llm_retry_deadline: float = 180.0
+    llm_breaker_failure_threshold: int = 5
+    llm_breaker_reset_timeout: float = 30.0
+    
+    # Batch Generation
+    batch_max_parallel: int = 4
+    
+    # Background Jobs (SQLite job table + in-process worker pool)
+    job_store_path: str = "jobs.sqlite3"
+    job_workers: int = 4
+    job_max_attempts: int = 3
+    job_retention_seconds: int = 604800
+    job_lease_seconds: float = 60.0  # Running jobs not renewed for this long are re-queued
+    
+    # LLM Response Cache
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = "llm_cache.sqlite3"
+    llm_cache_ttl_seconds: int = 86400
+    llm_cache_max_entries: int = 256
+    llm_cache_max_disk_entries: int = 5000
+    
     # Application Settings
     app_name: str = "Proto-Gen API"
     app_version: str = "1.0.0"
@@ -35,6 +137,13 @@ class Settings(BaseSettings):
         if isinstance(v, str):
             return [origin.strip() for origin in v.split(',')]
         return v
+    
+    @field_validator('ollama_urls', mode='after')
+    @classmethod
+    def parse_ollama_urls(cls, v):
+        if isinstance(v, str):
+            return [url.strip() for url in v.split(',') if url.strip()]
+        return v
 
 
 settings = Settings()
@@ -23,6 +23,7 @@ class LLMProvider(str, Enum):
     OPENAI = "openai"
     ANTHROPIC = "anthropic"
     GEMINI = "gemini"
+    OLLAMA = "ollama"
 
 
 class ProtocolGenerationRequest(BaseModel):
@@ -72,6 +73,27 @@ class ProtocolGenerationRequest(BaseModel):
         LLMProvider.GEMINI,
         description="LLM provider to use for generation"
     )
+    bypass_cache: bool = Field(
+        False,
+        description="Skip cached responses and force a fresh generation"
+    )
+
+
+class BatchProtocolRequest(BaseModel):
+    """Request model for generating several protocols at once."""
+    
+    requests: List[ProtocolGenerationRequest] = Field(
+        ...,
+        description="Protocols to generate, e.g. every step of a cloning project",
+        min_length=1,
+        max_length=20
+    )
+    max_parallel: Optional[int] = Field(
+        None,
+        description="Maximum protocols generated at the same time (default: BATCH_MAX_PARALLEL)",
+        ge=1,
+        le=20
+    )
 
 
 class TroubleshootingRequest(BaseModel):
@@ -99,6 +121,10 @@ class TroubleshootingRequest(BaseModel):
         LLMProvider.GEMINI,
         description="LLM provider to use for troubleshooting"
     )
+    bypass_cache: bool = Field(
+        False,
+        description="Skip cached responses and force a fresh generation"
+    )
 
 
 class ProtocolResponse(BaseModel):
@@ -110,12 +136,23 @@ class ProtocolResponse(BaseModel):
     error: Optional[str] = Field(None, description="Error message if request failed")
 
 
+class TroubleshootingFollowUpRequest(BaseModel):
+    """Request model for a follow-up question in a troubleshooting session."""
+    
+    question: str = Field(
+        ...,
+        description="Follow-up question about the analysis so far",
+        min_length=3
+    )
+
+
 class TroubleshootingResponse(BaseModel):
     """Response model for protocol troubleshooting."""
     
     success: bool = Field(..., description="Whether the request was successful")
     analysis: str = Field(..., description="The troubleshooting analysis in Markdown format")
     provider_used: str = Field(..., description="The LLM provider that was used")
+    session_id: Optional[str] = Field(None, description="Session to send follow-up questions to")
     error: Optional[str] = Field(None, description="Error message if request failed")
 
 
@@ -145,6 +182,10 @@ class RouteGenRequest(BaseModel):
         LLMProvider.GEMINI,
         description="LLM provider to use for route generation"
     )
+    bypass_cache: bool = Field(
+        False,
+        description="Skip cached responses and force a fresh generation"
+    )
 
 
 class RouteGenResponse(BaseModel):
@@ -182,6 +223,10 @@ class ToolGenRequest(BaseModel):
         LLMProvider.GEMINI,
         description="LLM provider to use for tool recommendations"
     )
+    bypass_cache: bool = Field(
+        False,
+        description="Skip cached responses and force a fresh generation"
+    )
 
 
 class ToolGenResponse(BaseModel):
@@ -0,0 +1,196 @@
+"""Per-provider admission control for LLM requests."""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+
+class ProviderOverloadedError(Exception):
+    """Raised when a provider cannot accept more work right now."""
+
+    def __init__(self, provider: str, status_code: int, retry_after: float, reason: str):
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+        super().__init__(
+            f"Provider '{provider}' is overloaded ({reason}). "
+            f"Retry after {self.retry_after}s."
+        )
+
+
+class RateBudget:
+    """Token bucket refilled continuously up to a per-minute limit."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until `amount` can be spent (0 if it can be spent now)."""
+        self._refill()
+        # Requests larger than the whole bucket are allowed once it is full
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def spend(self, amount: float):
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+
+class ProviderScheduler:
+    """
+    Admission control for a single provider.
+
+    Limits in-flight requests with a semaphore and spends requests-per-minute
+    and tokens-per-minute budgets. Callers that cannot start immediately wait
+    in a bounded queue until a deadline; when the queue is full they are
+    rejected straight away so clients can back off instead of hanging.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_queue: int,
+        queue_timeout: float
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.requests = RateBudget(requests_per_minute)
+        self.tokens = RateBudget(tokens_per_minute)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._in_flight = 0
+        self._wait_times = deque(maxlen=500)
+        self._service_times = deque(maxlen=100)
+        self._counters = {"admitted": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+
+    @asynccontextmanager
+    async def admit(self, tokens: int) -> AsyncIterator[None]:
+        """Wait for a slot and budget, then hold the slot for the request."""
+        queued_at = time.monotonic()
+        if not await self._try_acquire_now(tokens):
+            if self._waiting >= self.max_queue:
+                self._counters["rejected_queue_full"] += 1
+                raise ProviderOverloadedError(
+                    self.provider, 429, self._estimated_wait(), "queue full"
+                )
+
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._acquire(tokens), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._counters["rejected_timeout"] += 1
+                raise ProviderOverloadedError(
+                    self.provider, 503, self._estimated_wait(), "queue deadline exceeded"
+                )
+            finally:
+                self._waiting -= 1
+
+        started_at = time.monotonic()
+        self._wait_times.append(started_at - queued_at)
+        self._counters["admitted"] += 1
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._service_times.append(time.monotonic() - started_at)
+            self._semaphore.release()
+
+    async def _try_acquire_now(self, tokens: int) -> bool:
+        """Start immediately when nobody is queued and a slot and budget are free."""
+        if self._waiting or self._semaphore.locked():
+            return False
+        if self.requests.delay_for(1) or self.tokens.delay_for(tokens):
+            return False
+        # Acquiring an unlocked semaphore returns without suspending
+        await self._semaphore.acquire()
+        self.requests.spend(1)
+        self.tokens.spend(tokens)
+        return True
+
+    async def _acquire(self, tokens: int):
+        """Take a concurrency slot, then wait until both budgets allow the request."""
+        await self._semaphore.acquire()
+        try:
+            while True:
+                delay = max(self.requests.delay_for(1), self.tokens.delay_for(tokens))
+                if delay == 0:
+                    self.requests.spend(1)
+                    self.tokens.spend(tokens)
+                    return
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    def _estimated_wait(self) -> float:
+        """Rough time until a queued request would start."""
+        if self._service_times:
+            avg_service = sum(self._service_times) / len(self._service_times)
+        else:
+            avg_service = 1.0
+        return avg_service * (self._waiting + 1) / self.max_concurrency
+
+    def stats(self) -> dict:
+        """Queue depth, in-flight count and wait-time statistics."""
+        waits = sorted(self._wait_times)
+        return {
+            **self._counters,
+            "queue_depth": self._waiting,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))], 4) if waits else 0.0,
+                "max": round(waits[-1], 4) if waits else 0.0
+            },
+            "requests_budget_available": round(self.requests.available, 2),
+            "tokens_budget_available": round(self.tokens.available, 2)
+        }
+
+
+class AdmissionController:
+    """Holds one ProviderScheduler per provider, created on first use."""
+
+    def __init__(self, defaults: dict, overrides: Optional[Dict[str, dict]] = None):
+        self.defaults = defaults
+        self.overrides = overrides or {}
+        self._schedulers: Dict[str, ProviderScheduler] = {}
+
+    def scheduler(self, provider: str) -> ProviderScheduler:
+        if provider not in self._schedulers:
+            limits = {**self.defaults, **self.overrides.get(provider, {})}
+            self._schedulers[provider] = ProviderScheduler(provider, **limits)
+        return self._schedulers[provider]
+
+    def admit(self, provider: str, tokens: int):
+        """Async context manager that admits one request to `provider`."""
+        return self.scheduler(provider).admit(tokens)
+
+    def stats(self) -> dict:
+        return {name: scheduler.stats() for name, scheduler in self._schedulers.items()}
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Cheap token estimate (about four characters per token)."""
+    return sum(len(text) for text in texts) // 4
@@ -0,0 +1,138 @@
+"""Background health probing for external components."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Probe = Callable[[], Awaitable[bool]]
+ChangeListener = Callable[[str, bool], None]
+
+
+class ComponentHealth:
+    """Cached probe state and recent probe history for one component."""
+
+    def __init__(self, history: int = 50):
+        self.up = False
+        self.last_checked: Optional[float] = None
+        self.last_change: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self.next_probe_in = 0.0
+        self.history = deque(maxlen=history)
+
+    def record(self, ok: bool, latency: float, error: Optional[str]) -> bool:
+        """Store a probe result; return True if the up/down state changed."""
+        now = time.time()
+        changed = ok != self.up or self.last_checked is None
+        if changed:
+            self.last_change = now
+        self.up = ok
+        self.last_checked = now
+        self.last_error = error
+        self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+        self.history.append({
+            "time": now,
+            "ok": ok,
+            "latency_ms": round(latency * 1000, 1),
+            "error": error
+        })
+        return changed
+
+    def as_dict(self, history: bool = True) -> dict:
+        latencies = sorted(entry["latency_ms"] for entry in self.history)
+        result = {
+            "up": self.up,
+            "last_checked": self.last_checked,
+            "last_change": self.last_change,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "next_probe_in_seconds": round(self.next_probe_in, 1),
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies), 1) if latencies else None,
+                "p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None
+            }
+        }
+        if history:
+            result["history"] = list(self.history)
+        return result
+
+
+class HealthMonitor:
+    """
+    Probes components in the background and caches their state.
+
+    Each component is probed every `interval` seconds while it is up. While
+    it is down the delay doubles after every failed probe, up to
+    `max_backoff`, so an absent service is not polled constantly; the first
+    successful probe resets it. Listeners are told about every up/down
+    transition.
+    """
+
+    def __init__(
+        self,
+        probes: Dict[str, Probe],
+        interval: float = 15.0,
+        timeout: float = 3.0,
+        max_backoff: float = 120.0
+    ):
+        self.probes = probes
+        self.interval = interval
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.components = {name: ComponentHealth() for name in probes}
+        self.listeners: List[ChangeListener] = []
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Probe every component once, then keep probing in the background."""
+        await asyncio.gather(*(self.probe(name) for name in self.probes))
+        self._tasks = [
+            asyncio.create_task(self._run(name)) for name in self.probes
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def probe(self, name: str) -> bool:
+        """Run one probe now and update the cached state."""
+        started = time.monotonic()
+        error = None
+        try:
+            ok = bool(await asyncio.wait_for(self.probes[name](), timeout=self.timeout))
+        except asyncio.TimeoutError:
+            ok, error = False, f"probe timed out after {self.timeout}s"
+        except Exception as e:
+            ok, error = False, str(e) or type(e).__name__
+
+        component = self.components[name]
+        if component.record(ok, time.monotonic() - started, error):
+            logger.info(f"{name} is now {'up' if ok else 'down'}")
+            for listener in self.listeners:
+                listener(name, ok)
+        return ok
+
+    async def _run(self, name: str):
+        component = self.components[name]
+        while True:
+            if component.up:
+                component.next_probe_in = self.interval
+            else:
+                component.next_probe_in = min(
+                    self.max_backoff,
+                    self.interval * 2 ** max(component.consecutive_failures - 1, 0)
+                )
+            await asyncio.sleep(component.next_probe_in)
+            await self.probe(name)
+
+    def is_up(self, name: str) -> bool:
+        return self.components[name].up
+
+    def state(self, history: bool = True) -> dict:
+        return {name: c.as_dict(history) for name, c in self.components.items()}
@@ -0,0 +1,75 @@
+"""Latency tracking and hedge-delay tuning for LLM providers."""
+
+from collections import deque
+from typing import Dict, Optional
+
+
+class LatencyTracker:
+    """
+    Rolling window of observed response latencies per provider.
+
+    The hedge delay for a provider is a high percentile of its recent
+    latencies, so a hedge is only sent for requests that are already slower
+    than almost all of that provider's normal responses.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_delay: float = 2.0,
+        default_delay: float = 20.0,
+        min_samples: int = 20,
+        window: int = 200
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.min_samples = min_samples
+        self.window = window
+        self._latencies: Dict[str, deque] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def record(self, provider: str, seconds: float):
+        """Record the latency of a successful response."""
+        self._latencies.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+
+    def quantile(self, provider: str, q: float) -> Optional[float]:
+        """Return the q-quantile of recent latencies, or None without data."""
+        samples = sorted(self._latencies.get(provider, ()))
+        if not samples:
+            return None
+        return round(samples[min(len(samples) - 1, int(q * len(samples)))], 3)
+
+    def hedge_delay(self, provider: str) -> float:
+        """Seconds to wait on `provider` before sending a hedge."""
+        if len(self._latencies.get(provider, ())) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, self.quantile(provider, self.percentile))
+
+    def count(self, provider: str, outcome: str):
+        """Increment a hedging counter (requests, hedged, hedge_wins, primary_wins)."""
+        counters = self._counters.setdefault(
+            provider, {"requests": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0}
+        )
+        counters[outcome] += 1
+
+    def stats(self) -> dict:
+        """Latency percentiles, current hedge delay, hedge rate and win rate per provider."""
+        result = {}
+        for provider in set(self._latencies) | set(self._counters):
+            counters = self._counters.get(
+                provider, {"requests": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0}
+            )
+            result[provider] = {
+                **counters,
+                "hedge_rate": round(counters["hedged"] / counters["requests"], 4)
+                if counters["requests"] else 0.0,
+                "hedge_win_rate": round(counters["hedge_wins"] / counters["hedged"], 4)
+                if counters["hedged"] else 0.0,
+                "samples": len(self._latencies.get(provider, ())),
+                "p50_seconds": self.quantile(provider, 0.5),
+                "p95_seconds": self.quantile(provider, 0.95),
+                "p99_seconds": self.quantile(provider, 0.99),
+                "hedge_delay_seconds": self.hedge_delay(provider)
+            }
+        return result
@@ -0,0 +1,424 @@
+"""Background jobs for long-running generations."""
+
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.services.admission import ProviderOverloadedError
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+class JobStore:
+    """SQLite table of jobs; the source of truth that survives restarts."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection and commit on exit."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    owner TEXT,
+                    heartbeat_at REAL
+                )
+                """
+            )
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+
+    def insert(self, job_id: str, job_type: str, payload: dict, now: float):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, type, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, job_type, QUEUED, json.dumps(payload), now)
+            )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def claim(self, job_id: str, owner: str, now: float) -> Optional[dict]:
+        """Mark a queued job as running under `owner`; None if another worker already took it."""
+        with self._connect() as conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1, "
+                "owner = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, now, owner, now, job_id, QUEUED)
+            ).rowcount
+            if not claimed:
+                return None
+            return dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def finish(self, job_id: str, status: str, result: Optional[dict], error: Optional[str], now: float):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, now, job_id)
+            )
+
+    def requeue(self, job_id: str, error: Optional[str] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, error = ?, owner = NULL, "
+                "heartbeat_at = NULL WHERE id = ?",
+                (QUEUED, error, job_id)
+            )
+
+    def heartbeat(self, owner: str, now: float):
+        """Renew the lease on every job `owner` is running."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = ?",
+                (now, owner, RUNNING)
+            )
+
+    def release(self, owner: str):
+        """Re-queue the running jobs of an owner that is shutting down."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, owner = NULL, heartbeat_at = NULL "
+                "WHERE owner = ? AND status = ?",
+                (QUEUED, owner, RUNNING)
+            )
+
+    def expire(self, stale_before: float) -> List[str]:
+        """Re-queue running jobs whose owner stopped renewing its lease; return their IDs."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?) "
+                "ORDER BY created_at",
+                (RUNNING, stale_before)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = ?, started_at = NULL, owner = NULL, heartbeat_at = NULL "
+                "WHERE id = ? AND status = ?",
+                [(QUEUED, row["id"], RUNNING) for row in rows]
+            )
+        return [row["id"] for row in rows]
+
+    def recover(self, stale_before: float) -> List[str]:
+        """
+        Re-queue jobs whose lease expired and return every queued job ID.
+
+        Jobs still leased by another live process sharing the file are left
+        alone, so they do not run twice.
+        """
+        self.expire(stale_before)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs that finished before `older_than`."""
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (*FINISHED_STATES, older_than)
+            ).rowcount
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT type, status, COUNT(*) AS n FROM jobs GROUP BY type, status"
+            ).fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            counts.setdefault(row["type"], {})[row["status"]] = row["n"]
+        return counts
+
+
+class JobTypeStats:
+    """Queue-time, run-time and outcome counters for one job type."""
+
+    def __init__(self, window: int = 500):
+        self.queue_times = deque(maxlen=window)
+        self.run_times = deque(maxlen=window)
+        self.counters = {"submitted": 0, "succeeded": 0, "failed": 0, "retried": 0}
+
+    @staticmethod
+    def _summary(samples) -> dict:
+        values = sorted(samples)
+        return {
+            "avg": round(sum(values) / len(values), 3) if values else 0.0,
+            "p95": round(values[int(0.95 * (len(values) - 1))], 3) if values else 0.0,
+            "max": round(values[-1], 3) if values else 0.0
+        }
+
+    def as_dict(self) -> dict:
+        finished = self.counters["succeeded"] + self.counters["failed"]
+        return {
+            **self.counters,
+            "failure_rate": round(self.counters["failed"] / finished, 4) if finished else 0.0,
+            "queue_seconds": self._summary(self.queue_times),
+            "run_seconds": self._summary(self.run_times)
+        }
+
+
+Handler = Callable[[BaseModel], Awaitable[BaseModel]]
+
+
+class JobService:
+    """
+    Runs long generations outside the HTTP request.
+
+    Submitting a job stores it in SQLite and returns its ID at once; a pool
+    of in-process workers picks jobs up from an asyncio queue. Running jobs
+    hold a lease that this process renews every `lease_seconds / 3`; jobs
+    whose lease expired, because the process that ran them stopped, are
+    queued again, so several processes can share one job file.
+    Handlers return the same response models as the synchronous endpoints,
+    and a response with ``success=False`` marks the job as failed.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        workers: int = 4,
+        max_attempts: int = 3,
+        retention_seconds: float = 7 * 86400,
+        lease_seconds: float = 60.0
+    ):
+        self.store = JobStore(path)
+        self.owner = uuid.uuid4().hex
+        self.lease_seconds = lease_seconds
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self._handlers: Dict[str, Tuple[Type[BaseModel], Handler]] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats: Dict[str, JobTypeStats] = {}
+
+    def register(self, job_type: str, request_model: Type[BaseModel], handler: Handler):
+        """Register the request model and coroutine that run a job type."""
+        self._handlers[job_type] = (request_model, handler)
+
+    def _type_stats(self, job_type: str) -> JobTypeStats:
+        if job_type not in self._stats:
+            self._stats[job_type] = JobTypeStats()
+        return self._stats[job_type]
+
+    async def start(self):
+        """Recover unfinished jobs and start the worker pool."""
+        self._queue = asyncio.Queue()
+        await asyncio.to_thread(self.store.purge, time.time() - self.retention_seconds)
+        recovered = await asyncio.to_thread(self.store.recover, time.time() - self.lease_seconds)
+        for job_id in recovered:
+            self._queue.put_nowait(job_id)
+        if recovered:
+            print(f"Re-queued {len(recovered)} unfinished job(s)")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain_leases()))
+
+    async def stop(self):
+        """Stop the workers and hand the jobs they were running back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self.store.release, self.owner)
+
+    async def submit(self, job_type: str, request: BaseModel) -> dict:
+        """Store a new job and queue it for a worker."""
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if self._queue is None:
+            raise RuntimeError("Job workers are not running")
+
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(
+            self.store.insert, job_id, job_type, request.model_dump(mode="json"), time.time()
+        )
+        self._type_stats(job_type).counters["submitted"] += 1
+        self._queue.put_nowait(job_id)
+        return await self.get(job_id)
+
+    async def get(self, job_id: str, wait: float = 0) -> Optional[dict]:
+        """
+        Return a job's public view.
+
+        Args:
+            job_id: Job ID returned by submit()
+            wait: Seconds to wait for the job to finish before answering
+        """
+        if wait <= 0:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            return self._public(job) if job is not None else None
+
+        # Register before reading so a job finishing in between still wakes us
+        event = self._finished.setdefault(job_id, asyncio.Event())
+        self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+        try:
+            job = await asyncio.to_thread(self.store.get, job_id)
+            if job is None or job["status"] in FINISHED_STATES:
+                return self._public(job) if job is not None else None
+
+            try:
+                await asyncio.wait_for(event.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            # The row may have been purged meanwhile, e.g. by another process
+            job = await asyncio.to_thread(self.store.get, job_id)
+            return self._public(job) if job is not None else None
+        finally:
+            # The last waiter drops the event, so unknown or finished IDs leave nothing behind
+            self._waiters[job_id] -= 1
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
+                if self._finished.get(job_id) is event:
+                    del self._finished[job_id]
+
+    async def _maintain_leases(self):
+        """Renew this process's leases and pick up jobs whose lease expired elsewhere."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                now = time.time()
+                await asyncio.to_thread(self.store.heartbeat, self.owner, now)
+                for job_id in await asyncio.to_thread(self.store.expire, now - self.lease_seconds):
+                    print(f"Re-queued job {job_id} after its lease expired")
+                    self._queue.put_nowait(job_id)
+            except Exception as e:
+                print(f"Job lease maintenance failed: {e}")
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"Job worker error for {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        started = time.time()
+        job = await asyncio.to_thread(self.store.claim, job_id, self.owner, started)
+        if job is None:
+            return
+
+        job_type = job["type"]
+        stats = self._type_stats(job_type)
+        stats.queue_times.append(started - job["created_at"])
+
+        status, result, error = FAILED, None, None
+        registered = self._handlers.get(job_type)
+        if registered is None:
+            error = f"Unknown job type: {job_type}"
+        else:
+            request_model, handler = registered
+            try:
+                response = await handler(request_model(**json.loads(job["payload"])))
+                result = response.model_dump(mode="json")
+                status = SUCCEEDED if result.get("success", True) else FAILED
+                error = result.get("error")
+            except ProviderOverloadedError as e:
+                if job["attempts"] < self.max_attempts:
+                    # Back off as the provider asked, then give the job another turn
+                    stats.counters["retried"] += 1
+                    await asyncio.to_thread(self.store.requeue, job_id, str(e))
+                    asyncio.get_running_loop().call_later(
+                        e.retry_after, self._queue.put_nowait, job_id
+                    )
+                    return
+                error = str(e)
+            except Exception as e:
+                error = str(e)
+
+        finished = time.time()
+        await asyncio.to_thread(self.store.finish, job_id, status, result, error, finished)
+        stats.run_times.append(finished - started)
+        stats.counters[status] += 1
+
+        event = self._finished.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    @staticmethod
+    def _public(job: dict) -> dict:
+        """Job fields returned to clients."""
+        started, finished = job["started_at"], job["finished_at"]
+        return {
+            "job_id": job["id"],
+            "type": job["type"],
+            "status": job["status"],
+            "result": json.loads(job["result"]) if job["result"] else None,
+            "error": job["error"],
+            "attempts": job["attempts"],
+            "created_at": job["created_at"],
+            "started_at": started,
+            "finished_at": finished,
+            "queue_seconds": round(started - job["created_at"], 3) if started else None,
+            "run_seconds": round(finished - started, 3) if started and finished else None
+        }
+
+    async def stats(self) -> dict:
+        """Per-type job metrics plus current queue depth."""
+        counts = await asyncio.to_thread(self.store.counts)
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "types": {
+                job_type: {
+                    **self._type_stats(job_type).as_dict(),
+                    "queued": counts.get(job_type, {}).get(QUEUED, 0),
+                    "running": counts.get(job_type, {}).get(RUNNING, 0)
+                }
+                for job_type in sorted(set(self._handlers) | set(counts))
+            }
+        }
+
+
+job_service = JobService(
+    path=settings.job_store_path,
+    workers=settings.job_workers,
+    max_attempts=settings.job_max_attempts,
+    retention_seconds=settings.job_retention_seconds,
+    lease_seconds=settings.job_lease_seconds
+)
@@ -1,38 +1,124 @@
 """Service for interacting with LLM providers."""
 
+import asyncio
+import json
+import time
+import httpx
 import openai
 import anthropic
 import google.generativeai as genai
-from typing import Optional, Tuple
+from typing import AsyncIterator, Optional, Tuple
 from app.core.config import settings
 from app.models.protocol import LLMProvider
+from app.services.response_cache import ResponseCache
+from app.services.singleflight import SingleFlight
+from app.services.admission import AdmissionController, estimate_tokens
+from app.services.hedging import LatencyTracker
+from app.services.provider_router import ProviderRouter
+from app.services.admission import ProviderOverloadedError
+from app.services.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ProviderError,
+    is_provider_failure,
+    retry_with_backoff
+)
 
 
 class LLMService:
     """Service for generating text using various LLM providers."""
     
+    # Models used by generate() and generate_stream() for each provider
+    DEFAULT_MODELS = {
+        LLMProvider.OPENAI: "gpt-4-turbo-preview",
+        LLMProvider.ANTHROPIC: "claude-3-sonnet-20240229",
+        LLMProvider.GEMINI: "models/gemini-2.5-flash",
+    }
+    
     def __init__(self):
         """Initialize LLM clients."""
         self.openai_client = None
         self.anthropic_client = None
         self.gemini_client = None
         
+        # Response cache in front of generate()
+        self.cache = None
+        if settings.llm_cache_enabled:
+            self.cache = ResponseCache(
+                path=settings.llm_cache_path,
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+                max_entries=settings.llm_cache_max_entries,
+                max_disk_entries=settings.llm_cache_max_disk_entries
+            )
+        
+        # Per-provider concurrency, rate budgets and bounded queueing
+        self.admission = AdmissionController(
+            defaults={
+                "max_concurrency": settings.llm_max_concurrency,
+                "requests_per_minute": settings.llm_requests_per_minute,
+                "tokens_per_minute": settings.llm_tokens_per_minute,
+                "max_queue": settings.llm_queue_size,
+                "queue_timeout": settings.llm_queue_timeout
+            },
+            overrides=settings.llm_provider_limits
+        )
+        
+        # Observed latencies drive the hedge delay for each provider
+        self.latency = LatencyTracker(
+            percentile=settings.llm_hedge_percentile,
+            min_delay=settings.llm_hedge_min_delay,
+            default_delay=settings.llm_hedge_default_delay,
+            min_samples=settings.llm_hedge_min_samples
+        )
+        
+        # Rolling health and speed statistics used to pick fallback providers
+        self.router = ProviderRouter(
+            alpha=settings.llm_router_ewma_alpha,
+            unhealthy_error_rate=settings.llm_router_unhealthy_error_rate,
+            prior_latency=settings.llm_router_prior_latency,
+            recovery_seconds=settings.llm_router_recovery_seconds
+        )
+        
+        # One circuit breaker per provider, created on first use
+        self.breakers: dict[str, CircuitBreaker] = {}
+        
+        # Identical requests already in flight share one upstream call
+        self.inflight = SingleFlight()
+        
+        # One pooled HTTP client shared by the OpenAI and Anthropic SDKs so
+        # concurrent generations reuse keep-alive connections
+        self.http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.llm_request_timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections
+            )
+        )
+        
         # Initialize OpenAI client if API key is available
         if settings.openai_api_key:
-            openai.api_key = settings.openai_api_key
-            self.openai_client = openai
+            self.openai_client = openai.AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                http_client=self.http_client
+            )
         
         # Initialize Anthropic client if API key is available
         if settings.anthropic_api_key:
-            self.anthropic_client = anthropic.Anthropic(
-                api_key=settings.anthropic_api_key
+            self.anthropic_client = anthropic.AsyncAnthropic(
+                api_key=settings.anthropic_api_key,
+                http_client=self.http_client
             )
         
-        # Initialize Gemini client if API key is available
+        # Initialize Gemini client if API key is available. The SDK's async
+        # client keeps a single gRPC channel open for all requests.
         if settings.gemini_api_key:
             genai.configure(api_key=settings.gemini_api_key)
             self.gemini_client = genai
     
+    async def aclose(self):
+        """Close pooled HTTP connections."""
+        await self.http_client.aclose()
+    
     def is_provider_available(self, provider: LLMProvider) -> bool:
         """Check if a specific provider is available."""
         if provider == LLMProvider.OPENAI:
@@ -41,6 +127,8 @@ class LLMService:
             return self.anthropic_client is not None and bool(settings.anthropic_api_key)
         elif provider == LLMProvider.GEMINI:
             return self.gemini_client is not None and bool(settings.gemini_api_key)
+        elif provider == LLMProvider.OLLAMA:
+            return settings.ollama_enabled and bool(settings.ollama_url)
         return False
     
     def get_available_providers(self) -> list[str]:
@@ -52,8 +140,54 @@ class LLMService:
             providers.append("openai")
         if self.is_provider_available(LLMProvider.ANTHROPIC):
             providers.append("anthropic")
+        if self.is_provider_available(LLMProvider.OLLAMA):
+            providers.append("ollama")
         return providers
     
+    def breaker(self, provider: str) -> CircuitBreaker:
+        """Return the circuit breaker for a provider."""
+        if provider not in self.breakers:
+            self.breakers[provider] = CircuitBreaker(
+                failure_threshold=settings.llm_breaker_failure_threshold,
+                reset_timeout=settings.llm_breaker_reset_timeout
+            )
+        return self.breakers[provider]
+    
+    def resolve_provider(self, provider: LLMProvider) -> LLMProvider:
+        """
+        Return the provider to use for a request.
+        
+        Providers with an open circuit breaker are skipped. The requested
+        provider is used while it is available and healthy; otherwise the
+        router picks the healthy provider with the lowest expected latency.
+        """
+        configured = self.get_available_providers()
+        if not configured:
+            raise ValueError(
+                "No LLM providers are available. Please configure API keys in .env file."
+            )
+        
+        available = [p for p in configured if not self.breaker(p).is_open()]
+        if not available:
+            raise ProviderOverloadedError(
+                ", ".join(configured),
+                503,
+                min(self.breaker(p).retry_after() for p in configured),
+                "circuit open for every provider"
+            )
+        
+        requested = LLMProvider(provider).value
+        chosen = self.router.choose(available, requested)
+        if chosen != requested:
+            print(f"Routing request for {requested} to {chosen}")
+        return LLMProvider(chosen)
+    
+    def default_model(self, provider: LLMProvider) -> str:
+        """Return the model generate() uses for a provider."""
+        if provider == LLMProvider.OLLAMA:
+            return settings.ollama_model
+        return self.DEFAULT_MODELS[LLMProvider(provider)]
+    
     async def generate_with_openai(
         self,
         system_prompt: str,
@@ -67,7 +201,7 @@ class LLMService:
             raise ValueError("OpenAI client is not initialized. Please provide an API key.")
         
         try:
-            response = await openai.ChatCompletion.acreate(
+            response = await self.openai_client.chat.completions.create(
                 model=model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -80,7 +214,7 @@ class LLMService:
             return response.choices[0].message.content
         
         except Exception as e:
-            raise Exception(f"OpenAI API error: {str(e)}")
+            raise ProviderError("openai", f"OpenAI API error: {str(e)}", e) from e
     
     async def generate_with_anthropic(
         self,
@@ -95,7 +229,7 @@ class LLMService:
             raise ValueError("Anthropic client is not initialized. Please provide an API key.")
         
         try:
-            message = self.anthropic_client.messages.create(
+            message = await self.anthropic_client.messages.create(
                 model=model,
                 max_tokens=max_tokens,
                 temperature=temperature,
@@ -108,7 +242,7 @@ class LLMService:
             return message.content[0].text
         
         except Exception as e:
-            raise Exception(f"Anthropic API error: {str(e)}")
+            raise ProviderError("anthropic", f"Anthropic API error: {str(e)}", e) from e
     
     async def generate_with_gemini(
         self,
@@ -127,7 +261,7 @@ class LLMService:
             combined_prompt = f"{system_prompt}\n\n{user_prompt}"
             
             model_instance = self.gemini_client.GenerativeModel(model)
-            response = model_instance.generate_content(
+            response = await model_instance.generate_content_async(
                 combined_prompt,
                 generation_config=genai.types.GenerationConfig(
                     temperature=temperature,
@@ -140,19 +274,193 @@ class LLMService:
                 candidate = response.candidates[0]
                 if hasattr(candidate, 'finish_reason') and candidate.finish_reason:
                     print(f"Response finish reason: {candidate.finish_reason}")
-                
-                # Try to get the full text
-                if hasattr(candidate.content, 'parts') and candidate.content.parts:
-                    full_text = ""
-                    for part in candidate.content.parts:
-                        if hasattr(part, 'text'):
-                            full_text += part.text
-                    return full_text
             
-            return response.text
+            return self._gemini_text(response)
+        
+        except Exception as e:
+            raise ProviderError("gemini", f"Gemini API error: {str(e)}", e) from e
+    
+    @staticmethod
+    def _gemini_text(response) -> str:
+        """Join the text parts of a Gemini response or stream chunk."""
+        if response.candidates and len(response.candidates) > 0:
+            candidate = response.candidates[0]
+            if hasattr(candidate.content, 'parts') and candidate.content.parts:
+                full_text = ""
+                for part in candidate.content.parts:
+                    if hasattr(part, 'text'):
+                        full_text += part.text
+                return full_text
+            return ""
+        
+        return response.text
+    
+    def _ollama_payload(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        stream: bool
+    ) -> dict:
+        """Build an Ollama /api/generate request body."""
+        return {
+            "model": model or settings.ollama_model,
+            "system": system_prompt,
+            "prompt": user_prompt,
+            "stream": stream,
+            "keep_alive": settings.ollama_keep_alive,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+    
+    async def generate_with_ollama(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 4000
+    ) -> str:
+        """Generate text using a local Ollama server."""
+        try:
+            response = await self.http_client.post(
+                f"{settings.ollama_url}/api/generate",
+                json=self._ollama_payload(
+                    system_prompt, user_prompt, model, temperature, max_tokens, stream=False
+                )
+            )
+            response.raise_for_status()
+            return response.json().get("response", "")
+        
+        except Exception as e:
+            raise ProviderError("ollama", f"Ollama API error: {str(e)}", e) from e
+    
+    async def stream_with_openai(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: str = "gpt-4-turbo-preview",
+        temperature: float = 0.3,
+        max_tokens: int = 4000
+    ) -> AsyncIterator[str]:
+        """Stream text chunks from OpenAI's API."""
+        if not self.openai_client:
+            raise ValueError("OpenAI client is not initialized. Please provide an API key.")
+        
+        try:
+            stream = await self.openai_client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        
+        except Exception as e:
+            raise ProviderError("openai", f"OpenAI API error: {str(e)}", e) from e
+    
+    async def stream_with_anthropic(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: str = "claude-3-sonnet-20240229",
+        temperature: float = 0.3,
+        max_tokens: int = 4000
+    ) -> AsyncIterator[str]:
+        """Stream text chunks from Anthropic's API."""
+        if not self.anthropic_client:
+            raise ValueError("Anthropic client is not initialized. Please provide an API key.")
+        
+        try:
+            async with self.anthropic_client.messages.stream(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=system_prompt,
+                messages=[
+                    {"role": "user", "content": user_prompt}
+                ]
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+        
+        except Exception as e:
+            raise ProviderError("anthropic", f"Anthropic API error: {str(e)}", e) from e
+    
+    async def stream_with_gemini(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: str = "models/gemini-2.5-flash",
+        temperature: float = 0.3,
+        max_tokens: int = 8000
+    ) -> AsyncIterator[str]:
+        """Stream text chunks from Google Gemini API."""
+        if not self.gemini_client:
+            raise ValueError("Gemini client is not initialized. Please provide an API key.")
+        
+        try:
+            # Combine system and user prompts for Gemini
+            combined_prompt = f"{system_prompt}\n\n{user_prompt}"
+            
+            model_instance = self.gemini_client.GenerativeModel(model)
+            response = await model_instance.generate_content_async(
+                combined_prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=temperature,
+                    max_output_tokens=max_tokens,
+                ),
+                stream=True
+            )
+            
+            async for chunk in response:
+                text = self._gemini_text(chunk)
+                if text:
+                    yield text
+        
+        except Exception as e:
+            raise ProviderError("gemini", f"Gemini API error: {str(e)}", e) from e
+    
+    async def stream_with_ollama(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 4000
+    ) -> AsyncIterator[str]:
+        """Stream text chunks from a local Ollama server."""
+        try:
+            async with self.http_client.stream(
+                "POST",
+                f"{settings.ollama_url}/api/generate",
+                json=self._ollama_payload(
+                    system_prompt, user_prompt, model, temperature, max_tokens, stream=True
+                )
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        break
         
         except Exception as e:
-            raise Exception(f"Gemini API error: {str(e)}")
+            raise ProviderError("ollama", f"Ollama API error: {str(e)}", e) from e
     
     async def generate(
         self,
@@ -160,48 +468,362 @@ class LLMService:
         user_prompt: str,
         provider: LLMProvider = LLMProvider.GEMINI,
         temperature: float = 0.3,
-        max_tokens: int = 4000
+        max_tokens: int = 4000,
+        use_cache: bool = True,
+        hedge: Optional[bool] = None
     ) -> Tuple[str, str]:
         """
         Generate text using the specified provider.
         
+        Args:
+            use_cache: Set to False to skip the response cache and force a
+                fresh generation (the result is still stored)
+            hedge: Send a backup request to a second provider if the first is
+                slow; defaults to the LLM_HEDGING_ENABLED setting
+        
         Returns:
             Tuple of (generated_text, provider_used)
         """
-        # Check if requested provider is available
-        if not self.is_provider_available(provider):
-            # Try to fall back to another provider
-            available = self.get_available_providers()
-            if not available:
-                raise ValueError(
-                    "No LLM providers are available. Please configure API keys in .env file."
-                )
-            
-            # Use first available provider
-            provider = LLMProvider(available[0])
-            print(f"Requested provider not available, falling back to {provider.value}")
+        provider = self.resolve_provider(provider)
+        key = self._cache_key(provider, system_prompt, user_prompt, temperature, max_tokens)
+        
+        if self.cache is not None and use_cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached, provider.value
         
-        # Generate with the selected provider
-        if provider == LLMProvider.GEMINI:
-            text = await self.generate_with_gemini(
-                system_prompt, user_prompt, temperature=temperature, max_tokens=max_tokens
+        use_hedging = hedge if hedge is not None else settings.llm_hedging_enabled
+        
+        async def fresh() -> Tuple[str, str]:
+            deadline = time.monotonic() + settings.llm_retry_deadline
+            text, used = await self._generate_with_failover(
+                system_prompt, user_prompt, provider, temperature, max_tokens, deadline, use_hedging
             )
-            return text, "gemini"
+            
+            if self.cache is not None and text:
+                await self.cache.set(self._cache_key(
+                    used, system_prompt, user_prompt, temperature, max_tokens
+                ), text)
+            
+            return text, used.value
         
-        elif provider == LLMProvider.OPENAI:
-            text = await self.generate_with_openai(
-                system_prompt, user_prompt, temperature=temperature, max_tokens=max_tokens
+        return await self.inflight.do(f"{key}:hedge={use_hedging}", fresh)
+    
+    def _cache_key(
+        self,
+        provider: LLMProvider,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """Build the response cache key for a request to `provider`."""
+        return ResponseCache.make_key(
+            provider.value,
+            self.default_model(provider),
+            system_prompt,
+            user_prompt,
+            temperature,
+            max_tokens
+        )
+    
+    async def _generate_with_failover(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        provider: LLMProvider,
+        temperature: float,
+        max_tokens: int,
+        deadline: float,
+        hedge: bool
+    ) -> Tuple[str, LLMProvider]:
+        """
+        Try `provider` first, then fail over to the other providers.
+        
+        Each provider gets retries with backoff for transient errors; providers
+        with an open circuit breaker are skipped without a call. Admission
+        rejections are raised immediately so the client gets a fast 429/503.
+        """
+        others = [
+            LLMProvider(p) for p in sorted(
+                (p for p in self.get_available_providers() if p != provider.value),
+                key=self.router.expected_latency
             )
-            return text, "openai"
+        ]
         
-        elif provider == LLMProvider.ANTHROPIC:
-            text = await self.generate_with_anthropic(
-                system_prompt, user_prompt, temperature=temperature, max_tokens=max_tokens
+        last_error: Optional[Exception] = None
+        for candidate in [provider] + others:
+            if candidate != provider and self.breaker(candidate.value).is_open():
+                continue
+            try:
+                if hedge:
+                    return await self._generate_hedged(
+                        system_prompt, user_prompt, candidate, temperature, max_tokens, deadline
+                    )
+                text = await self._call_resilient(
+                    system_prompt, user_prompt, candidate, temperature, max_tokens, deadline
+                )
+                return text, candidate
+            except ProviderOverloadedError:
+                raise
+            except Exception as e:
+                last_error = e
+                if time.monotonic() >= deadline:
+                    break
+                print(f"{candidate.value} failed ({e}); failing over to the next provider")
+        
+        raise last_error
+    
+    async def _call_resilient(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        provider: LLMProvider,
+        temperature: float,
+        max_tokens: int,
+        deadline: float
+    ) -> str:
+        """Call one provider through its circuit breaker, retrying transient errors."""
+        breaker = self.breaker(provider.value)
+        
+        async def attempt() -> str:
+            if not breaker.allow_request():
+                raise CircuitOpenError(provider.value, breaker.retry_after())
+            try:
+                text = await asyncio.wait_for(
+                    self._call_provider(system_prompt, user_prompt, provider, temperature, max_tokens),
+                    timeout=max(deadline - time.monotonic(), 0.001)
+                )
+            except (ProviderOverloadedError, asyncio.CancelledError):
+                breaker.release_probe()
+                raise
+            except Exception as e:
+                if is_provider_failure(e):
+                    breaker.record_failure()
+                else:
+                    breaker.release_probe()
+                raise
+            breaker.record_success()
+            return text
+        
+        return await retry_with_backoff(
+            attempt,
+            deadline=deadline,
+            max_attempts=settings.llm_retry_max_attempts,
+            base_delay=settings.llm_retry_base_delay,
+            max_delay=settings.llm_retry_max_delay
+        )
+    
+    async def _call_provider(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        provider: LLMProvider,
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """Admit and run one provider call, recording its latency."""
+        async with self.admission.admit(
+            provider.value, estimate_tokens(system_prompt, user_prompt) + max_tokens
+        ):
+            model = self.default_model(provider)
+            started = time.monotonic()
+            try:
+                text = await self._generate_uncached(
+                    system_prompt, user_prompt, provider, model, temperature, max_tokens
+                )
+            except Exception as e:
+                self.router.record_failure(
+                    provider.value, model, str(e), timeout=self._is_timeout(e)
+                )
+                raise
+            
+            elapsed = time.monotonic() - started
+            self.latency.record(provider.value, elapsed)
+            self.router.record_success(provider.value, model, elapsed, estimate_tokens(text or ""))
+            return text
+    
+    @staticmethod
+    def _is_timeout(error: Exception) -> bool:
+        """Best-effort check whether a provider error was a timeout."""
+        message = str(error).lower()
+        return isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)) or (
+            "timeout" in message or "timed out" in message
+        )
+    
+    async def _generate_hedged(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        primary: LLMProvider,
+        temperature: float,
+        max_tokens: int,
+        deadline: float
+    ) -> Tuple[str, LLMProvider]:
+        """
+        Race the primary provider against a delayed backup provider.
+        
+        The backup is only sent if the primary has not answered within its
+        learned hedge delay. The first successful response wins and the other
+        request is cancelled.
+        """
+        self.latency.count(primary.value, "requests")
+        backups = [
+            LLMProvider(p) for p in self.get_available_providers()
+            if p != primary.value and not self.breaker(p).is_open()
+        ]
+        
+        def call(provider: LLMProvider):
+            return self._call_resilient(
+                system_prompt, user_prompt, provider, temperature, max_tokens, deadline
             )
-            return text, "anthropic"
         
-        else:
+        if not backups:
+            return await call(primary), primary
+        
+        tasks = {asyncio.create_task(call(primary)): primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.latency.hedge_delay(primary.value))
+            if not done:
+                self.latency.count(primary.value, "hedged")
+                backup = LLMProvider(self.router.choose([b.value for b in backups]))
+                tasks[asyncio.create_task(call(backup))] = backup
+            
+            pending = set(tasks)
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = tasks[task]
+                        if len(tasks) > 1:
+                            self.latency.count(
+                                primary.value, "primary_wins" if winner == primary else "hedge_wins"
+                            )
+                        return task.result(), winner
+                    first_error = first_error or task.exception()
+            raise first_error
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _generate_uncached(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        provider: LLMProvider,
+        model: str,
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """Call the selected provider directly."""
+        generators = {
+            LLMProvider.GEMINI: self.generate_with_gemini,
+            LLMProvider.OPENAI: self.generate_with_openai,
+            LLMProvider.ANTHROPIC: self.generate_with_anthropic,
+            LLMProvider.OLLAMA: self.generate_with_ollama,
+        }
+        
+        generator = generators.get(provider)
+        if generator is None:
+            raise ValueError(f"Unsupported provider: {provider}")
+        
+        return await generator(
+            system_prompt, user_prompt, model=model, temperature=temperature, max_tokens=max_tokens
+        )
+    
+    def generate_stream(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        provider: LLMProvider = LLMProvider.GEMINI,
+        temperature: float = 0.3,
+        max_tokens: int = 4000
+    ) -> AsyncIterator[str]:
+        """
+        Stream text chunks from the specified provider.
+        
+        The provider is used as given; call resolve_provider() first to apply
+        the same fallback rules as generate(). Identical streams that are
+        already running are shared rather than started again. The first chunk
+        is empty and marks admission; CircuitOpenError or
+        ProviderOverloadedError is raised before it when the stream is rejected.
+        
+        Returns:
+            Async iterator over generated text chunks
+        """
+        streamers = {
+            LLMProvider.GEMINI: self.stream_with_gemini,
+            LLMProvider.OPENAI: self.stream_with_openai,
+            LLMProvider.ANTHROPIC: self.stream_with_anthropic,
+            LLMProvider.OLLAMA: self.stream_with_ollama,
+        }
+        
+        provider = LLMProvider(provider)
+        streamer = streamers.get(provider)
+        if streamer is None:
             raise ValueError(f"Unsupported provider: {provider}")
+        
+        def start() -> AsyncIterator[str]:
+            stream = streamer(
+                system_prompt,
+                user_prompt,
+                model=self.default_model(provider),
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return self._admitted_stream(
+                provider, estimate_tokens(system_prompt, user_prompt) + max_tokens, stream
+            )
+        
+        key = self._cache_key(provider, system_prompt, user_prompt, temperature, max_tokens)
+        return self.inflight.stream(key, start)
+    
+    async def _admitted_stream(
+        self,
+        provider: LLMProvider,
+        tokens: int,
+        stream: AsyncIterator[str]
+    ) -> AsyncIterator[str]:
+        """
+        Run a stream through its provider's circuit breaker and an admission
+        slot held for the stream's lifetime, recording its outcome.
+        
+        An empty chunk is yielded as soon as the stream is admitted, so callers
+        can tell a rejected stream from one that has started.
+        """
+        model = self.default_model(provider)
+        breaker = self.breaker(provider.value)
+        if not breaker.allow_request():
+            raise CircuitOpenError(provider.value, breaker.retry_after())
+        
+        verdict = False
+        try:
+            async with self.admission.admit(provider.value, tokens):
+                started = time.monotonic()
+                generated = 0
+                yield ""
+                try:
+                    async for chunk in stream:
+                        generated += len(chunk)
+                        yield chunk
+                except Exception as e:
+                    if is_provider_failure(e):
+                        breaker.record_failure()
+                        verdict = True
+                    self.router.record_failure(
+                        provider.value, model, str(e), timeout=self._is_timeout(e)
+                    )
+                    raise
+                breaker.record_success()
+                verdict = True
+                self.router.record_success(
+                    provider.value, model, time.monotonic() - started, generated // 4
+                )
+        finally:
+            if not verdict:
+                # Rejected, cancelled or a client error: free a half-open probe slot
+                breaker.release_probe()
 
 
 # Global instance
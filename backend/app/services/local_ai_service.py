@@ -8,9 +8,11 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 
 from local_ai_integration import LocalAIService, LocalAIConfig
+from app.core.config import settings
+from app.services.health_monitor import HealthMonitor
 from app.models.protocol import (
     ProtocolGenerationRequest, ProtocolResponse,
-    TroubleshootingRequest, TroubleshootingResponse,
+    TroubleshootingRequest, TroubleshootingResponse, TroubleshootingFollowUpRequest,
     RouteGenRequest, RouteGenResponse,
     ToolGenRequest, ToolGenResponse
 )
@@ -22,22 +24,61 @@ class ProtoGenLocalAIService:
     """Proto-Gen service using local AI stack instead of external APIs."""
     
     def __init__(self):
-        self.local_ai = LocalAIService()
-        self.is_local_mode = self._check_local_ai_availability()
+        self.local_ai = LocalAIService(LocalAIConfig(
+            ollama_url=settings.ollama_url,
+            ollama_urls=settings.ollama_urls,
+            default_model=settings.ollama_model,
+            gemini_api_key=settings.gemini_api_key,
+            ollama_connect_timeout=settings.ollama_connect_timeout,
+            ollama_read_timeout=settings.ollama_read_timeout,
+            ollama_max_connections=settings.ollama_max_connections,
+            keep_alive=settings.ollama_keep_alive,
+            warm_models=settings.ollama_warm_models,
+            search_deadline=settings.web_search_deadline,
+            ollama_num_parallel=settings.ollama_num_parallel,
+            ollama_eject_failures=settings.ollama_eject_failures,
+            ollama_eject_seconds=settings.ollama_eject_seconds,
+            context_window=settings.ollama_context_window,
+            context_token_budget=settings.context_token_budget,
+            context_snippet_tokens=settings.context_snippet_tokens,
+            response_reserve_tokens=settings.response_reserve_tokens,
+            session_idle_seconds=settings.troubleshoot_session_idle_seconds,
+            session_max_bytes=settings.troubleshoot_session_max_bytes,
+            search_cache_path=settings.web_search_cache_path,
+            search_cache_ttl=settings.web_search_cache_ttl,
+            search_cache_max_entries=settings.web_search_cache_max_entries
+        ))
+        # Probes Ollama and n8n in the background; /health reads the cache
+        self.monitor = HealthMonitor(
+            probes={"ollama": self.local_ai.probe_ollama, "n8n": self.local_ai.probe_n8n},
+            interval=settings.health_probe_interval,
+            timeout=settings.health_probe_timeout,
+            max_backoff=settings.health_probe_max_backoff
+        )
+        self.monitor.listeners.append(self._on_health_change)
     
-    def _check_local_ai_availability(self) -> bool:
-        """Check if local AI stack is available and ready."""
-        try:
-            health = self.local_ai.health_check()
-            is_available = health.get("overall", False)
-            if is_available:
-                logger.info("Local AI stack (Ollama + n8n) is available and ready")
-            else:
-                logger.warning("Local AI stack not fully available")
-            return is_available
-        except Exception as e:
-            logger.warning(f"Local AI stack not available: {e}")
-            return False
+    @property
+    def is_local_mode(self) -> bool:
+        """True while the last probes found both Ollama and n8n up."""
+        return self.monitor.is_up("ollama") and self.monitor.is_up("n8n")
+    
+    async def startup(self):
+        """Probe the local AI stack and keep watching it in the background."""
+        await self.monitor.start()
+        if self.is_local_mode:
+            logger.info("Local AI stack (Ollama + n8n) is available and ready")
+        else:
+            logger.warning("Local AI stack not fully available")
+    
+    async def aclose(self):
+        """Stop background tasks and close pooled connections to Ollama."""
+        await self.monitor.stop()
+        await self.local_ai.aclose()
+    
+    def _on_health_change(self, component: str, up: bool):
+        """Start warming models as soon as Ollama is reachable."""
+        if component == "ollama" and up and settings.ollama_warm_enabled:
+            self.local_ai.warm_pool.start(interval=settings.ollama_warm_interval)
     
     async def generate_protocol(self, request: ProtocolGenerationRequest) -> ProtocolResponse:
         """Generate protocol using local AI stack."""
@@ -59,7 +100,7 @@ class ProtoGenLocalAIService:
                 "other_params": request.other_params
             }
             
-            result = self.local_ai.generate_protocol_local(request_data)
+            result = await self.local_ai.generate_protocol_local(request_data)
             
             return ProtocolResponse(
                 success=result["success"],
@@ -89,18 +130,19 @@ class ProtoGenLocalAIService:
         
         try:
             request_data = {
-                "protocol_text": request.protocol_text,
-                "issue_description": request.issue_description,
-                "expected_outcome": request.expected_outcome,
-                "actual_outcome": request.actual_outcome
+                "observed_problem": request.observed_problem,
+                "original_protocol": request.original_protocol,
+                "additional_details": request.additional_details,
+                "technique": request.technique
             }
             
-            result = self.local_ai.troubleshoot_protocol_local(request_data)
+            result = await self.local_ai.troubleshoot_protocol_local(request_data)
             
             return TroubleshootingResponse(
                 success=result["success"],
                 analysis=result["analysis"],
                 provider_used=result["provider_used"],
+                session_id=result.get("session_id"),
                 error=result.get("error")
             )
             
@@ -113,6 +155,37 @@ class ProtoGenLocalAIService:
                 error=str(e)
             )
     
+    async def troubleshoot_follow_up(
+        self,
+        session_id: str,
+        request: TroubleshootingFollowUpRequest
+    ) -> TroubleshootingResponse:
+        """Continue a local troubleshooting session with a follow-up question."""
+        if not self.is_local_mode:
+            return TroubleshootingResponse(
+                success=False,
+                analysis="",
+                provider_used="local_ai_stack",
+                session_id=session_id,
+                error="Local AI stack not available. Please run setup_checker.py"
+            )
+        
+        result = await self.local_ai.troubleshoot_follow_up_local(session_id, request.question)
+        return TroubleshootingResponse(
+            success=result["success"],
+            analysis=result["analysis"],
+            provider_used=result["provider_used"],
+            session_id=result.get("session_id"),
+            error=result.get("error")
+        )
+    
+    def has_session(self, session_id: str) -> bool:
+        return session_id in self.local_ai.sessions
+    
+    def end_session(self, session_id: str) -> bool:
+        """Forget a troubleshooting session; False if it did not exist."""
+        return self.local_ai.sessions.delete(session_id)
+    
     async def generate_routes(self, request: RouteGenRequest) -> RouteGenResponse:
         """Generate experimental routes using local AI stack."""
         if not self.is_local_mode:
@@ -131,7 +204,7 @@ class ProtoGenLocalAIService:
                 "constraints": request.constraints
             }
             
-            result = self.local_ai.generate_routes_local(request_data)
+            result = await self.local_ai.generate_routes_local(request_data)
             
             return RouteGenResponse(
                 success=result["success"],
@@ -167,7 +240,7 @@ class ProtoGenLocalAIService:
                 "context": request.additional_context or ""
             }
             
-            result = self.local_ai.generate_tools_local(request_data)
+            result = await self.local_ai.generate_tools_local(request_data)
             
             return ToolGenResponse(
                 success=result["success"],
@@ -185,9 +258,18 @@ class ProtoGenLocalAIService:
                 error=str(e)
             )
     
+    async def get_model_status(self) -> dict:
+        """Get residency and latency of the warm Ollama models, and per-backend load."""
+        await self.local_ai.warm_pool.refresh()
+        return {
+            **self.local_ai.warm_pool.stats(),
+            "backends": self.local_ai.ollama.stats()
+        }
+    
     def get_health_status(self) -> dict:
-        """Get health status of local AI stack."""
-        return self.local_ai.health_check()
+        """Get the cached health status of the local AI stack."""
+        ollama, n8n = self.monitor.is_up("ollama"), self.monitor.is_up("n8n")
+        return {"ollama": ollama, "n8n": n8n, "overall": ollama and n8n}
 
 # Global service instance
 local_ai_service = ProtoGenLocalAIService()
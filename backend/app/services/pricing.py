@@ -0,0 +1,191 @@
+"""Typed vendor prices and vectorized procurement cost totals."""
+
+import re
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+CENT = Decimal("0.01")
+
+# Pack-size units folded into one base unit per dimension: (base unit, factor)
+UNITS = {
+    "kg": ("g", Decimal(1000)), "g": ("g", Decimal(1)), "mg": ("g", Decimal("0.001")),
+    "ug": ("g", Decimal("0.000001")), "µg": ("g", Decimal("0.000001")),
+    "l": ("ml", Decimal(1000)), "ml": ("ml", Decimal(1)), "ul": ("ml", Decimal("0.001")),
+    "µl": ("ml", Decimal("0.001")),
+    "mmol": ("umol", Decimal(1000)), "umol": ("umol", Decimal(1)), "µmol": ("umol", Decimal(1)),
+    "u": ("unit", Decimal(1)), "units": ("unit", Decimal(1)),
+    "rxns": ("reaction", Decimal(1)), "reactions": ("reaction", Decimal(1))
+}
+
+_MONEY_PATTERN = re.compile(
+    r"^(?:[$€£₹]|us\$|usd|eur|gbp|inr|rs\.?)?\s*(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s*(k)?"
+    r"(?:\s*(?:usd|eur|gbp|inr))?$",
+    re.IGNORECASE
+)
+
+_PACK_PATTERN = re.compile(
+    r"^(?:(\d+(?:\.\d+)?)\s*x\s*)?(\d+(?:\.\d+)?)\s*([a-zµ]+)$", re.IGNORECASE
+)
+
+
+def parse_money(text) -> Optional[Decimal]:
+    """
+    Parse one amount such as "$1,234.50", "USD 500" or "$5k" into a Decimal.
+
+    Returns None unless the whole text is a single non-negative amount, so
+    free text like "approx. $500" or "5e3" is never misread as a price.
+    """
+    if isinstance(text, (int, float, Decimal)):
+        return Decimal(str(text))
+    match = _MONEY_PATTERN.match(str(text or "").strip())
+    if not match:
+        return None
+    whole, fraction, thousands = match.groups()
+    amount = Decimal(whole.replace(",", "") + (fraction or ""))
+    return amount * 1000 if thousands else amount
+
+
+def format_money(amount: Decimal) -> str:
+    """Format a Decimal the way procurement responses show prices ("$12.30")."""
+    return f"${amount.quantize(CENT, rounding=ROUND_HALF_UP)}"
+
+
+@dataclass(frozen=True)
+class PackSize:
+    """Pack size in a base unit, e.g. "20 x 0.05 ml" -> 1 ml."""
+    quantity: Decimal
+    unit: str
+
+    @classmethod
+    def parse(cls, text: Optional[str]) -> Optional["PackSize"]:
+        """Parse catalog pack sizes; None for sizes like "Standard" without an amount."""
+        match = _PACK_PATTERN.match((text or "").strip())
+        if not match:
+            return None
+        count, amount, unit = match.groups()
+        unit = unit.lower()
+        base_unit, factor = UNITS.get(unit, (unit.rstrip("s") or unit, Decimal(1)))
+        quantity = Decimal(amount) * factor * (Decimal(count) if count else 1)
+        return cls(quantity, base_unit) if quantity > 0 else None
+
+
+@dataclass(frozen=True)
+class VendorPrice:
+    """One vendor's offer for a material, parsed once from its response row."""
+    vendor_name: str
+    amount: Optional[Decimal]
+    pack: Optional[PackSize]
+    is_preferred: bool = False
+
+    @classmethod
+    def from_vendor(cls, vendor: dict) -> "VendorPrice":
+        return cls(
+            vendor_name=vendor.get("vendor_name", ""),
+            amount=(
+                Decimal(vendor["price_cents"]) * CENT if vendor.get("price_cents") is not None
+                else parse_money(vendor.get("price"))
+            ),
+            pack=PackSize.parse(vendor.get("size")),
+            is_preferred=bool(vendor.get("is_preferred"))
+        )
+
+    @property
+    def unit_price(self) -> Optional[Decimal]:
+        """Price per base unit of the pack, for comparing different pack sizes."""
+        if self.amount is None or self.pack is None:
+            return None
+        return self.amount / self.pack.quantity
+
+    def unit_price_label(self) -> Optional[str]:
+        unit_price = self.unit_price
+        if unit_price is None:
+            return None
+        places = CENT if unit_price >= 1 else Decimal("0.0001")
+        return f"${unit_price.quantize(places, rounding=ROUND_HALF_UP)} per {self.pack.unit}"
+
+
+def price_vendors(vendors: List[dict]) -> List[VendorPrice]:
+    """
+    Parse a material's vendor rows and sort them preferred first, then by price.
+
+    Each row gains a ``unit_price`` label when its pack size is known. Rows
+    without a readable price sort last.
+
+    Returns:
+        Parsed prices in the same order as the sorted rows
+    """
+    priced = [(VendorPrice.from_vendor(vendor), vendor) for vendor in vendors]
+    priced.sort(key=lambda pair: (
+        not pair[0].is_preferred,
+        pair[0].amount is None,
+        pair[0].amount or 0
+    ))
+    vendors[:] = [vendor for _, vendor in priced]
+    for price, vendor in priced:
+        label = price.unit_price_label()
+        if label:
+            vendor["unit_price"] = label
+    return [price for price, _ in priced]
+
+
+class CostMatrix:
+    """
+    Materials x vendors matrix of pack prices in cents.
+
+    Missing offers are ``inf``; ``preferred`` marks preferred offers. Totals
+    are computed with NumPy reductions, so large bills of materials cost a
+    few array operations rather than a Python loop per vendor.
+    """
+
+    def __init__(self, vendors: List[str], costs: np.ndarray, preferred: np.ndarray):
+        self.vendors = vendors
+        self.costs = costs
+        self.preferred = preferred
+
+    @classmethod
+    def from_prices(cls, materials: Sequence[Sequence[VendorPrice]]) -> "CostMatrix":
+        """Build the matrix from each material's parsed vendor prices."""
+        columns: Dict[str, int] = {}
+        rows, cols, cents, preferred = [], [], [], []
+        for row, prices in enumerate(materials):
+            for price in prices:
+                if price.amount is None:
+                    continue
+                rows.append(row)
+                cols.append(columns.setdefault(price.vendor_name, len(columns)))
+                cents.append(int((price.amount / CENT).to_integral_value(ROUND_HALF_UP)))
+                preferred.append(price.is_preferred)
+
+        costs = np.full((len(materials), len(columns)), np.inf)
+        preferred_mask = np.zeros(costs.shape, dtype=bool)
+        # Keep the cheapest offer when a vendor lists a material twice
+        np.minimum.at(costs, (np.array(rows, dtype=int), np.array(cols, dtype=int)), np.array(cents, dtype=float))
+        preferred_mask[rows, cols] = preferred
+        return cls(list(columns), costs, preferred_mask)
+
+    def lowest(self) -> np.ndarray:
+        """Cheapest offer per material in cents (0 for materials nobody offers)."""
+        if not self.vendors:
+            return np.zeros(len(self.costs))
+        lowest = self.costs.min(axis=1)
+        return np.where(np.isinf(lowest), 0.0, lowest)
+
+    def preferred_choice(self) -> np.ndarray:
+        """Cheapest preferred offer per material in cents, else the cheapest offer."""
+        if not self.vendors:
+            return np.zeros(len(self.costs))
+        preferred = np.where(self.preferred, self.costs, np.inf).min(axis=1)
+        return np.where(np.isinf(preferred), self.lowest(), preferred)
+
+    def totals(self) -> Dict[str, Decimal]:
+        """Preferred, lowest and savings totals as Decimals."""
+        preferred = Decimal(int(self.preferred_choice().sum())) * CENT
+        lowest = Decimal(int(self.lowest().sum())) * CENT
+        return {"preferred": preferred, "lowest": lowest, "savings": abs(preferred - lowest)}
+
+    def total_cost(self) -> Dict[str, str]:
+        """Totals in the ``total_cost`` shape of procurement responses."""
+        return {key: format_money(value) for key, value in self.totals().items()}
@@ -1,6 +1,19 @@
 """Service for protocol generation and troubleshooting."""
 
+import asyncio
+import hashlib
+import json
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+from pydantic import BaseModel
 from app.services.llm_service import llm_service
+from app.services.singleflight import SingleFlight
+from app.services.vendor_catalog import vendor_catalog, is_vendor
+from app.services.pricing import CostMatrix, VendorPrice, price_vendors
+from app.services.vendor_optimizer import vendor_optimizer
+from app.core.config import settings
+from app.services.admission import ProviderOverloadedError
+from app.services.resilience import CircuitOpenError
 from app.prompts import protocol_generation, troubleshooting, route_generation, tool_generation
 from app.models.protocol import (
     ProtocolGenerationRequest,
@@ -10,6 +23,7 @@ from app.models.protocol import (
     RouteGenResponse,
     ToolGenRequest,
     ToolGenResponse,
+    LLMProvider,
     ProcurementRequest,
     ProcurementResponse,
     InventoryUploadResponse,
@@ -18,9 +32,17 @@ from app.models.protocol import (
 )
 
 
+class LLMNotConfiguredError(Exception):
+    """Raised when a step needs an LLM but no provider has credentials."""
+
+
 class ProtocolService:
     """Service for handling protocol-related operations."""
     
+    def __init__(self):
+        # Identical requests already in flight share one generation
+        self.inflight = SingleFlight()
+    
     async def generate_protocol(
         self,
         request: ProtocolGenerationRequest
@@ -35,26 +57,16 @@ class ProtocolService:
             ProtocolResponse with generated protocol
         """
         try:
-            # Build the user prompt
-            user_prompt = protocol_generation.generate_protocol_prompt(
-                experimental_goal=request.experimental_goal,
-                technique=request.technique,
-                reagents=request.reagents,
-                template_details=request.template_details,
-                primer_details=request.primer_details or "",
-                amplicon_size=request.amplicon_size or "",
-                reaction_volume=request.reaction_volume or "25",
-                num_reactions=request.num_reactions or "1",
-                other_params=request.other_params or ""
-            )
-            
             # Generate protocol using LLM
-            protocol_text, provider_used = await llm_service.generate(
+            protocol_text, provider_used = await self._generate_coalesced(
+                "protocol",
+                request,
                 system_prompt=protocol_generation.SYSTEM_PROMPT,
-                user_prompt=user_prompt,
+                user_prompt=self._protocol_prompt(request),
                 provider=request.llm_provider,
                 temperature=0.3,
-                max_tokens=8000
+                max_tokens=8000,
+                use_cache=not request.bypass_cache
             )
             
             return ProtocolResponse(
@@ -63,6 +75,8 @@ class ProtocolService:
                 provider_used=provider_used
             )
         
+        except ProviderOverloadedError:
+            raise
         except Exception as e:
             return ProtocolResponse(
                 success=False,
@@ -71,6 +85,62 @@ class ProtocolService:
                 error=str(e)
             )
     
+    async def generate_protocol_batch(
+        self,
+        requests: List[ProtocolGenerationRequest],
+        max_parallel: Optional[int] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Generate several protocols concurrently, yielding each as it finishes.
+        
+        Args:
+            requests: Protocol generation requests
+            max_parallel: Maximum generations running at once
+            
+        Returns:
+            Async iterator of a start event, one result event per request (in
+            completion order, tagged with its index) and a final done event
+        """
+        semaphore = asyncio.Semaphore(max_parallel or settings.batch_max_parallel)
+        started = time.monotonic()
+        
+        async def run(index: int, request: ProtocolGenerationRequest) -> dict:
+            async with semaphore:
+                item_started = time.monotonic()
+                result = {"event": "result", "index": index}
+                try:
+                    response = await self.generate_protocol(request)
+                    result.update(response.model_dump())
+                except ProviderOverloadedError as e:
+                    result.update(
+                        success=False, protocol="", provider_used="",
+                        error=str(e), retry_after=e.retry_after
+                    )
+                result["elapsed_seconds"] = round(time.monotonic() - item_started, 3)
+                return result
+        
+        yield {"event": "start", "total": len(requests)}
+        
+        tasks = [asyncio.create_task(run(i, r)) for i, r in enumerate(requests)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                succeeded += result["success"]
+                yield result
+        finally:
+            # Stop outstanding generations if the client disconnects
+            for task in tasks:
+                task.cancel()
+        
+        yield {
+            "event": "done",
+            "total": len(requests),
+            "succeeded": succeeded,
+            "failed": len(requests) - succeeded,
+            "elapsed_seconds": round(time.monotonic() - started, 3)
+        }
+    
     async def troubleshoot_protocol(
         self,
         request: TroubleshootingRequest
@@ -85,21 +155,16 @@ class ProtocolService:
             ProtocolResponse with troubleshooting analysis
         """
         try:
-            # Build the user prompt
-            user_prompt = troubleshooting.generate_troubleshooting_prompt(
-                observed_problem=request.observed_problem,
-                original_protocol=request.original_protocol,
-                additional_details=request.additional_details or "",
-                technique=request.technique if request.technique else ""
-            )
-            
             # Generate troubleshooting analysis using LLM
-            analysis_text, provider_used = await llm_service.generate(
+            analysis_text, provider_used = await self._generate_coalesced(
+                "troubleshoot",
+                request,
                 system_prompt=troubleshooting.SYSTEM_PROMPT,
-                user_prompt=user_prompt,
+                user_prompt=self._troubleshooting_prompt(request),
                 provider=request.llm_provider,
                 temperature=0.4,  # Slightly higher temperature for more creative troubleshooting
-                max_tokens=8000
+                max_tokens=8000,
+                use_cache=not request.bypass_cache
             )
             
             return ProtocolResponse(
@@ -108,6 +173,8 @@ class ProtocolService:
                 provider_used=provider_used
             )
         
+        except ProviderOverloadedError:
+            raise
         except Exception as e:
             return ProtocolResponse(
                 success=False,
@@ -130,21 +197,16 @@ class ProtocolService:
             RouteGenResponse with generated routes
         """
         try:
-            # Build the user prompt
-            user_prompt = route_generation.generate_route_prompt(
-                overarching_goal=request.overarching_goal,
-                starting_material=request.starting_material,
-                target_organism=request.target_organism,
-                constraints=request.constraints or ""
-            )
-            
             # Generate routes using LLM
-            routes_text, provider_used = await llm_service.generate(
+            routes_text, provider_used = await self._generate_coalesced(
+                "routes",
+                request,
                 system_prompt=route_generation.SYSTEM_PROMPT,
-                user_prompt=user_prompt,
+                user_prompt=self._route_prompt(request),
                 provider=request.llm_provider,
                 temperature=0.4,  # Slightly higher temperature for creative route planning
-                max_tokens=8000
+                max_tokens=8000,
+                use_cache=not request.bypass_cache
             )
             
             return RouteGenResponse(
@@ -153,6 +215,8 @@ class ProtocolService:
                 provider_used=provider_used
             )
         
+        except ProviderOverloadedError:
+            raise
         except Exception as e:
             return RouteGenResponse(
                 success=False,
@@ -175,37 +239,259 @@ class ProtocolService:
             ToolGenResponse with tool recommendations
         """
         try:
-            # Build the user prompt
-            user_prompt = tool_generation.generate_tool_prompt(
-                user_goal=request.user_goal,
-                technique=request.technique,
-                data_type=request.data_type,
-                additional_context=request.additional_context or ""
-            )
-            
             # Generate tool recommendations using LLM
-            recommendations_text, provider_used = await llm_service.generate(
+            recommendations_text, provider_used = await self._generate_coalesced(
+                "tools",
+                request,
                 system_prompt=tool_generation.SYSTEM_PROMPT,
-                user_prompt=user_prompt,
+                user_prompt=self._tool_prompt(request),
                 provider=request.llm_provider,
                 temperature=0.3,  # Lower temperature for more focused recommendations
-                max_tokens=8000
+                max_tokens=8000,
+                use_cache=not request.bypass_cache
             )
             
             return ToolGenResponse(
                 success=True,
-                recommendations=recommendations_text,
+                tools=recommendations_text,
                 provider_used=provider_used
             )
         
+        except ProviderOverloadedError:
+            raise
         except Exception as e:
             return ToolGenResponse(
                 success=False,
-                recommendations="",
+                tools="",
                 provider_used="",
                 error=str(e)
             )
     
+    def generate_protocol_stream(
+        self,
+        request: ProtocolGenerationRequest
+    ) -> AsyncIterator[dict]:
+        """
+        Stream a laboratory protocol as it is generated.
+        
+        Args:
+            request: Protocol generation request
+            
+        Returns:
+            Async iterator of start, token, done and error events
+        """
+        return self._stream_llm(
+            key=self._request_key("protocol", request),
+            system_prompt=protocol_generation.SYSTEM_PROMPT,
+            user_prompt=self._protocol_prompt(request),
+            provider=request.llm_provider,
+            temperature=0.3
+        )
+    
+    def troubleshoot_protocol_stream(
+        self,
+        request: TroubleshootingRequest
+    ) -> AsyncIterator[dict]:
+        """
+        Stream a troubleshooting analysis as it is generated.
+        
+        Args:
+            request: Troubleshooting request
+            
+        Returns:
+            Async iterator of start, token, done and error events
+        """
+        return self._stream_llm(
+            key=self._request_key("troubleshoot", request),
+            system_prompt=troubleshooting.SYSTEM_PROMPT,
+            user_prompt=self._troubleshooting_prompt(request),
+            provider=request.llm_provider,
+            temperature=0.4
+        )
+    
+    def generate_routes_stream(
+        self,
+        request: RouteGenRequest
+    ) -> AsyncIterator[dict]:
+        """
+        Stream experimental routes as they are generated.
+        
+        Args:
+            request: Route generation request
+            
+        Returns:
+            Async iterator of start, token, done and error events
+        """
+        return self._stream_llm(
+            key=self._request_key("routes", request),
+            system_prompt=route_generation.SYSTEM_PROMPT,
+            user_prompt=self._route_prompt(request),
+            provider=request.llm_provider,
+            temperature=0.4
+        )
+    
+    def generate_tools_stream(
+        self,
+        request: ToolGenRequest
+    ) -> AsyncIterator[dict]:
+        """
+        Stream computational tool recommendations as they are generated.
+        
+        Args:
+            request: Tool generation request
+            
+        Returns:
+            Async iterator of start, token, done and error events
+        """
+        return self._stream_llm(
+            key=self._request_key("tools", request),
+            system_prompt=tool_generation.SYSTEM_PROMPT,
+            user_prompt=self._tool_prompt(request),
+            provider=request.llm_provider,
+            temperature=0.3
+        )
+    
+    async def _generate_coalesced(
+        self,
+        kind: str,
+        request: BaseModel,
+        **kwargs
+    ) -> Tuple[str, str]:
+        """Run llm_service.generate(), sharing the call with identical in-flight requests."""
+        return await self.inflight.do(
+            self._request_key(kind, request), lambda: llm_service.generate(**kwargs)
+        )
+    
+    def _stream_llm(
+        self,
+        key: str,
+        system_prompt: str,
+        user_prompt: str,
+        provider: LLMProvider,
+        temperature: float,
+        max_tokens: int = 8000
+    ) -> AsyncIterator[dict]:
+        """Event stream shared by every identical request that is in flight."""
+        return self.inflight.stream(
+            key,
+            lambda: self._stream_events(system_prompt, user_prompt, provider, temperature, max_tokens)
+        )
+    
+    async def _stream_events(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        provider: LLMProvider,
+        temperature: float,
+        max_tokens: int
+    ) -> AsyncIterator[dict]:
+        """
+        Wrap an LLM token stream in start/token/done/error events.
+        
+        Admission and circuit breaker rejections happen before the start
+        event and are raised as ProviderOverloadedError, so the route can
+        answer with a 429/503 and Retry-After instead of starting a stream.
+        """
+        try:
+            provider = llm_service.resolve_provider(provider)
+            stream = llm_service.generate_stream(
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                provider=provider,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            await stream.__anext__()  # Empty chunk: the stream was admitted
+        except ProviderOverloadedError:
+            raise
+        except CircuitOpenError as e:
+            raise ProviderOverloadedError(e.provider, 503, e.retry_after, "circuit open") from e
+        except Exception as e:
+            yield {"event": "error", "error": str(e)}
+            return
+        
+        try:
+            yield {"event": "start", "provider_used": provider.value}
+            
+            length = 0
+            async for chunk in stream:
+                if not chunk:
+                    continue
+                length += len(chunk)
+                yield {"event": "token", "text": chunk}
+            
+            yield {"event": "done", "provider_used": provider.value, "length": length}
+        
+        except ProviderOverloadedError as e:
+            yield {"event": "error", "error": str(e), "retry_after": e.retry_after}
+        except Exception as e:
+            yield {"event": "error", "error": str(e)}
+    
+    @staticmethod
+    def _request_key(kind: str, request: BaseModel) -> str:
+        """
+        Key identifying equivalent requests.
+        
+        Text fields are compared with whitespace collapsed, so trivially
+        different submissions of the same request coalesce. Case is kept:
+        primer and sequence text is case-sensitive.
+        """
+        def normalize(value):
+            if isinstance(value, str):
+                return " ".join(value.split())
+            if isinstance(value, list):
+                return [normalize(item) for item in value]
+            if isinstance(value, dict):
+                return {k: normalize(v) for k, v in value.items()}
+            return value
+        
+        payload = json.dumps(
+            {"kind": kind, "request": normalize(request.model_dump(mode="json"))},
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    def _protocol_prompt(self, request: ProtocolGenerationRequest) -> str:
+        """Build the user prompt for protocol generation."""
+        return protocol_generation.generate_protocol_prompt(
+            experimental_goal=request.experimental_goal,
+            technique=request.technique,
+            reagents=request.reagents,
+            template_details=request.template_details,
+            primer_details=request.primer_details or "",
+            amplicon_size=request.amplicon_size or "",
+            reaction_volume=request.reaction_volume or "25",
+            num_reactions=request.num_reactions or "1",
+            other_params=request.other_params or ""
+        )
+    
+    def _troubleshooting_prompt(self, request: TroubleshootingRequest) -> str:
+        """Build the user prompt for troubleshooting."""
+        return troubleshooting.generate_troubleshooting_prompt(
+            observed_problem=request.observed_problem,
+            original_protocol=request.original_protocol,
+            additional_details=request.additional_details or "",
+            technique=request.technique if request.technique else ""
+        )
+    
+    def _route_prompt(self, request: RouteGenRequest) -> str:
+        """Build the user prompt for route generation."""
+        return route_generation.generate_route_prompt(
+            overarching_goal=request.overarching_goal,
+            starting_material=request.starting_material,
+            target_organism=request.target_organism,
+            constraints=request.constraints or ""
+        )
+    
+    def _tool_prompt(self, request: ToolGenRequest) -> str:
+        """Build the user prompt for tool recommendations."""
+        return tool_generation.generate_tool_prompt(
+            user_goal=request.user_goal,
+            technique=request.technique,
+            data_type=request.data_type,
+            additional_context=request.additional_context or ""
+        )
+    
     async def generate_procurement(
         self,
         request: ProcurementRequest
@@ -213,158 +499,198 @@ class ProtocolService:
         """
         Generate procurement analysis using Ollama + Gemini pipeline.
         
-        This method processes laboratory material procurement requests through
-        an Ollama processing agent that uses Gemini for supplier search.
+        Materials are looked up in the local vendor catalog first; the
+        Ollama/Gemini pipeline only runs for materials the catalog misses.
+        Collects the events of generate_procurement_stream() into one response.
+        """
+        materials = []
+        optimized_order = None
+        async for event in self.generate_procurement_stream(request):
+            if event["event"] == "material":
+                materials.append(event["material"])
+            elif event["event"] == "optimized_order":
+                optimized_order = {key: value for key, value in event.items() if key != "event"}
+            elif event["event"] == "summary":
+                return ProcurementResponse(
+                    success=True,
+                    data={
+                        "materials": materials,
+                        "preferred_brands": event["preferred_brands"],
+                        "total_cost": event["total_cost"],
+                        "optimized_order": optimized_order,
+                        "processing_info": event["processing_info"]
+                    }
+                )
+            elif event["event"] == "error":
+                return ProcurementResponse(success=False, error=event["error"])
+        
+        return ProcurementResponse(success=False, error="Procurement stream ended without a summary")
+    
+    async def generate_procurement_stream(self, request: ProcurementRequest) -> AsyncIterator[dict]:
+        """
+        Stream a procurement analysis material by material.
+        
+        Yields a ``start`` event, one ``material`` event per material (in
+        order, as soon as its vendor comparison is ready), an
+        ``optimized_order`` event with the vendor assignment for the budget,
+        then a ``summary`` event with the cost totals and analysis. Failures end the stream with
+        an ``error`` event. The LLM analysis of catalog misses runs while the
+        materials are being sent.
         """
+        analysis_task = None
         try:
-            # Parse input data
-            materials = [m.strip() for m in request.materials_list.split('\n') if m.strip()]
-            quantities = [q.strip() for q in request.quantities.split('\n') if q.strip()]
-            
-            # Parse preferred brands
-            preferred_brands = {}
-            if request.preferred_brands:
-                for line in request.preferred_brands.split('\n'):
-                    if ':' in line:
-                        material, brand = line.split(':', 1)
-                        preferred_brands[material.strip().lower()] = brand.strip()
-            
-            # Create Ollama prompt for procurement analysis
-            ollama_prompt = f"""
-            You are a laboratory procurement assistant working with Gemini search capabilities.
-            
-            Analyze this procurement request:
-            - Materials: {materials}
-            - Quantities: {quantities}
-            - Preferred Brands: {preferred_brands}
-            - Budget Limit: {request.budget_limit}
-            - Urgency: {request.urgency}
-            - Supplier Preference: {request.supplier_preference}
-            
-            Process this request through the following steps:
-            1. Analyze each material for optimal supplier selection
-            2. Consider preferred brands and budget constraints
-            3. Search major suppliers: Sigma-Aldrich, Thermo Fisher, Bio-Rad, NEB
-            4. Compare prices and availability
-            5. Provide cost-effective recommendations
-            
-            Return a structured analysis with vendor comparisons and cost summaries.
-            Focus on scientific accuracy and laboratory purchasing best practices.
-            """
-            
-            # Use LLM service to process through Ollama/Gemini pipeline
-            try:
-                procurement_analysis, provider_used = await llm_service.generate(
-                    "You are a laboratory procurement assistant with access to supplier databases.",
-                    ollama_prompt,
-                    request.processing_pipeline.get("llm_backend", "gemini")
+            materials, quantities, preferred_brands = self._parse_procurement(request)
+            yield {"event": "start", "total": len(materials)}
+            
+            # Deterministic catalog lookups first; only misses need the LLM
+            catalog_results = {material: vendor_catalog.lookup(material) for material in materials}
+            missing = [material for material, vendors in catalog_results.items() if not vendors]
+            if missing:
+                analysis_task = asyncio.create_task(
+                    self._procurement_analysis(missing, preferred_brands, request)
                 )
-            except Exception as llm_error:
-                # If LLM service fails, provide a helpful error message
-                if "No LLM providers are available" in str(llm_error):
-                    return ProcurementResponse(
-                        success=False,
-                        error="LLM service not configured. Please set up API keys in backend/.env file. See backend/.env.example for required keys."
-                    )
-                else:
-                    # For other LLM errors, continue with simulation
-                    procurement_analysis = "LLM service unavailable, using simulation mode"
-                    provider_used = "simulation"
-            
-            # Simulate structured procurement data (in real implementation, this would be parsed from LLM response)
-            processed_materials = []
-            total_preferred_cost = 0
-            total_lowest_cost = 0
             
+            material_prices = []
             for i, material in enumerate(materials):
                 quantity = quantities[i] if i < len(quantities) else "1 unit"
-                material_key = material.lower()
-                
-                # Simulate vendor data based on material type and preferences
-                vendors = []
-                
-                # New England Biolabs for enzymes
-                if "polymerase" in material_key or "enzyme" in material_key or "ligase" in material_key:
-                    price = 150 + (hash(material) % 100)
-                    vendors.append({
-                        "vendor_name": "New England Biolabs",
-                        "product_id": f"M{hash(material) % 1000}S",
-                        "price": f"${price:.2f}",
-                        "size": quantity,
-                        "link": f"https://www.neb.com/products/{material.lower().replace(' ', '-')}",
-                        "is_preferred": preferred_brands.get(material_key) == "New England Biolabs"
-                    })
-                    total_preferred_cost += price if preferred_brands.get(material_key) == "New England Biolabs" else 0
-                
-                # Sigma-Aldrich (general)
-                sigma_price = 100 + (hash(material + "sigma") % 80)
-                vendors.append({
-                    "vendor_name": "Sigma-Aldrich",
-                    "product_id": f"S{hash(material + 'sigma') % 10000}",
-                    "price": f"${sigma_price:.2f}",
-                    "size": quantity,
-                    "link": f"https://www.sigmaaldrich.com/catalog/search?term={material.replace(' ', '%20')}",
-                    "is_preferred": preferred_brands.get(material_key) == "Sigma-Aldrich" or request.supplier_preference == "sigma"
-                })
-                
-                # Thermo Fisher
-                thermo_price = 120 + (hash(material + "thermo") % 90)
-                vendors.append({
-                    "vendor_name": "Thermo Fisher Scientific",
-                    "product_id": f"TF{hash(material + 'thermo') % 10000}",
-                    "price": f"${thermo_price:.2f}",
-                    "size": quantity,
-                    "link": f"https://www.thermofisher.com/search/results?query={material.replace(' ', '+')}",
-                    "is_preferred": preferred_brands.get(material_key) == "Thermo Fisher" or request.supplier_preference == "thermo"
-                })
-                
-                # Calculate costs
-                preferred_vendor = next((v for v in vendors if v.get('is_preferred')), vendors[0])
-                lowest_vendor = min(vendors, key=lambda v: float(v.get('price', '$0').replace('$', '')))
-                
-                total_preferred_cost += float(preferred_vendor.get('price', '$0').replace('$', ''))
-                total_lowest_cost += float(lowest_vendor.get('price', '$0').replace('$', ''))
-                
-                # Sort vendors: preferred first, then by price
-                vendors.sort(key=lambda v: (not v.get('is_preferred', False), 
-                                          float(v.get('price', '$0').replace('$', ''))))
-                
-                processed_materials.append({
-                    "name": material,
-                    "quantity": quantity,
-                    "vendors": vendors[:3],  # Top 3 vendors
-                    "summary": f"Ollama found {len(vendors)} suppliers via Gemini search. " + 
-                              ("Preferred vendor available." if any(v.get('is_preferred') for v in vendors) 
-                               else "No preferred vendor specified.")
-                })
-            
-            # Prepare response data
-            response_data = {
-                "materials": processed_materials,
+                row, prices = self._procurement_material(
+                    material, quantity, catalog_results[material], preferred_brands, request
+                )
+                material_prices.append(prices)
+                yield {"event": "material", "index": i, "material": row}
+            
+            # Vendor assignment is solved locally, before waiting on the LLM
+            cost_matrix = CostMatrix.from_prices(material_prices)
+            yield {
+                "event": "optimized_order",
+                **vendor_optimizer.optimize(cost_matrix, materials, request.budget_limit)
+            }
+            
+            if analysis_task is not None:
+                procurement_analysis, provider_used = await analysis_task
+            else:
+                procurement_analysis = f"All {len(materials)} materials found in the vendor catalog."
+                provider_used = "catalog"
+            
+            yield {
+                "event": "summary",
                 "preferred_brands": request.preferred_brands or "Processed by Ollama agent with Gemini search",
-                "total_cost": {
-                    "preferred": f"${total_preferred_cost:.2f}",
-                    "lowest": f"${total_lowest_cost:.2f}",
-                    "savings": f"${abs(total_preferred_cost - total_lowest_cost):.2f}"
-                },
+                "total_cost": cost_matrix.total_cost(),
                 "processing_info": {
                     "agent": "ollama",
                     "llm_backend": request.processing_pipeline.get("llm_backend", "gemini"),
                     "search_providers_used": ["sigma-aldrich", "thermo-fisher", "bio-rad", "neb"],
+                    "catalog_hits": len(materials) - len(missing),
+                    "catalog_misses": missing,
+                    "analysis_provider": provider_used,
                     "analysis_summary": procurement_analysis[:200] + "..." if len(procurement_analysis) > 200 else procurement_analysis
                 }
             }
             
-            return ProcurementResponse(
-                success=True,
-                data=response_data
-            )
-            
+        except LLMNotConfiguredError as e:
+            yield {"event": "error", "error": str(e)}
         except Exception as e:
-            return ProcurementResponse(
-                success=False,
-                error=f"Ollama/Gemini procurement processing failed: {str(e)}"
+            yield {"event": "error", "error": f"Ollama/Gemini procurement processing failed: {str(e)}"}
+        finally:
+            if analysis_task is not None and not analysis_task.done():
+                analysis_task.cancel()
+    
+    @staticmethod
+    def _parse_procurement(request: ProcurementRequest) -> Tuple[List[str], List[str], dict]:
+        """Split the materials and quantities lists and parse "material: brand" lines."""
+        materials = [m.strip() for m in request.materials_list.split('\n') if m.strip()]
+        quantities = [q.strip() for q in request.quantities.split('\n') if q.strip()]
+        
+        preferred_brands = {}
+        if request.preferred_brands:
+            for line in request.preferred_brands.split('\n'):
+                if ':' in line:
+                    material, brand = line.split(':', 1)
+                    preferred_brands[material.strip().lower()] = brand.strip()
+        
+        return materials, quantities, preferred_brands
+    
+    @staticmethod
+    def _procurement_material(
+        material: str,
+        quantity: str,
+        vendors: List[dict],
+        preferred_brands: dict,
+        request: ProcurementRequest
+    ) -> Tuple[dict, List[VendorPrice]]:
+        """
+        Build one material's vendor comparison.
+        
+        Returns:
+            Tuple of (material row, parsed prices of all its vendors)
+        """
+        material_key = material.lower()
+        for vendor in vendors:
+            vendor["is_preferred"] = is_vendor(preferred_brands.get(material_key), vendor["vendor_name"]) or (
+                is_vendor(request.supplier_preference, vendor["vendor_name"])
             )
+        
+        if not vendors:
+            return {
+                "name": material,
+                "quantity": quantity,
+                "vendors": [],
+                "summary": "Not in the vendor catalog. See the analysis for sourcing suggestions."
+            }, []
+        
+        # Sort vendors: preferred first, then by price
+        prices = price_vendors(vendors)
+        
+        return {
+            "name": material,
+            "quantity": quantity,
+            "vendors": vendors[:3],  # Top 3 vendors
+            "summary": f"Found {len(vendors)} suppliers in the vendor catalog. " + 
+                      ("Preferred vendor available." if any(v.get('is_preferred') for v in vendors) 
+                       else "No preferred vendor specified.")
+        }, prices
+    
+    async def _procurement_analysis(
+        self,
+        missing: List[str],
+        preferred_brands: dict,
+        request: ProcurementRequest
+    ) -> Tuple[str, str]:
+        """Ask the LLM about materials the catalog does not carry; returns (analysis, provider)."""
+        # Create Ollama prompt for the materials the catalog does not carry
+        ollama_prompt = f"""
+        You are a laboratory procurement assistant working with Gemini search capabilities.
+        
+        These materials are not in our supplier catalog:
+        - Materials: {missing}
+        - Preferred Brands: {preferred_brands}
+        - Budget Limit: {request.budget_limit}
+        - Urgency: {request.urgency}
+        - Supplier Preference: {request.supplier_preference}
+        
+        For each material:
+        1. Suggest suitable suppliers among Sigma-Aldrich, Thermo Fisher, Bio-Rad and NEB
+        2. Give likely product names and catalog numbers to search for
+        3. Note typical pack sizes and price ranges
+        
+        Focus on scientific accuracy and laboratory purchasing best practices.
+        """
+        
+        # Use LLM service to process through Ollama/Gemini pipeline
+        try:
+            return await llm_service.generate(
+                "You are a laboratory procurement assistant with access to supplier databases.",
+                ollama_prompt,
+                request.processing_pipeline.get("llm_backend", "gemini")
+            )
+        except Exception as llm_error:
+            # If LLM service fails, provide a helpful error message
+            if "No LLM providers are available" in str(llm_error):
+                raise LLMNotConfiguredError(
+                    "LLM service not configured. Please set up API keys in backend/.env file. See backend/.env.example for required keys."
+                )
+            # For other LLM errors, still return the catalog results
+            return "LLM service unavailable; showing catalog results only", "catalog"
     
     async def upload_inventory(self, file) -> InventoryUploadResponse:
         """
@@ -0,0 +1,170 @@
+"""Latency- and error-aware selection between LLM providers."""
+
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+
+class ProviderStats:
+    """Exponentially weighted statistics for one provider/model pair."""
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.latency: Optional[float] = None
+        self.tokens_per_second: Optional[float] = None
+        self.error_rate = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.last_error: Optional[str] = None
+        self.last_updated: Optional[float] = None
+
+    def _ewma(self, current: Optional[float], value: float) -> float:
+        return value if current is None else self.alpha * value + (1 - self.alpha) * current
+
+    def record_success(self, latency: float, tokens: int):
+        self.latency = self._ewma(self.latency, latency)
+        if latency > 0:
+            self.tokens_per_second = self._ewma(self.tokens_per_second, tokens / latency)
+        self.error_rate = self._ewma(self.error_rate, 0.0)
+        self.successes += 1
+        self.last_updated = time.time()
+
+    def record_failure(self, error: str, timeout: bool):
+        self.error_rate = self._ewma(self.error_rate, 1.0)
+        self.failures += 1
+        if timeout:
+            self.timeouts += 1
+        self.last_error = error[:200]
+        self.last_updated = time.time()
+
+    def as_dict(self) -> dict:
+        return {
+            "ewma_latency_seconds": round(self.latency, 3) if self.latency is not None else None,
+            "tokens_per_second": round(self.tokens_per_second, 1)
+            if self.tokens_per_second is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "last_error": self.last_error,
+            "last_updated": self.last_updated
+        }
+
+
+class ProviderRouter:
+    """
+    Chooses a provider from rolling per-provider statistics.
+
+    Providers whose error rate is above the threshold are treated as
+    unhealthy. Among the healthy ones the router picks the lowest expected
+    latency, where expected latency is the EWMA latency inflated by the
+    error rate (a failed call has to be repeated elsewhere). Providers
+    without data use a neutral prior so they still get traffic, and an
+    unhealthy provider becomes eligible again once it has been left alone
+    for `recovery_seconds`, so its statistics can recover.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.2,
+        unhealthy_error_rate: float = 0.5,
+        prior_latency: float = 15.0,
+        recovery_seconds: float = 60.0
+    ):
+        self.alpha = alpha
+        self.unhealthy_error_rate = unhealthy_error_rate
+        self.prior_latency = prior_latency
+        self.recovery_seconds = recovery_seconds
+        self._stats: Dict[str, Dict[str, ProviderStats]] = {}
+        self._decisions = deque(maxlen=50)
+
+    def _entry(self, provider: str, model: str) -> ProviderStats:
+        models = self._stats.setdefault(provider, {})
+        if model not in models:
+            models[model] = ProviderStats(self.alpha)
+        return models[model]
+
+    def record_success(self, provider: str, model: str, latency: float, tokens: int):
+        self._entry(provider, model).record_success(latency, tokens)
+
+    def record_failure(self, provider: str, model: str, error: str, timeout: bool = False):
+        self._entry(provider, model).record_failure(error, timeout)
+
+    def _aggregate(self, provider: str) -> Optional[ProviderStats]:
+        """Pick the provider's most recently updated model stats."""
+        models = self._stats.get(provider)
+        if not models:
+            return None
+        return max(models.values(), key=lambda stats: stats.last_updated or 0)
+
+    def is_healthy(self, provider: str) -> bool:
+        stats = self._aggregate(provider)
+        if stats is None or stats.error_rate < self.unhealthy_error_rate:
+            return True
+        return time.time() - (stats.last_updated or 0) >= self.recovery_seconds
+
+    def expected_latency(self, provider: str) -> float:
+        stats = self._aggregate(provider)
+        if stats is None or stats.latency is None:
+            return self.prior_latency
+        return stats.latency / max(1 - stats.error_rate, 0.05)
+
+    def choose(self, candidates: List[str], requested: Optional[str] = None) -> str:
+        """
+        Return the provider to use from `candidates`.
+
+        The requested provider is kept while it is healthy; otherwise the
+        healthy candidate with the lowest expected latency is chosen. If no
+        candidate is healthy, the least bad one is used.
+        """
+        if not candidates:
+            raise ValueError("No candidate providers to route between")
+
+        if requested in candidates and self.is_healthy(requested):
+            return requested
+
+        healthy = [p for p in candidates if self.is_healthy(p)]
+        pool = healthy or candidates
+        chosen = min(pool, key=self.expected_latency)
+
+        self._decisions.append({
+            "time": time.time(),
+            "requested": requested,
+            "chosen": chosen,
+            "reason": self._reason(requested, candidates) + (
+                "" if healthy else "; no healthy providers"
+            ),
+            "expected_latency_seconds": {
+                p: round(self.expected_latency(p), 3) for p in candidates
+            }
+        })
+        return chosen
+
+    @staticmethod
+    def _reason(requested: Optional[str], candidates: List[str]) -> str:
+        if requested is None:
+            return "no provider requested"
+        if requested not in candidates:
+            return "requested provider unavailable"
+        return "requested provider unhealthy"
+
+    def state(self) -> dict:
+        """Per-provider statistics and the most recent routing decisions."""
+        return {
+            "policy": {
+                "alpha": self.alpha,
+                "unhealthy_error_rate": self.unhealthy_error_rate,
+                "prior_latency_seconds": self.prior_latency,
+                "recovery_seconds": self.recovery_seconds
+            },
+            "providers": {
+                provider: {
+                    "healthy": self.is_healthy(provider),
+                    "expected_latency_seconds": round(self.expected_latency(provider), 3),
+                    "models": {model: stats.as_dict() for model, stats in models.items()}
+                }
+                for provider, models in self._stats.items()
+            },
+            "recent_decisions": list(self._decisions)
+        }
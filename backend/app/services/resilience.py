@@ -0,0 +1,196 @@
+"""Error classification, retries and circuit breakers for LLM providers."""
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+from app.services.admission import ProviderOverloadedError
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Exception class names used by the provider SDKs for transient failures
+RETRYABLE_ERROR_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "RateLimitError",
+    "InternalServerError",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "TooManyRequests",
+    "ResourceExhausted",
+    "GatewayTimeout",
+    "BadGateway",
+}
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """Extract an HTTP-like status code from an SDK exception, if any."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Decide whether a provider error is transient and worth retrying."""
+    if isinstance(error, ProviderError):
+        return error.retryable
+    if isinstance(error, ProviderOverloadedError):
+        # Local admission control already decided; don't hammer the queue
+        return False
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """
+    Decide whether an error counts against a provider's circuit breaker.
+
+    Transient errors, timeouts and 5xx responses do; 4xx responses such as a
+    malformed prompt or a bad key for one request do not, so a few bad
+    requests cannot open the circuit for every caller.
+    """
+    if is_retryable(error):
+        return True
+    status = error.status_code if isinstance(error, ProviderError) else _status_code(error)
+    return status is not None and status >= 500
+
+
+class ProviderError(Exception):
+    """A failed provider call, classified as retryable or not."""
+
+    def __init__(self, provider: str, message: str, cause: Optional[BaseException] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.cause = cause
+        self.status_code = _status_code(cause) if cause is not None else None
+        self.retryable = is_retryable(cause) if cause is not None else False
+
+
+class CircuitOpenError(ProviderError):
+    """Raised without calling a provider whose circuit breaker is open."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(provider, f"Circuit breaker open for {provider}; skipping provider")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    After `failure_threshold` consecutive failures the breaker opens and the
+    provider is skipped without making a call. Once `reset_timeout` has
+    passed it goes half-open and lets a single probe request through; a
+    successful probe closes the breaker, a failed one opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._counters = {"opened": 0, "short_circuited": 0}
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected (does not consume the half-open probe)."""
+        state = self.state
+        return state == self.OPEN or (state == self.HALF_OPEN and self._probe_in_flight)
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe through."""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def allow_request(self) -> bool:
+        """Return True if a call may proceed, claiming the probe slot when half-open."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self._counters["short_circuited"] += 1
+        return False
+
+    def release_probe(self):
+        """Give back a half-open probe slot whose call ended without a verdict."""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self._state = self.CLOSED
+        self._failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self._counters["opened"] += 1
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "retry_after_seconds": round(self.retry_after(), 1),
+            **self._counters
+        }
+
+
+async def retry_with_backoff(
+    call: Callable[[], Awaitable[T]],
+    deadline: float,
+    max_attempts: int = 3,
+    base_delay: float = 0.5,
+    max_delay: float = 8.0
+) -> T:
+    """
+    Run `call`, retrying retryable errors with full-jitter exponential backoff.
+
+    `deadline` is an absolute time.monotonic() value; no retry is started if
+    its backoff sleep would end past the deadline.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return await call()
+        except Exception as e:
+            if attempt >= max_attempts or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+            if time.monotonic() + delay >= deadline:
+                raise
+            await asyncio.sleep(delay)
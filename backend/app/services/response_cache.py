@@ -0,0 +1,183 @@
+"""Two-tier cache for LLM responses."""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+
+class ResponseCache:
+    """
+    Cache for generated LLM text.
+
+    Entries live in an in-memory LRU for the current process and in a SQLite
+    file that survives restarts and is shared by every worker pointing at the
+    same path. Both tiers expire entries after a TTL and evict the least
+    recently used entries once they are full.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: int = 86400,
+        max_entries: int = 256,
+        max_disk_entries: int = 5000
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "writes": 0,
+            "evictions": 0
+        }
+        self._init_db()
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        temperature: float,
+        max_tokens: int
+    ) -> str:
+        """Build a cache key from everything that affects the generated text."""
+        payload = json.dumps({
+            "provider": provider,
+            "model": model,
+            "system": hashlib.sha256(system_prompt.encode("utf-8")).hexdigest(),
+            "user": user_prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on a miss."""
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self._counters["hits"] += 1
+                self._counters["memory_hits"] += 1
+                return value
+            del self._memory[key]
+
+        row = await asyncio.to_thread(self._disk_get, key, now)
+        if row is not None:
+            value, expires_at = row
+            self._remember(key, value, expires_at)
+            self._counters["hits"] += 1
+            self._counters["disk_hits"] += 1
+            return value
+
+        self._counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        """Store a response in both tiers."""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        self._remember(key, value, expires_at)
+        self._counters["writes"] += 1
+        await asyncio.to_thread(self._disk_set, key, value, now, expires_at)
+
+    def clear(self):
+        """Drop every cached response."""
+        self._memory.clear()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    async def stats(self) -> dict:
+        """Return hit/miss counters and tier sizes."""
+        disk_entries = await asyncio.to_thread(self._disk_count)
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": disk_entries
+        }
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        """Insert into the memory tier, evicting the least recently used entry."""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Open a short-lived connection to the disk tier and commit on exit."""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        """Create the disk tier table if it does not exist."""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)"
+            )
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[str, float]]:
+        """Read a live entry from the disk tier and refresh its access time."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+                )
+        return row
+
+    def _disk_set(self, key: str, value: str, now: float, expires_at: float):
+        """Write an entry to the disk tier and enforce TTL and size limits."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now)
+            )
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            evicted = conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,)
+            ).rowcount
+        self._counters["evictions"] += max(evicted, 0)
+
+    def _disk_count(self) -> int:
+        """Count entries in the disk tier."""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
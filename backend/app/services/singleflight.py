@@ -0,0 +1,127 @@
+"""Coalescing of identical in-flight requests."""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    """One shared upstream call and the number of callers waiting on it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _SharedStream:
+    """One shared upstream stream, buffered so late subscribers can replay it."""
+
+    def __init__(self):
+        self.items: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.condition = asyncio.Condition()
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class SingleFlight:
+    """
+    Share one upstream call between identical concurrent requests.
+
+    The first caller for a key starts the work in a background task and
+    every caller that arrives while it is running awaits the same task.
+    Streams are buffered and fanned out, so a subscriber that joins late
+    first replays what has already been produced. Work is cancelled only
+    when every caller has gone away.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _SharedStream] = {}
+        self._counters = {"leaders": 0, "coalesced": 0, "stream_leaders": 0, "stream_coalesced": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run `fn` once per key at a time and return its result to every caller."""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(self._calls, key, call))
+            self._counters["leaders"] += 1
+        else:
+            self._counters["coalesced"] += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    async def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[T]]
+    ) -> AsyncIterator[T]:
+        """Iterate a stream that is shared by every concurrent subscriber of `key`."""
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            shared.task = asyncio.create_task(self._pump(key, shared, factory()))
+            self._counters["stream_leaders"] += 1
+        else:
+            self._counters["stream_coalesced"] += 1
+
+        shared.subscribers += 1
+        index = 0
+        try:
+            while True:
+                async with shared.condition:
+                    await shared.condition.wait_for(
+                        lambda: index < len(shared.items) or shared.done
+                    )
+                while index < len(shared.items):
+                    yield shared.items[index]
+                    index += 1
+                if shared.done and index >= len(shared.items):
+                    if shared.error is not None:
+                        raise shared.error
+                    return
+        finally:
+            shared.subscribers -= 1
+            if shared.subscribers == 0 and not shared.task.done():
+                shared.task.cancel()
+
+    async def _pump(self, key: str, shared: _SharedStream, source: AsyncIterator[T]):
+        """Copy the upstream stream into the shared buffer."""
+        try:
+            async for item in source:
+                shared.items.append(item)
+                async with shared.condition:
+                    shared.condition.notify_all()
+        except Exception as e:
+            shared.error = e
+        finally:
+            shared.done = True
+            self._forget(self._streams, key, shared)
+            async with shared.condition:
+                shared.condition.notify_all()
+
+    @staticmethod
+    def _forget(registry: dict, key: str, entry):
+        if registry.get(key) is entry:
+            del registry[key]
+
+    def stats(self) -> dict:
+        """Leader/coalesced counters and the number of calls currently in flight."""
+        total = self._counters["leaders"] + self._counters["coalesced"]
+        return {
+            **self._counters,
+            "coalesced_ratio": round(self._counters["coalesced"] / total, 4) if total else 0.0,
+            "in_flight": len(self._calls),
+            "streams_in_flight": len(self._streams)
+        }
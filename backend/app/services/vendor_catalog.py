@@ -0,0 +1,317 @@
+"""Local supplier catalog for procurement lookups."""
+
+import csv
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.services.pricing import CENT, format_money, parse_money
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+DEFAULT_SEED_PATH = BACKEND_DIR / "app" / "data" / "vendor_catalog.csv"
+
+# Bumped when the table layout changes so existing databases are rebuilt
+SCHEMA_VERSION = "2"
+
+# Names people use for each vendor in preferred-brand lists
+VENDOR_ALIASES = {
+    "New England Biolabs": ("new england biolabs", "neb"),
+    "Sigma-Aldrich": ("sigma-aldrich", "sigma aldrich", "sigma", "merck", "millipore sigma"),
+    "Thermo Fisher Scientific": ("thermo fisher scientific", "thermo fisher", "thermo", "thermofisher", "invitrogen", "fisher"),
+    "Bio-Rad": ("bio-rad", "biorad", "bio rad")
+}
+
+_STOPWORDS = frozenset("a an and for from in of or the to with".split())
+
+
+def normalize(text: str) -> str:
+    """Casefold, drop punctuation (keeping hyphens and dots in names) and collapse whitespace."""
+    text = re.sub(r"[^\w\s.%-]", " ", (text or "").casefold())
+    return " ".join(text.split())
+
+
+def is_vendor(brand: Optional[str], vendor_name: str) -> bool:
+    """True if a preferred-brand entry such as "NEB" or "Thermo" names `vendor_name`."""
+    brand = normalize(brand or "")
+    if not brand:
+        return False
+    aliases = VENDOR_ALIASES.get(vendor_name, (normalize(vendor_name),))
+    return brand == normalize(vendor_name) or brand in aliases
+
+
+class VendorCatalog:
+    """
+    Products, catalog numbers, pack sizes and prices from known suppliers.
+
+    The catalog is loaded from a CSV or JSON seed file into SQLite, with an
+    exact alias index, a word-level FTS5 index and a trigram FTS5 index for
+    partial names. The database is rebuilt only when the seed file changes.
+    Lookups are deterministic and cached in memory, so repeated materials
+    are answered without touching SQLite.
+
+    Relative paths are resolved against the backend directory, not the
+    working directory. The database is opened by `open()` at application
+    startup, or on first use outside the app.
+    """
+
+    def __init__(self, path: str, seed_path: Optional[str] = None, cache_size: int = 2048):
+        self.path = path if path == ":memory:" else str(BACKEND_DIR / path)
+        self.seed_path = BACKEND_DIR / seed_path if seed_path else DEFAULT_SEED_PATH
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._counters = {"lookups": 0, "hits": 0, "misses": 0, "cached": 0}
+        self._lookup_seconds = 0.0
+
+    def open(self):
+        """Connect to the database and load the seed file if it changed."""
+        with self._lock:
+            if self._conn is None:
+                conn = sqlite3.connect(self.path, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                self._conn = conn
+        self.load()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._cache.clear()
+
+    def load(self):
+        """(Re)build the database if the seed file changed since the last load."""
+        if self._conn is None:
+            return self.open()
+        if self.seed_path.exists():
+            digest = hashlib.sha256(self.seed_path.read_bytes()).hexdigest()
+            seed_hash = f"{SCHEMA_VERSION}:{digest}"
+        else:
+            print(f"Vendor catalog seed not found: {self.seed_path}")
+            seed_hash = ""
+        with self._lock:
+            conn = self._conn
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = conn.execute("SELECT value FROM meta WHERE key = 'seed_hash'").fetchone()
+            if row is not None and row["value"] == seed_hash:
+                return
+            self._rebuild(self._read_seed() if seed_hash else [], seed_hash)
+            self._cache.clear()
+
+    def _read_seed(self) -> List[Dict]:
+        if self.seed_path.suffix.lower() == ".json":
+            products = json.loads(self.seed_path.read_text(encoding="utf-8"))
+        else:
+            with open(self.seed_path, newline="", encoding="utf-8") as f:
+                products = list(csv.DictReader(f))
+        for product in products:
+            aliases = product.get("aliases") or []
+            if isinstance(aliases, str):
+                aliases = aliases.split(";")
+            product["aliases"] = [normalize(a) for a in aliases if a.strip()]
+        priced = []
+        for product in products:
+            price = parse_money(product.get("price"))
+            if price is None:
+                print(f"Skipping catalog product {product.get('catalog_number')}: unreadable price {product.get('price')!r}")
+                continue
+            product["price_cents"] = int((price / CENT).to_integral_value(ROUND_HALF_UP))
+            priced.append(product)
+        return priced
+
+    def _rebuild(self, products: Iterable[Dict], seed_hash: str):
+        conn = self._conn
+        with conn:
+            conn.executescript(
+                """
+                DROP TABLE IF EXISTS products;
+                DROP TABLE IF EXISTS aliases;
+                DROP TABLE IF EXISTS products_fts;
+                DROP TABLE IF EXISTS products_trigram;
+                CREATE TABLE products (
+                    id INTEGER PRIMARY KEY,
+                    vendor TEXT NOT NULL,
+                    catalog_number TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    category TEXT,
+                    pack_size TEXT,
+                    price_cents INTEGER NOT NULL,
+                    currency TEXT NOT NULL DEFAULT 'USD',
+                    url TEXT,
+                    availability TEXT,
+                    UNIQUE (vendor, catalog_number)
+                );
+                CREATE TABLE aliases (alias TEXT NOT NULL, product_id INTEGER NOT NULL);
+                CREATE INDEX idx_aliases ON aliases(alias);
+                CREATE VIRTUAL TABLE products_fts USING fts5(
+                    name, aliases, tokenize='unicode61 remove_diacritics 2'
+                );
+                CREATE VIRTUAL TABLE products_trigram USING fts5(
+                    name, aliases, tokenize='trigram'
+                );
+                """
+            )
+            for product in products:
+                product_id = conn.execute(
+                    "INSERT INTO products (vendor, catalog_number, name, category, pack_size, "
+                    "price_cents, currency, url, availability) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        product["vendor"], product["catalog_number"], product["name"],
+                        product.get("category"), product.get("pack_size"), product["price_cents"],
+                        product.get("currency") or "USD", product.get("url"),
+                        product.get("availability") or "In Stock"
+                    )
+                ).lastrowid
+                names = [normalize(product["name"]), *product["aliases"]]
+                conn.executemany(
+                    "INSERT INTO aliases (alias, product_id) VALUES (?, ?)",
+                    [(alias, product_id) for alias in dict.fromkeys(names)]
+                )
+                for table in ("products_fts", "products_trigram"):
+                    conn.execute(
+                        f"INSERT INTO {table} (rowid, name, aliases) VALUES (?, ?, ?)",
+                        (product_id, product["name"], " ; ".join(product["aliases"]))
+                    )
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('seed_hash', ?)", (seed_hash,)
+            )
+
+    def lookup(self, material: str) -> List[Dict]:
+        """
+        Find the best matching product from each vendor for a material.
+
+        Args:
+            material: Material name as written in the bill of materials
+
+        Returns:
+            One row per vendor, best match first; empty if the catalog has
+            nothing for the material
+        """
+        if self._conn is None:
+            self.open()
+        started = time.perf_counter()
+        key = normalize(material)
+        with self._lock:
+            self._counters["lookups"] += 1
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._counters["cached"] += 1
+                rows = self._cache[key]
+            else:
+                rows = self._search(material) if key else []
+                self._cache[key] = rows
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            self._counters["hits" if rows else "misses"] += 1
+            self._lookup_seconds += time.perf_counter() - started
+        return [dict(row) for row in rows]
+
+    def _search(self, material: str) -> List[Dict]:
+        """Exact alias and all-words FTS matches, else partial-word trigram matches."""
+        conn = self._conn
+        key = normalize(material)
+        ids: List[int] = []
+        # Qualifiers in parentheses ("Agarose (molecular grade)") are tried without
+        for variant in dict.fromkeys([key, normalize(re.sub(r"\(.*?\)", " ", material))]):
+            ids = self._word_matches(variant)
+            if ids:
+                break
+
+        tokens = [t for t in re.findall(r"[\w.%-]+", key) if t not in _STOPWORDS]
+        long_tokens = [t for t in tokens if len(t) >= 3]
+        if not ids and long_tokens:
+            # Any token may match part of a word; keep products covering most tokens
+            query = " OR ".join('"' + t.replace('"', '""') + '"' for t in long_tokens)
+            scored = []
+            for row in conn.execute(
+                "SELECT rowid, name, aliases FROM products_trigram WHERE products_trigram MATCH ? "
+                "ORDER BY bm25(products_trigram)",
+                (query,)
+            ):
+                text = normalize(f"{row['name']} {row['aliases']}")
+                covered = sum(1 for t in long_tokens if t in text)
+                if covered * 2 >= len(long_tokens):
+                    scored.append((-covered, len(scored), row["rowid"]))
+            ids = [rowid for _, _, rowid in sorted(scored)]
+
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        products = {
+            row["id"]: row for row in conn.execute(
+                f"SELECT * FROM products WHERE id IN ({placeholders})", ids
+            )
+        }
+        best_per_vendor: Dict[str, Dict] = {}
+        for product_id in ids:
+            product = products[product_id]
+            if product["vendor"] not in best_per_vendor:
+                best_per_vendor[product["vendor"]] = self._vendor_row(product)
+        return list(best_per_vendor.values())
+
+    def _word_matches(self, key: str) -> List[int]:
+        """Products whose name or alias equals `key`, then those containing all its words."""
+        conn = self._conn
+        ids = [
+            row["product_id"]
+            for row in conn.execute("SELECT product_id FROM aliases WHERE alias = ?", (key,))
+        ]
+        tokens = [t for t in re.findall(r"[\w.%-]+", key) if t not in _STOPWORDS]
+        if tokens:
+            query = " AND ".join('"' + t.replace('"', '""') + '"' for t in tokens)
+            ids += [
+                row["rowid"] for row in conn.execute(
+                    "SELECT rowid FROM products_fts WHERE products_fts MATCH ? ORDER BY bm25(products_fts)",
+                    (query,)
+                )
+            ]
+        return list(dict.fromkeys(ids))
+
+    @staticmethod
+    def _vendor_row(product: sqlite3.Row) -> Dict:
+        """
+        Product in the vendor-comparison shape used by procurement responses.
+
+        ``price_cents`` carries the exact price; ``price`` is only for display.
+        """
+        return {
+            "vendor_name": product["vendor"],
+            "product_id": product["catalog_number"],
+            "product_name": product["name"],
+            "price": format_money(Decimal(product["price_cents"]) * CENT),
+            "price_cents": product["price_cents"],
+            "size": product["pack_size"],
+            "link": product["url"],
+            "availability": product["availability"],
+            "source": "catalog"
+        }
+
+    def stats(self) -> Dict:
+        if self._conn is None:
+            self.open()
+        with self._lock:
+            products = self._conn.execute(
+                "SELECT vendor, COUNT(*) AS n FROM products GROUP BY vendor"
+            ).fetchall()
+            lookups = self._counters["lookups"]
+            return {
+                **self._counters,
+                "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                "avg_lookup_ms": round(self._lookup_seconds / lookups * 1000, 4) if lookups else 0.0,
+                "products": {row["vendor"]: row["n"] for row in products}
+            }
+
+
+vendor_catalog = VendorCatalog(
+    path=settings.vendor_catalog_path,
+    seed_path=settings.vendor_catalog_seed_path or None
+)
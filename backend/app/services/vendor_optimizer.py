@@ -0,0 +1,155 @@
+"""Budget-constrained vendor assignment for procurement orders."""
+
+import itertools
+import time
+from decimal import Decimal
+from typing import Dict, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.pricing import CENT, CostMatrix, format_money, parse_money
+
+
+class VendorOptimizer:
+    """
+    Chooses one vendor per material for a procurement order.
+
+    Assignments are ranked by, in order: staying within the budget, the
+    number of materials bought from a preferred vendor, then the order cost
+    plus `shipment_cost` for every vendor shipped from; shipments count
+    toward the budget. For a fixed set of vendors the best assignment
+    follows directly: buy each material at its cheapest offer, then switch
+    to preferred offers in order of extra cost while the budget allows.
+    Orders with few vendors try every vendor set; larger ones start from all
+    vendors and drop vendors while that improves the order.
+    """
+
+    def __init__(self, shipment_cost: float = 15.0, exact_max_subsets: int = 1024):
+        self.shipment_cost = shipment_cost
+        self.exact_max_subsets = exact_max_subsets
+
+    def optimize(
+        self,
+        matrix: CostMatrix,
+        materials: Sequence[str],
+        budget_limit: Union[str, Decimal, None] = None
+    ) -> Dict:
+        """
+        Assign a vendor to every material the matrix has offers for.
+
+        Args:
+            matrix: Materials x vendors cost matrix, rows in `materials` order
+            materials: Material names
+            budget_limit: Limit on the order total plus shipments, as a Decimal
+                or the user's text ("$500", "2.5k"); empty for no limit
+
+        Returns:
+            Assignments, vendors used, totals and how the solution was found
+        """
+        started = time.perf_counter()
+        warnings = []
+        budget = parse_money(budget_limit)
+        if budget is None and isinstance(budget_limit, str) and budget_limit.strip():
+            warnings.append(f"Budget limit {budget_limit!r} is not a single amount and was ignored")
+        offered = (
+            ~np.isinf(matrix.costs).all(axis=1) if matrix.vendors
+            else np.zeros(len(materials), dtype=bool)
+        )
+        costs = matrix.costs[offered]
+        preferred = matrix.preferred[offered]
+        budget_cents = float(budget / CENT) if budget is not None else None
+        shipment_cents = self.shipment_cost * 100
+
+        def evaluate(columns: Tuple[int, ...]):
+            """Best assignment using only `columns`; None if they miss a material."""
+            offers = costs[:, columns]
+            cheapest = offers.min(axis=1)
+            if np.isinf(cheapest).any():
+                return None
+            extra = np.where(preferred[:, columns], offers, np.inf).min(axis=1) - cheapest
+            candidates = np.flatnonzero(np.isfinite(extra))
+            upgrades = candidates[np.argsort(extra[candidates], kind="stable")]
+            steps = np.cumsum(extra[upgrades])
+            base = float(cheapest.sum()) + shipment_cents * len(columns)
+            if budget_cents is None:
+                count = len(upgrades)
+            elif base > budget_cents:
+                count = 0
+            else:
+                count = int(np.searchsorted(steps, budget_cents - base, side="right"))
+            total = base + (float(steps[count - 1]) if count else 0.0)
+            within_budget = budget_cents is None or total <= budget_cents
+            key = (not within_budget, -count, total)
+            return key, columns, upgrades[:count]
+
+        n_vendors = len(matrix.vendors)
+        best = None
+        if not offered.any():
+            method = "none"
+        elif 2 ** n_vendors - 1 <= self.exact_max_subsets:
+            method = "exact"
+            for size in range(1, n_vendors + 1):
+                for columns in itertools.combinations(range(n_vendors), size):
+                    result = evaluate(columns)
+                    if result and (best is None or result[0] < best[0]):
+                        best = result
+        else:
+            method = "heuristic"
+            best = evaluate(tuple(range(n_vendors)))
+            while len(best[1]) > 1:
+                trials = [
+                    result for result in (
+                        evaluate(tuple(c for c in best[1] if c != drop)) for drop in best[1]
+                    ) if result
+                ]
+                candidate = min(trials, key=lambda result: result[0], default=None)
+                if candidate is None or candidate[0] >= best[0]:
+                    break
+                best = candidate
+
+        assignments = [
+            {"material": material, "vendor_name": None, "price": None, "is_preferred": False}
+            for material in materials
+        ]
+        vendors_used = []
+        total_cents = 0
+        if best is not None:
+            _, columns, upgraded = best
+            offers = costs[:, columns]
+            choice = offers.argmin(axis=1)
+            choice[upgraded] = np.where(preferred[:, columns], offers, np.inf).argmin(axis=1)[upgraded]
+            for row, column in zip(np.flatnonzero(offered), np.array(columns)[choice]):
+                vendor_name = matrix.vendors[column]
+                cents = int(matrix.costs[row, column])
+                total_cents += cents
+                if vendor_name not in vendors_used:
+                    vendors_used.append(vendor_name)
+                assignments[row].update(
+                    vendor_name=vendor_name,
+                    price=format_money(Decimal(cents) * CENT),
+                    is_preferred=bool(matrix.preferred[row, column])
+                )
+
+        order_total = Decimal(total_cents) * CENT
+        shipment_cost = Decimal(str(self.shipment_cost)) * len(vendors_used)
+        return {
+            "assignments": assignments,
+            "vendors_used": vendors_used,
+            "order_total": format_money(order_total),
+            "shipment_cost": format_money(shipment_cost),
+            "total_with_shipments": format_money(order_total + shipment_cost),
+            "budget": format_money(budget) if budget is not None else None,
+            "within_budget": budget is None or order_total + shipment_cost <= budget,
+            "warnings": warnings,
+            "preferred_honored": sum(1 for a in assignments if a["is_preferred"]),
+            "preferred_available": int(preferred.any(axis=1).sum()) if preferred.size else 0,
+            "method": method,
+            "solve_ms": round((time.perf_counter() - started) * 1000, 3)
+        }
+
+
+vendor_optimizer = VendorOptimizer(
+    shipment_cost=settings.procurement_shipment_cost,
+    exact_max_subsets=settings.procurement_exact_max_subsets
+)
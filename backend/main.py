@@ -1,15 +1,37 @@
 """Main FastAPI application for Proto-Gen."""
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.api.routes import router
 from app.core.config import settings
+from app.services.llm_service import llm_service
+from app.services.job_service import job_service
+from app.services.local_ai_service import local_ai_service
+from app.services.vendor_catalog import vendor_catalog
+from app.services.admission import ProviderOverloadedError
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start up and shut down shared resources."""
+    vendor_catalog.open()
+    await local_ai_service.startup()
+    await job_service.start()
+    yield
+    await job_service.stop()
+    await local_ai_service.aclose()
+    await llm_service.aclose()
+    vendor_catalog.close()
+
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    description="AI-powered laboratory protocol generation and troubleshooting assistant"
+    description="AI-powered laboratory protocol generation and troubleshooting assistant",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -21,6 +43,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(ProviderOverloadedError)
+async def provider_overloaded_handler(request: Request, exc: ProviderOverloadedError):
+    """Reject overloaded requests fast with a Retry-After hint."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 # Include API routes with both prefixes for compatibility
 app.include_router(router, prefix="/api/v1", tags=["protocols"])
 app.include_router(router, prefix="/api", tags=["protocols"])
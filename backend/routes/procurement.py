@@ -1,11 +1,16 @@
 from fastapi import APIRouter, HTTPException, Header
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import json
 import asyncio
+import time
+import zlib
 import httpx
 from datetime import datetime
 import logging
+from app.services.vendor_catalog import vendor_catalog, is_vendor
+from app.services.pricing import CostMatrix, price_vendors
+from app.services.vendor_optimizer import vendor_optimizer
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -31,6 +36,10 @@ class ProcurementResponse(BaseModel):
 OLLAMA_BASE_URL = "http://localhost:11434"
 GEMINI_API_KEY = "your-gemini-api-key"  # Replace with actual API key
 
+# Supplier search fan-out
+SEARCH_CONCURRENCY = 8  # Materials searched at the same time
+MATERIAL_SEARCH_TIMEOUT = 15.0  # Seconds before one material's search is given up
+
 async def call_ollama(prompt: str, model: str = "llama2") -> str:
     """Call Ollama API for processing"""
     try:
@@ -60,95 +69,125 @@ async def call_ollama(prompt: str, model: str = "llama2") -> str:
         logger.error(f"Error calling Ollama: {str(e)}")
         return ""
 
-async def search_with_gemini(materials: List[str], preferred_brands: Dict[str, str]) -> Dict[str, Any]:
-    """Use Gemini to search for procurement data"""
-    try:
-        # This would be the actual Gemini API call
-        # For now, we'll simulate the search results
-        
-        search_prompt = f"""
-        Search for laboratory reagent pricing and availability for these materials:
-        Materials: {', '.join(materials)}
-        Preferred Brands: {json.dumps(preferred_brands)}
-        
-        Search the following suppliers:
-        - Sigma-Aldrich (sigma-aldrich.com)
-        - Thermo Fisher Scientific (thermofisher.com)
-        - Bio-Rad (bio-rad.com)
-        - New England Biolabs (neb.com)
-        
-        For each material, find:
-        1. Product name and catalog number
-        2. Price per unit/size
-        3. Vendor information
-        4. Direct product links
-        5. Availability status
-        
-        Return results in JSON format with vendor comparisons.
-        """
-        
-        # Simulate Gemini search results
-        await asyncio.sleep(2)  # Simulate search time
-        
-        search_results = {}
-        for material in materials:
-            material_key = material.lower()
-            vendors = []
-            
-            # Simulate vendor-specific results based on material type
-            if "polymerase" in material_key or "enzyme" in material_key:
-                vendors.extend([
-                    {
-                        "vendor_name": "New England Biolabs",
-                        "product_id": f"M{hash(material) % 1000}S",
-                        "price": f"${150 + (hash(material) % 100):.2f}",
-                        "size": "50 units",
-                        "link": f"https://www.neb.com/products/{material.lower().replace(' ', '-')}",
-                        "availability": "In Stock",
-                        "is_preferred": preferred_brands.get(material_key) == "New England Biolabs"
-                    }
-                ])
-            
-            # Always include Sigma-Aldrich and Thermo Fisher
-            vendors.extend([
-                {
-                    "vendor_name": "Sigma-Aldrich",
-                    "product_id": f"S{hash(material + 'sigma') % 10000}",
-                    "price": f"${100 + (hash(material) % 80):.2f}",
-                    "size": "Standard",
-                    "link": f"https://www.sigmaaldrich.com/catalog/search?term={material.replace(' ', '%20')}",
-                    "availability": "In Stock",
-                    "is_preferred": preferred_brands.get(material_key) == "Sigma-Aldrich"
-                },
-                {
-                    "vendor_name": "Thermo Fisher Scientific",
-                    "product_id": f"TF{hash(material + 'thermo') % 10000}",
-                    "price": f"${120 + (hash(material) % 90):.2f}",
-                    "size": "Standard",
-                    "link": f"https://www.thermofisher.com/search/results?query={material.replace(' ', '+')}",
-                    "availability": "In Stock",
-                    "is_preferred": preferred_brands.get(material_key) == "Thermo Fisher"
-                }
-            ])
-            
-            if "agarose" in material_key or "gel" in material_key:
-                vendors.append({
-                    "vendor_name": "Bio-Rad",
-                    "product_id": f"BR{hash(material + 'biorad') % 1000}",
-                    "price": f"${80 + (hash(material) % 60):.2f}",
-                    "size": "Standard",
-                    "link": f"https://www.bio-rad.com/en-us/category/electrophoresis?N={material.replace(' ', '+')}",
-                    "availability": "In Stock",
-                    "is_preferred": preferred_brands.get(material_key) == "Bio-Rad"
-                })
-            
+def stable_hash(text: str) -> int:
+    """Hash that is the same in every process (unlike hash(), which is salted)"""
+    return zlib.crc32(text.encode("utf-8"))
+
+async def search_material(material: str, preferred_brands: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Use Gemini to search supplier data for one material"""
+    # This would be the actual Gemini API call
+    # For now, we'll simulate the search results
+    material_key = material.lower()
+    vendors = []
+    
+    # Simulate vendor-specific results based on material type
+    if "polymerase" in material_key or "enzyme" in material_key:
+        vendors.extend([
+            {
+                "vendor_name": "New England Biolabs",
+                "product_id": f"M{stable_hash(material) % 1000}S",
+                "price": f"${150 + (stable_hash(material) % 100):.2f}",
+                "size": "50 units",
+                "link": f"https://www.neb.com/products/{material.lower().replace(' ', '-')}",
+                "availability": "In Stock",
+                "is_preferred": is_vendor(preferred_brands.get(material_key), "New England Biolabs")
+            }
+        ])
+    
+    # Always include Sigma-Aldrich and Thermo Fisher
+    vendors.extend([
+        {
+            "vendor_name": "Sigma-Aldrich",
+            "product_id": f"S{stable_hash(material + 'sigma') % 10000}",
+            "price": f"${100 + (stable_hash(material) % 80):.2f}",
+            "size": "Standard",
+            "link": f"https://www.sigmaaldrich.com/catalog/search?term={material.replace(' ', '%20')}",
+            "availability": "In Stock",
+            "is_preferred": is_vendor(preferred_brands.get(material_key), "Sigma-Aldrich")
+        },
+        {
+            "vendor_name": "Thermo Fisher Scientific",
+            "product_id": f"TF{stable_hash(material + 'thermo') % 10000}",
+            "price": f"${120 + (stable_hash(material) % 90):.2f}",
+            "size": "Standard",
+            "link": f"https://www.thermofisher.com/search/results?query={material.replace(' ', '+')}",
+            "availability": "In Stock",
+            "is_preferred": is_vendor(preferred_brands.get(material_key), "Thermo Fisher Scientific")
+        }
+    ])
+    
+    if "agarose" in material_key or "gel" in material_key:
+        vendors.append({
+            "vendor_name": "Bio-Rad",
+            "product_id": f"BR{stable_hash(material + 'biorad') % 1000}",
+            "price": f"${80 + (stable_hash(material) % 60):.2f}",
+            "size": "Standard",
+            "link": f"https://www.bio-rad.com/en-us/category/electrophoresis?N={material.replace(' ', '+')}",
+            "availability": "In Stock",
+            "is_preferred": is_vendor(preferred_brands.get(material_key), "Bio-Rad")
+        })
+    
+    return vendors
+
+async def search_with_gemini(
+    materials: List[str],
+    preferred_brands: Dict[str, str]
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Find suppliers for every material, searching concurrently on catalog misses.
+    
+    Materials found in the local vendor catalog are answered from it. The
+    rest are searched with at most SEARCH_CONCURRENCY searches at once and
+    MATERIAL_SEARCH_TIMEOUT seconds each. A material whose search fails or
+    times out gets no vendors; the other results are still returned.
+    
+    Returns:
+        Tuple of (vendors by material, error message by failed material)
+    """
+    search_results = {}
+    misses = []
+    for material in materials:
+        vendors = vendor_catalog.lookup(material)
+        if vendors:
+            for vendor in vendors:
+                vendor["is_preferred"] = is_vendor(preferred_brands.get(material.lower()), vendor["vendor_name"])
             search_results[material] = vendors
-            
-        return search_results
-        
-    except Exception as e:
-        logger.error(f"Error in Gemini search: {str(e)}")
-        return {}
+        else:
+            misses.append(material)
+    
+    semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+    
+    async def bounded_search(material: str) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return await asyncio.wait_for(
+                search_material(material, preferred_brands),
+                timeout=MATERIAL_SEARCH_TIMEOUT
+            )
+    
+    outcomes = await asyncio.gather(
+        *(bounded_search(material) for material in misses),
+        return_exceptions=True
+    )
+    
+    errors = {}
+    for material, outcome in zip(misses, outcomes):
+        if isinstance(outcome, asyncio.TimeoutError):
+            errors[material] = f"Search timed out after {MATERIAL_SEARCH_TIMEOUT:g}s"
+        elif isinstance(outcome, Exception):
+            errors[material] = str(outcome) or type(outcome).__name__
+        else:
+            search_results[material] = outcome
+            continue
+        logger.error(f"Supplier search failed for {material}: {errors[material]}")
+        search_results[material] = []
+    
+    return search_results, errors
+
+async def timed(awaitable) -> Tuple[Any, float]:
+    """Await `awaitable` and return its result with the seconds it took"""
+    started = time.perf_counter()
+    result = await awaitable
+    return result, time.perf_counter() - started
 
 @router.post("/generate-procurement", response_model=ProcurementResponse)
 async def generate_procurement(
@@ -160,6 +199,7 @@ async def generate_procurement(
     """
     Generate procurement analysis using Ollama + Gemini pipeline
     """
+    started = time.perf_counter()
     try:
         logger.info(f"Received procurement request with agent: {x_processing_agent}, backend: {x_llm_backend}")
         
@@ -201,12 +241,16 @@ async def generate_procurement(
         Return a brief analysis of the procurement requirements.
         """
         
-        ollama_analysis = await call_ollama(ollama_prompt)
-        logger.info(f"Ollama analysis complete: {len(ollama_analysis)} characters")
-        
-        # Step 2: Use Gemini for supplier search
+        # Step 2: Use Gemini for supplier search. The search does not need
+        # the pre-analysis, so both run at the same time
         logger.info("Initiating Gemini search for supplier data")
-        gemini_results = await search_with_gemini(materials, preferred_brands)
+        stage_started = time.perf_counter()
+        (ollama_analysis, pre_analysis_time), ((gemini_results, search_errors), search_time) = await asyncio.gather(
+            timed(call_ollama(ollama_prompt)),
+            timed(search_with_gemini(materials, preferred_brands))
+        )
+        parallel_time = time.perf_counter() - stage_started
+        logger.info(f"Ollama analysis complete: {len(ollama_analysis)} characters")
         
         # Step 3: Ollama post-processes Gemini results
         post_process_prompt = f"""
@@ -225,52 +269,65 @@ async def generate_procurement(
         Focus on practical recommendations for laboratory purchasing.
         """
         
-        final_analysis = await call_ollama(post_process_prompt)
+        final_analysis, post_analysis_time = await timed(call_ollama(post_process_prompt))
         
         # Step 4: Format response for frontend
+        formatting_started = time.perf_counter()
         processed_materials = []
-        total_preferred_cost = 0
-        total_lowest_cost = 0
+        material_prices = []
         
         for i, material in enumerate(materials):
             quantity = quantities[i] if i < len(quantities) else "1 unit"
             vendors = gemini_results.get(material, [])
             
             # Sort vendors: preferred first, then by price
-            vendors.sort(key=lambda v: (not v.get('is_preferred', False), 
-                                      float(v.get('price', '$0').replace('$', ''))))
-            
-            # Calculate costs
-            if vendors:
-                preferred_vendor = next((v for v in vendors if v.get('is_preferred')), vendors[0])
-                lowest_vendor = min(vendors, key=lambda v: float(v.get('price', '$0').replace('$', '')))
-                
-                total_preferred_cost += float(preferred_vendor.get('price', '$0').replace('$', ''))
-                total_lowest_cost += float(lowest_vendor.get('price', '$0').replace('$', ''))
+            material_prices.append(price_vendors(vendors))
             
+            if material in search_errors:
+                summary = f"Supplier search failed: {search_errors[material]}"
+            else:
+                summary = f"Found {len(vendors)} suppliers. " + (
+                    "Preferred vendor available." if any(v.get('is_preferred') for v in vendors)
+                    else "No preferred vendor specified."
+                )
             processed_materials.append({
                 "name": material,
                 "quantity": quantity,
                 "vendors": vendors[:3],  # Top 3 vendors
-                "summary": f"Found {len(vendors)} suppliers. " + 
-                          ("Preferred vendor available." if any(v.get('is_preferred') for v in vendors) 
-                           else "No preferred vendor specified.")
+                "summary": summary
             })
         
+        cost_matrix = CostMatrix.from_prices(material_prices)
+        total_cost = cost_matrix.total_cost()
+        optimized_order = vendor_optimizer.optimize(cost_matrix, materials, request.budget_limit)
+        formatting_time = time.perf_counter() - formatting_started
+        total_time = time.perf_counter() - started
+        catalog_hits = sum(
+            1 for vendors in gemini_results.values() if any(v.get("source") == "catalog" for v in vendors)
+        )
+        
         # Prepare final response
         response_data = {
             "materials": processed_materials,
             "preferred_brands": request.preferred_brands or "Processed by Ollama agent with Gemini search",
-            "total_cost": {
-                "preferred": f"${total_preferred_cost:.2f}",
-                "lowest": f"${total_lowest_cost:.2f}",
-                "savings": f"${abs(total_preferred_cost - total_lowest_cost):.2f}"
-            },
+            "total_cost": total_cost,
+            "optimized_order": optimized_order,
             "processing_info": {
                 "agent": "ollama",
                 "llm_backend": "gemini",
                 "search_providers_used": ["sigma-aldrich", "thermo-fisher", "bio-rad", "neb"],
-                "processing_time": "Real-time",
+                "processing_time": f"{total_time:.2f}s",
+                "stage_timings": {
+                    "pre_analysis_seconds": round(pre_analysis_time, 3),
+                    "supplier_search_seconds": round(search_time, 3),
+                    "pre_analysis_and_search_seconds": round(parallel_time, 3),
+                    "post_analysis_seconds": round(post_analysis_time, 3),
+                    "formatting_seconds": round(formatting_time, 3),
+                    "total_seconds": round(total_time, 3)
+                },
+                "catalog_hits": catalog_hits,
+                "materials_searched": len(materials) - catalog_hits - len(search_errors),
+                "search_failures": search_errors,
                 "analysis": ollama_analysis[:200] + "..." if len(ollama_analysis) > 200 else ollama_analysis
             },
             "timestamp": datetime.now().isoformat()
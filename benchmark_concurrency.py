@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Proto-Gen Concurrency Benchmark
+Fires N concurrent /generate calls at a running backend and compares the
+wall-clock time against a single call. With non-blocking provider clients
+the concurrent batch should finish in roughly the time of one request.
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+SAMPLE_REQUEST = {
+    "experimental_goal": "Amplify a 700 bp gene fragment for cloning",
+    "technique": "PCR",
+    "reagents": "Q5 High-Fidelity DNA Polymerase",
+    "template_details": "Plasmid DNA, 10 ng/µL",
+    "amplicon_size": "700 bp",
+    "llm_provider": "gemini",
+    "bypass_cache": True
+}
+
+
+def sample_request(index: int) -> dict:
+    """Distinct payload per call, so caching and request coalescing cannot merge them."""
+    return {
+        **SAMPLE_REQUEST,
+        "experimental_goal": f"{SAMPLE_REQUEST['experimental_goal']} (benchmark run {index})"
+    }
+
+
+async def timed_generate(client: httpx.AsyncClient, url: str, index: int) -> float:
+    """Send one /generate request and return its latency in seconds."""
+    start = time.perf_counter()
+    response = await client.post(url, json=sample_request(index))
+    elapsed = time.perf_counter() - start
+    status = "ok" if response.status_code == 200 else f"HTTP {response.status_code}"
+    print(f"  request finished in {elapsed:6.2f}s ({status})")
+    return elapsed
+
+
+async def run_benchmark(base_url: str, concurrency: int, timeout: float):
+    """Compare one request against a burst of concurrent requests."""
+    url = f"{base_url.rstrip('/')}/api/generate"
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        print("⏱️  Single request baseline")
+        single = await timed_generate(client, url, 0)
+
+        print(f"\n⏱️  {concurrency} concurrent requests")
+        start = time.perf_counter()
+        latencies = await asyncio.gather(
+            *(timed_generate(client, url, i) for i in range(1, concurrency + 1))
+        )
+        total = time.perf_counter() - start
+
+    print("\n📊 Results")
+    print("=" * 50)
+    print(f"Single request:          {single:6.2f}s")
+    print(f"{concurrency} concurrent (wall):  {total:6.2f}s")
+    print(f"Slowest concurrent call: {max(latencies):6.2f}s")
+    print(f"Wall-clock ratio:        {total / single:6.2f}x (1.0x is ideal, {concurrency}x means serialized)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent /generate calls")
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("-n", "--concurrency", type=int, default=5, help="Number of concurrent requests")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.url, args.concurrency, args.timeout))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,23 @@ Proto-Gen Local AI Stack Integration
 Ollama handles all AI processing, Gemini only used for web searches
 """
 
+import asyncio
+import hashlib
+import math
+import re
+import sqlite3
+import time
+import uuid
 import requests
+import httpx
 import json
-from typing import Dict, Any, Optional, List
-from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, AsyncIterator, Callable
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 import logging
 import os
+from pydantic import BaseModel, Field
 
 logger = logging.getLogger(__name__)
 
@@ -16,68 +27,649 @@ logger = logging.getLogger(__name__)
 class LocalAIConfig:
     """Configuration for local AI stack components."""
     ollama_url: str = "http://localhost:11434"
+    ollama_urls: List[str] = field(default_factory=list)  # Several Ollama boxes (ollama_url alone if empty)
     n8n_url: str = "http://localhost:5678"
     default_model: str = "llama3.1:8b"
     gemini_api_key: str = ""
+    ollama_connect_timeout: float = 10.0
+    ollama_read_timeout: float = 300.0  # Max silence between streamed chunks (covers model load)
+    ollama_max_connections: int = 10
+    keep_alive: str = "30m"  # How long Ollama keeps a model loaded after each request
+    warm_models: List[str] = field(default_factory=list)  # Models to preload (default_model if empty)
+    search_deadline: float = 20.0  # Overall time budget for one round of web searches
+    ollama_num_parallel: int = 0  # Concurrent requests Ollama serves per model (0 = OLLAMA_NUM_PARALLEL or 4)
+    search_cache_path: str = "search_cache.sqlite3"  # Empty string disables the web search cache
+    search_cache_ttl: int = 86400
+    search_cache_max_entries: int = 2000
+    ollama_eject_failures: int = 3  # Consecutive failures before a backend is taken out of rotation
+    ollama_eject_seconds: float = 30.0  # How long an ejected backend sits out before it is retried
+    context_window: int = 4096  # Context length the Ollama server runs with (OLLAMA_CONTEXT_LENGTH)
+    context_token_budget: int = 600  # Max tokens of research context added to a prompt
+    context_snippet_tokens: int = 160  # Max tokens taken from any one search result
+    response_reserve_tokens: int = 1536  # Context left free for the generated answer
+    session_idle_seconds: float = 1800.0  # Chat sessions unused for this long are dropped
+    session_max_bytes: int = 20_000_000  # Memory cap for all chat histories together
 
     def __post_init__(self):
         """Load Gemini API key from environment if not provided."""
         if not self.gemini_api_key:
             self.gemini_api_key = os.getenv("GEMINI_API_KEY", "")
+        if not self.ollama_num_parallel:
+            self.ollama_num_parallel = int(os.getenv("OLLAMA_NUM_PARALLEL") or 4)
+        if not self.ollama_urls:
+            self.ollama_urls = [self.ollama_url]
+
+class OllamaBackend:
+    """One Ollama server: its connection pool, concurrency limit and health."""
+    
+    def __init__(self, url: str, max_concurrency: int, timeout: httpx.Timeout, limits: httpx.Limits):
+        self.url = url.rstrip("/")
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.limits = limits
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.outstanding = 0
+        self.loaded_models: set = set()
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.counters = {"requests": 0, "failures": 0, "ejections": 0}
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Pooled HTTP client for this backend, created on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.url, timeout=self.timeout, limits=self.limits
+            )
+        return self._client
+    
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+    
+    @property
+    def load(self) -> float:
+        """Outstanding requests relative to the backend's concurrency limit."""
+        return self.outstanding / self.max_concurrency
+    
+    def has_model(self, model: str) -> bool:
+        return model in self.loaded_models or f"{model}:latest" in self.loaded_models
+    
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+    
+    def record_failure(self, eject_after: int, eject_seconds: float):
+        self.counters["failures"] += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= eject_after and not self.ejected:
+            self.ejected_until = time.monotonic() + eject_seconds
+            self.counters["ejections"] += 1
+            logger.warning(f"Ejecting Ollama backend {self.url} for {eject_seconds}s")
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": not self.ejected,
+            "ejected_for_seconds": round(max(0.0, self.ejected_until - time.monotonic()), 1),
+            "outstanding": self.outstanding,
+            "max_concurrency": self.max_concurrency,
+            "consecutive_failures": self.consecutive_failures,
+            "loaded_models": sorted(self.loaded_models),
+            **self.counters
+        }
+
 
 class OllamaClient:
-    """Direct client for Ollama API."""
+    """Async client for one or more Ollama servers.
     
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    Each backend has its own pooled HTTP client and concurrency limit.
+    Requests go to the least loaded backend, preferring backends that already
+    have the model in memory. Backends that keep failing are ejected for a
+    while and then given another chance.
+    """
+    
+    def __init__(
+        self,
+        base_url: str = "http://localhost:11434",
+        connect_timeout: float = 10.0,
+        read_timeout: float = 300.0,
+        max_connections: int = 10,
+        keep_alive: Optional[str] = None,
+        urls: Optional[List[str]] = None,
+        backend_concurrency: int = 4,
+        eject_failures: int = 3,
+        eject_seconds: float = 30.0
+    ):
         self.base_url = base_url
+        self.keep_alive = keep_alive
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        # Called with (model, final chunk) after every completed generation
+        self.listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections
+        )
+        self.backends = [
+            OllamaBackend(url, backend_concurrency, self.timeout, self.limits)
+            for url in (urls or [base_url])
+        ]
+    
+    async def aclose(self):
+        """Close pooled connections."""
+        for backend in self.backends:
+            await backend.aclose()
+    
+    def _available(self) -> List[OllamaBackend]:
+        """Backends in rotation; if every backend is ejected, try them all."""
+        return [b for b in self.backends if not b.ejected] or list(self.backends)
+    
+    def pick(self, model: str, prefer: Optional[str] = None) -> OllamaBackend:
+        """Choose the least loaded backend, preferring ones with `model` in memory.
+        
+        If `prefer` names a backend still in rotation, it is used regardless
+        of load so a conversation keeps hitting the server that has its
+        prompt prefix cached.
+        """
+        available = self._available()
+        for backend in available:
+            if backend.url == prefer:
+                return backend
+        warm = [b for b in available if b.has_model(model)]
+        return min(warm or available, key=lambda b: b.load)
     
-    def generate(self, model: str, prompt: str, system: str = None) -> Dict[str, Any]:
-        """Generate response using Ollama."""
+    def _is_backend_failure(self, error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+    
+    async def stream(
+        self,
+        model: str,
+        prompt: str,
+        system: str = None,
+        options: Dict[str, Any] = None,
+        format: Optional[Any] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream generation chunks from Ollama.
+        
+        Yields the raw JSON chunks; the last one has ``done: true`` and the
+        timing statistics. Cancelling the consumer closes the connection,
+        which makes Ollama stop generating. `format` ("json" or a JSON
+        schema) constrains the output to valid JSON.
+        """
         payload = {
             "model": model,
             "prompt": prompt,
-            "stream": False
+            "stream": True
         }
         
         if system:
             payload["system"] = system
+        if options:
+            payload["options"] = options
+        if format is not None:
+            payload["format"] = format
+        
+        async for chunk in self._stream("/api/generate", payload):
+            yield chunk
+    
+    async def chat_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any] = None,
+        backend: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a chat completion (/api/chat) for a message history.
+        
+        Ollama reuses the evaluated prompt prefix of a conversation, so a
+        follow-up turn sent to the same backend only evaluates the new
+        messages. The final chunk carries ``backend`` for pinning.
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True
+        }
+        if options:
+            payload["options"] = options
+        
+        async for chunk in self._stream("/api/chat", payload, prefer=backend):
+            yield chunk
+    
+    async def chat(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        options: Dict[str, Any] = None,
+        backend: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Run a chat completion and return the final chunk with the full message."""
+        parts = []
+        final: Dict[str, Any] = {}
+        async for chunk in self.chat_stream(model, messages, options=options, backend=backend):
+            parts.append(chunk.get("message", {}).get("content", ""))
+            if chunk.get("done"):
+                final = chunk
+        
+        return {**final, "message": {"role": "assistant", "content": "".join(parts)}}
+    
+    async def _stream(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        prefer: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """POST a streaming request to the chosen backend and yield its chunks."""
+        model = payload["model"]
+        if self.keep_alive is not None:
+            # Sent on every request, otherwise Ollama resets it to its default
+            payload["keep_alive"] = self.keep_alive
         
+        backend = self.pick(model, prefer=prefer)
+        backend.outstanding += 1
+        backend.counters["requests"] += 1
         try:
-            response = requests.post(
-                f"{self.base_url}/api/generate",
-                json=payload,
-                timeout=600  # Increased timeout for comprehensive responses
-            )
-            response.raise_for_status()
-            return response.json()
+            async with backend.slots:
+                async with backend.client.stream("POST", path, json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise RuntimeError(chunk["error"])
+                        if chunk.get("done"):
+                            backend.record_success()
+                            backend.loaded_models.add(model)
+                            chunk["backend"] = backend.url
+                            for listener in self.listeners:
+                                listener(model, chunk)
+                        yield chunk
+                        if chunk.get("done"):
+                            break
+        except asyncio.CancelledError:
+            logger.info("Ollama generation cancelled by caller")
+            raise
         except Exception as e:
-            logger.error(f"Ollama generation failed: {e}")
+            if self._is_backend_failure(e):
+                backend.record_failure(self.eject_failures, self.eject_seconds)
+            logger.error(f"Ollama generation failed on {backend.url}: {e}")
             raise
-
-    def list_models(self) -> list:
-        """List available models in Ollama."""
-        try:
-            response = requests.get(f"{self.base_url}/api/tags")
+        finally:
+            backend.outstanding -= 1
+    
+    async def generate(
+        self,
+        model: str,
+        prompt: str,
+        system: str = None,
+        options: Dict[str, Any] = None,
+        format: Optional[Any] = None
+    ) -> Dict[str, Any]:
+        """Generate response using Ollama.
+        
+        Streams internally so the read timeout applies between tokens rather
+        than to the whole generation; returns the same shape as a
+        non-streaming /api/generate call.
+        """
+        parts = []
+        final: Dict[str, Any] = {}
+        async for chunk in self.stream(model, prompt, system=system, options=options, format=format):
+            parts.append(chunk.get("response", ""))
+            if chunk.get("done"):
+                final = chunk
+        
+        return {**final, "response": "".join(parts)}
+    
+    async def load(self, model: str, keep_alive: Optional[str] = None) -> Dict[str, Any]:
+        """Load a model into memory on every backend in rotation, without generating."""
+        payload = {"model": model, "prompt": "", "stream": False}
+        if keep_alive or self.keep_alive:
+            payload["keep_alive"] = keep_alive or self.keep_alive
+        
+        async def load_on(backend: OllamaBackend) -> Dict[str, Any]:
+            response = await backend.client.post("/api/generate", json=payload)
+            response.raise_for_status()
+            backend.loaded_models.add(model)
+            return response.json()
+        
+        results = await asyncio.gather(
+            *(load_on(b) for b in self._available()), return_exceptions=True
+        )
+        loaded = [r for r in results if not isinstance(r, BaseException)]
+        if not loaded:
+            raise results[0]
+        return loaded[0]
+    
+    async def running_models(self) -> List[Dict[str, Any]]:
+        """List models loaded in memory on any backend (/api/ps)."""
+        async def running_on(backend: OllamaBackend) -> List[Dict[str, Any]]:
+            response = await backend.client.get("/api/ps")
             response.raise_for_status()
             models = response.json().get("models", [])
-            return [model["name"] for model in models]
+            backend.loaded_models = {m["name"] for m in models}
+            return [{**m, "backend": backend.url} for m in models]
+        
+        results = await asyncio.gather(
+            *(running_on(b) for b in self.backends), return_exceptions=True
+        )
+        if all(isinstance(r, BaseException) for r in results):
+            raise results[0]
+        return [m for r in results if not isinstance(r, BaseException) for m in r]
+    
+    async def list_models(self) -> list:
+        """List models available on any backend, updating backend health."""
+        async def tags(backend: OllamaBackend) -> List[str]:
+            try:
+                response = await backend.client.get("/api/tags")
+                response.raise_for_status()
+            except Exception as e:
+                backend.record_failure(self.eject_failures, self.eject_seconds)
+                logger.error(f"Failed to list Ollama models on {backend.url}: {e}")
+                return []
+            backend.record_success()
+            return [model["name"] for model in response.json().get("models", [])]
+        
+        results = await asyncio.gather(*(tags(b) for b in self.backends))
+        return sorted({name for names in results for name in names})
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-backend load, health and loaded models."""
+        return [backend.stats() for backend in self.backends]
+
+class OllamaWarmPool:
+    """Keeps configured Ollama models loaded and records where request time goes.
+    
+    Models are preloaded with ``keep_alive`` so the first real request does not
+    pay the model load. Residency is polled from /api/ps; a warm model that
+    Ollama has unloaded is counted and loaded again. Every completed
+    generation reports Ollama's load, prompt-evaluation and generation
+    durations, which are kept per model.
+    """
+    
+    def __init__(self, client: OllamaClient, models: List[str], keep_alive: str = "30m", window: int = 200):
+        self.client = client
+        self.models = models
+        self.keep_alive = keep_alive
+        self.resident: Dict[str, Dict[str, Any]] = {}
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._window = window
+        self._task: Optional[asyncio.Task] = None
+        client.listeners.append(self.record)
+    
+    def _entry(self, model: str) -> Dict[str, Any]:
+        if model not in self._models:
+            self._models[model] = {
+                "loads": 0,
+                "unloads": 0,
+                "cold_requests": 0,
+                "requests": 0,
+                "last_loaded_at": None,
+                "last_load_seconds": None,
+                "timings": {
+                    "load": deque(maxlen=self._window),
+                    "prompt_eval": deque(maxlen=self._window),
+                    "eval": deque(maxlen=self._window),
+                    "total": deque(maxlen=self._window)
+                }
+            }
+        return self._models[model]
+    
+    def record(self, model: str, chunk: Dict[str, Any]):
+        """Record the latency breakdown Ollama reports on a final chunk."""
+        entry = self._entry(model)
+        entry["requests"] += 1
+        timings = entry["timings"]
+        for name in ("load", "prompt_eval", "eval", "total"):
+            # Ollama reports durations in nanoseconds
+            timings[name].append(chunk.get(f"{name}_duration", 0) / 1e9)
+        if timings["load"][-1] > 1.0:
+            # The model had to be loaded for this request
+            entry["cold_requests"] += 1
+    
+    async def preload(self, model: str) -> bool:
+        """Load one model and pin it with keep_alive."""
+        started = time.monotonic()
+        try:
+            await self.client.load(model, keep_alive=self.keep_alive)
         except Exception as e:
-            logger.error(f"Failed to list Ollama models: {e}")
-            return []
+            logger.warning(f"Failed to preload Ollama model {model}: {e}")
+            return False
+        entry = self._entry(model)
+        entry["loads"] += 1
+        entry["last_loaded_at"] = time.time()
+        entry["last_load_seconds"] = round(time.monotonic() - started, 3)
+        logger.info(f"Preloaded Ollama model {model} in {entry['last_load_seconds']}s")
+        return True
+    
+    async def preload_all(self):
+        """Load every warm model."""
+        for model in self.models:
+            await self.preload(model)
+        await self.refresh()
+    
+    async def refresh(self) -> Dict[str, Dict[str, Any]]:
+        """Update residency from /api/ps and count models Ollama has unloaded."""
+        try:
+            running = await self.client.running_models()
+        except Exception as e:
+            logger.warning(f"Failed to read Ollama residency: {e}")
+            return self.resident
+        
+        current = {
+            m["name"]: {"size_vram": m.get("size_vram"), "expires_at": m.get("expires_at")}
+            for m in running
+        }
+        for model in set(self.resident) - set(current):
+            self._entry(model)["unloads"] += 1
+            logger.info(f"Ollama unloaded model {model}")
+        self.resident = current
+        return current
+    
+    def start(self, interval: float = 60.0):
+        """Preload now and keep the warm models resident in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._maintain(interval))
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _maintain(self, interval: float):
+        await self.preload_all()
+        while True:
+            await asyncio.sleep(interval)
+            await self.refresh()
+            for model in self.models:
+                if not self._is_resident(model):
+                    await self.preload(model)
+    
+    def _is_resident(self, model: str) -> bool:
+        # /api/ps reports tagged names, e.g. "llama3.1:8b" or "mistral:latest"
+        return model in self.resident or f"{model}:latest" in self.resident
+    
+    def stats(self) -> Dict[str, Any]:
+        """Residency, load/unload counts and average latency breakdown per model."""
+        models = {}
+        for model in sorted(set(self.models) | set(self._models)):
+            entry = self._entry(model)
+            averages = {
+                f"avg_{name}_seconds": round(sum(values) / len(values), 3) if values else None
+                for name, values in entry["timings"].items()
+            }
+            total = sum(entry["timings"]["total"])
+            models[model] = {
+                "warm": model in self.models,
+                "resident": self._is_resident(model),
+                "expires_at": (self.resident.get(model) or {}).get("expires_at"),
+                **{k: v for k, v in entry.items() if k != "timings"},
+                **averages,
+                "load_share": round(sum(entry["timings"]["load"]) / total, 4) if total else None
+            }
+        return {"keep_alive": self.keep_alive, "models": models}
+
+class SearchCache:
+    """SQLite cache of web search results keyed by normalized query.
+    
+    Entries expire after a TTL and the least recently used ones are evicted
+    once the table is full. Each entry remembers how long the original search
+    took, so hits can report the latency they saved.
+    """
+    
+    def __init__(self, path: str, ttl_seconds: int = 86400, max_entries: int = 2000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._counters = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._latency_saved = 0.0
+        self._init_db()
+    
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Case-fold, drop list markers/quotes/punctuation and collapse whitespace."""
+        query = re.sub(r"^\s*(\d+[.)]|[-*•])\s*", "", query.casefold())
+        query = re.sub(r"[^\w\s+#.-]", " ", query)
+        return " ".join(query.split()).strip(" .")
+    
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS search_results (
+                    query TEXT PRIMARY KEY,
+                    results TEXT NOT NULL,
+                    fetch_seconds REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+    
+    async def get(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        """Return cached results for a query, or None on a miss."""
+        row = await asyncio.to_thread(self._get, self.normalize(query), time.time())
+        if row is None:
+            self._counters["misses"] += 1
+            return None
+        results, fetch_seconds = row
+        self._counters["hits"] += 1
+        self._latency_saved += fetch_seconds
+        return json.loads(results)
+    
+    async def set(self, query: str, results: List[Dict[str, Any]], fetch_seconds: float):
+        """Store results together with the time it took to fetch them."""
+        self._counters["writes"] += 1
+        await asyncio.to_thread(self._set, self.normalize(query), json.dumps(results), fetch_seconds, time.time())
+    
+    def _get(self, key: str, now: float):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT results, fetch_seconds FROM search_results WHERE query = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE search_results SET last_access = ? WHERE query = ?", (now, key))
+        return row
+    
+    def _set(self, key: str, results: str, fetch_seconds: float, now: float):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_results "
+                "(query, results, fetch_seconds, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, results, fetch_seconds, now + self.ttl_seconds, now)
+            )
+            conn.execute("DELETE FROM search_results WHERE expires_at <= ?", (now,))
+            evicted = conn.execute(
+                "DELETE FROM search_results WHERE query IN ("
+                "SELECT query FROM search_results ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+        self._counters["evictions"] += max(evicted, 0)
+    
+    def _count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM search_results").fetchone()[0]
+    
+    async def stats(self) -> Dict[str, Any]:
+        """Hit rate, latency saved and table size."""
+        entries = await asyncio.to_thread(self._count)
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "hit_rate": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+            "latency_saved_seconds": round(self._latency_saved, 2),
+            "entries": entries
+        }
 
 class GeminiSearchClient:
     """Client for Gemini API - ONLY used for web searches, not AI processing."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, timeout: float = 30.0, cache: Optional[SearchCache] = None):
         self.api_key = api_key
         self.base_url = "https://generativelanguage.googleapis.com/v1beta"
+        self.timeout = timeout
+        self.cache = cache
+        self._client: Optional[httpx.AsyncClient] = None
     
-    def search_web(self, search_query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client, created on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+    
+    async def aclose(self):
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def search_web(self, search_query: str, max_results: int = 5) -> List[Dict[str, Any]]:
         """Use Gemini to perform web search and return results."""
         if not self.api_key:
             logger.warning("No Gemini API key provided for web search")
             return []
         
+        if self.cache is not None:
+            cached = await self.cache.get(search_query)
+            if cached is not None:
+                return cached[:max_results]
+        
+        started = time.monotonic()
+        search_results = await self._search(search_query)
+        
+        # Failed searches come back empty and are not cached
+        if self.cache is not None and search_results:
+            await self.cache.set(search_query, search_results, time.monotonic() - started)
+        
+        return search_results[:max_results]
+    
+    async def _search(self, search_query: str) -> List[Dict[str, Any]]:
+        """Run one Gemini grounded search."""
         try:
             # Use Gemini's grounding/search capabilities
             url = f"{self.base_url}/models/gemini-1.5-flash:generateContent"
@@ -99,11 +691,10 @@ class GeminiSearchClient:
                 }]
             }
             
-            response = requests.post(
+            response = await self.client.post(
                 f"{url}?key={self.api_key}",
                 headers=headers,
-                json=payload,
-                timeout=30
+                json=payload
             )
             
             if response.status_code == 200:
@@ -119,7 +710,7 @@ class GeminiSearchClient:
                                     "content": part["text"],
                                     "source": "gemini_search"
                                 })
-                return search_results[:max_results]
+                return search_results
             else:
                 logger.error(f"Gemini search failed: {response.status_code} - {response.text}")
                 return []
@@ -128,6 +719,232 @@ class GeminiSearchClient:
             logger.error(f"Gemini search error: {e}")
             return []
 
+class ToolAlternative(BaseModel):
+    """Another tool worth considering instead of a recommended one."""
+    name: str
+    comparison: str = Field(description="How it differs from the recommended tool")
+
+
+class ToolRecord(BaseModel):
+    """One tool recommendation, as produced by the structured tools prompt."""
+    name: str
+    overview: str = Field(description="What it does and why it is a top choice")
+    key_features: List[str] = Field(min_length=1)
+    system_requirements: str
+    installation_steps: List[str] = Field(min_length=1)
+    pricing: str = Field(description="Free, paid or subscription, with exact cost if known")
+    academic_pricing: str
+    license: str
+    usage_example: str = Field(description="Real commands or steps for the task")
+    alternatives: List[ToolAlternative] = Field(min_length=1, max_length=3)
+
+
+class ToolRecommendations(BaseModel):
+    """Exactly two tool records for one tools request."""
+    tools: List[ToolRecord] = Field(min_length=2, max_length=2)
+
+
+class ContextAssembler:
+    """Builds research context for a prompt within a token budget.
+    
+    Repeated sentences and near-duplicate snippets are dropped, snippets
+    sharing no terms with the query are skipped, and the rest are ranked by
+    term overlap with the query. The best
+    snippets are added until the budget is used up. Token counts are
+    estimates (about four characters per word piece), which is close
+    enough for Llama-style tokenizers to keep prompts inside the window.
+    """
+    
+    _WORD = re.compile(r"\w+|[^\w\s]")
+    _SENTENCE = re.compile(r"(?<=[.!?])\s+")
+    _STOPWORDS = frozenset(
+        "a an and are as at be by for from how in is it of on or that the this to with".split()
+    )
+    
+    def __init__(self, budget: int = 600, snippet_tokens: int = 160, duplicate_threshold: float = 0.8):
+        self.budget = budget
+        self.snippet_tokens = snippet_tokens
+        self.duplicate_threshold = duplicate_threshold
+    
+    @classmethod
+    def count_tokens(cls, text: str) -> int:
+        """Estimate the number of tokens in `text`."""
+        return sum(math.ceil(len(piece) / 4) for piece in cls._WORD.findall(text or ""))
+    
+    @classmethod
+    def _terms(cls, text: str) -> set:
+        return {
+            word for word in re.findall(r"\w+", text.casefold())
+            if word not in cls._STOPWORDS and len(word) > 1
+        }
+    
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Cut `text` at a sentence (or else word) boundary to fit `max_tokens`."""
+        if self.count_tokens(text) <= max_tokens:
+            return text
+        kept, used = [], 0
+        for sentence in self._SENTENCE.split(text):
+            tokens = self.count_tokens(sentence)
+            if used + tokens > max_tokens:
+                break
+            kept.append(sentence)
+            used += tokens
+        if kept:
+            return " ".join(kept)
+        words, used = [], 0
+        for word in text.split():
+            used += self.count_tokens(word)
+            if used > max_tokens:
+                break
+            words.append(word)
+        return " ".join(words) + "..."
+    
+    def assemble(self, query: str, results: List[Dict[str, Any]], budget: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Select the most relevant, distinct snippets that fit the budget.
+        
+        Args:
+            query: Text the snippets should be relevant to
+            results: Search results with a "content" field
+            budget: Token budget for this prompt (defaults to the configured one)
+            
+        Returns:
+            Dict with the selected "snippets", their "tokens" and the number
+            of "candidates" and "duplicates" seen
+        """
+        budget = self.budget if budget is None else min(budget, self.budget)
+        query_terms = self._terms(query)
+        
+        candidates, seen_hashes, seen_terms = [], set(), []
+        duplicates = 0
+        for position, result in enumerate(results):
+            # Collapse whitespace and drop sentences repeated within the snippet
+            sentences = self._SENTENCE.split(" ".join((result.get("content") or "").split()))
+            content = " ".join(dict.fromkeys(s for s in sentences if s))
+            if not content:
+                continue
+            digest = hashlib.sha1(content.casefold().encode("utf-8")).hexdigest()
+            terms = self._terms(content)
+            is_duplicate = digest in seen_hashes or any(
+                len(terms & other) / max(len(terms | other), 1) >= self.duplicate_threshold
+                for other in seen_terms
+            )
+            if is_duplicate:
+                duplicates += 1
+                continue
+            seen_hashes.add(digest)
+            seen_terms.append(terms)
+            
+            # Share of query terms covered, weighted by how focused the snippet is
+            overlap = len(terms & query_terms)
+            if query_terms and not overlap:
+                continue
+            score = overlap / max(len(query_terms), 1) + overlap / max(len(terms), 1)
+            candidates.append((score, position, self._truncate(content, self.snippet_tokens)))
+        
+        candidates.sort(key=lambda c: (-c[0], c[1]))
+        snippets, used = [], 0
+        for _, _, text in candidates:
+            remaining = budget - used
+            if remaining < 20:
+                break
+            text = self._truncate(text, remaining)
+            tokens = self.count_tokens(text)
+            if tokens == 0 or tokens > remaining:
+                continue
+            snippets.append(text)
+            used += tokens
+        
+        return {
+            "snippets": snippets,
+            "tokens": used,
+            "candidates": len(candidates),
+            "duplicates": duplicates
+        }
+
+
+class ChatSession:
+    """Message history of one conversation and the backend it is pinned to."""
+    
+    def __init__(self, session_id: str, messages: List[Dict[str, str]]):
+        self.session_id = session_id
+        self.messages = messages
+        self.backend: Optional[str] = None
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.turns = 0
+        self.lock = asyncio.Lock()
+    
+    @property
+    def size(self) -> int:
+        """Approximate memory held by the history, in bytes."""
+        return sum(len(m["content"].encode("utf-8")) for m in self.messages)
+
+
+class ChatSessionStore:
+    """In-memory chat sessions with idle eviction and a memory cap.
+    
+    Sessions idle for longer than `idle_seconds` are dropped, and the least
+    recently used sessions are dropped once the histories together exceed
+    `max_bytes`. Eviction runs on every access, so no background task is
+    needed.
+    """
+    
+    def __init__(self, idle_seconds: float = 1800.0, max_bytes: int = 20_000_000):
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self.counters = {"created": 0, "resumed": 0, "expired": 0, "evicted": 0}
+    
+    def create(self, messages: List[Dict[str, str]]) -> ChatSession:
+        session = ChatSession(uuid.uuid4().hex, messages)
+        self._sessions[session.session_id] = session
+        self.counters["created"] += 1
+        self.evict(keep=session.session_id)
+        return session
+    
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        self.evict()
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            self.counters["resumed"] += 1
+        return session
+    
+    def __contains__(self, session_id: str) -> bool:
+        self.evict()
+        return session_id in self._sessions
+    
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+    
+    def evict(self, keep: Optional[str] = None):
+        """Drop idle sessions, then least recently used ones over the memory cap."""
+        cutoff = time.monotonic() - self.idle_seconds
+        for session_id in [k for k, s in self._sessions.items() if s.last_used < cutoff]:
+            del self._sessions[session_id]
+            self.counters["expired"] += 1
+        
+        total = sum(s.size for s in self._sessions.values())
+        for session_id in list(self._sessions):
+            if total <= self.max_bytes:
+                break
+            if session_id == keep or self._sessions[session_id].lock.locked():
+                continue
+            total -= self._sessions.pop(session_id).size
+            self.counters["evicted"] += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._sessions),
+            "bytes": sum(s.size for s in self._sessions.values()),
+            "max_bytes": self.max_bytes,
+            "idle_seconds": self.idle_seconds,
+            **self.counters
+        }
+
+
 class LangflowClient:
     """Client for Langflow API endpoints."""
     
@@ -193,11 +1010,49 @@ class LocalAIService:
     
     def __init__(self, config: LocalAIConfig = None):
         self.config = config or LocalAIConfig()
-        self.ollama = OllamaClient(self.config.ollama_url)
+        self.ollama = OllamaClient(
+            self.config.ollama_url,
+            connect_timeout=self.config.ollama_connect_timeout,
+            read_timeout=self.config.ollama_read_timeout,
+            max_connections=self.config.ollama_max_connections,
+            keep_alive=self.config.keep_alive,
+            urls=self.config.ollama_urls,
+            backend_concurrency=self.config.ollama_num_parallel,
+            eject_failures=self.config.ollama_eject_failures,
+            eject_seconds=self.config.ollama_eject_seconds
+        )
+        self.warm_pool = OllamaWarmPool(
+            self.ollama,
+            models=self.config.warm_models or [self.config.default_model],
+            keep_alive=self.config.keep_alive
+        )
         self.n8n = N8nClient(self.config.n8n_url)
-        self.gemini_search = GeminiSearchClient(self.config.gemini_api_key)
+        self.gemini_search = GeminiSearchClient(
+            self.config.gemini_api_key,
+            cache=SearchCache(
+                self.config.search_cache_path,
+                ttl_seconds=self.config.search_cache_ttl,
+                max_entries=self.config.search_cache_max_entries
+            ) if self.config.search_cache_path else None
+        )
+        self.context = ContextAssembler(
+            budget=self.config.context_token_budget,
+            snippet_tokens=self.config.context_snippet_tokens
+        )
+        self.sessions = ChatSessionStore(
+            idle_seconds=self.config.session_idle_seconds,
+            max_bytes=self.config.session_max_bytes
+        )
+        # Recent prompt sizes per generation kind, for /metrics
+        self.prompt_tokens: Dict[str, deque] = {}
     
-    def _ollama_guided_search(self, topic: str, context: str = "") -> List[Dict[str, Any]]:
+    async def aclose(self):
+        """Stop the warm pool and close pooled connections to the local stack."""
+        await self.warm_pool.stop()
+        await self.ollama.aclose()
+        await self.gemini_search.aclose()
+    
+    async def _ollama_guided_search(self, topic: str, context: str = "") -> List[Dict[str, Any]]:
         """Use Ollama to generate search queries, then Gemini to search."""
         try:
             # Use Ollama to generate optimal search queries
@@ -207,7 +1062,7 @@ Context: {context}
 
 Return only the search queries, one per line:"""
 
-            result = self.ollama.generate(
+            result = await self.ollama.generate(
                 model=self.config.default_model,
                 prompt=search_prompt
             )
@@ -218,300 +1073,203 @@ Return only the search queries, one per line:"""
                 lines = result["response"].strip().split('\n')
                 queries = [line.strip() for line in lines if line.strip() and not line.startswith('#')]
             
-            # Use Gemini to search for each query
-            all_results = []
-            for query in queries[:3]:  # Limit to 3 queries
-                search_results = self.gemini_search.search_web(query, max_results=3)
-                all_results.extend(search_results)
-            
-            return all_results
+            # Use Gemini to search for the queries concurrently (limit to 3)
+            return await self._search_all(queries[:3])
             
         except Exception as e:
             logger.error(f"Ollama-guided search failed: {e}")
             return []
     
-    def _gemini_research_and_llama_refine(self, request_data: Dict[str, Any]) -> str:
-        """Use Gemini for research, then Llama to refine into our specific format."""
+    async def _search_all(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """Run web searches concurrently within the configured deadline.
+        
+        Searches still running when the deadline passes are cancelled and the
+        results that did arrive are returned, in query order.
+        """
+        if not queries:
+            return []
+        
+        started = time.monotonic()
+        tasks = [
+            asyncio.create_task(self.gemini_search.search_web(query, max_results=3))
+            for query in queries
+        ]
         try:
-            # Step 1: Use Gemini to gather comprehensive information
-            if not self.config.gemini_api_key:
-                logger.info("No Gemini API key - using Llama only")
-                return self._llama_only_tools(request_data)
-            
-            # Generate research queries
-            search_topic = f"{request_data.get('technique_type')} tools software {request_data.get('data_type')}"
-            research_results = self._ollama_guided_search(search_topic)
-            
-            if not research_results:
-                logger.info("No research results - using Llama only")
-                return self._llama_only_tools(request_data)
-            
-            # Step 2: Combine research into comprehensive context
-            research_context = "RESEARCH INFORMATION:\n\n"
-            for i, result in enumerate(research_results[:6], 1):  # Use top 6 results
-                research_context += f"Source {i}: {result.get('content', '')[:300]}...\n\n"
-            
-            # Step 3: Use Llama to refine into our specific format
-            refine_prompt = f"""You are a bioinformatics expert. Using the research information provided, create EXACTLY 2 comprehensive tool recommendations.
+            done, pending = await asyncio.wait(tasks, timeout=self.config.search_deadline)
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        if pending:
+            logger.warning(
+                f"Web search deadline ({self.config.search_deadline}s) hit; "
+                f"using {len(done)} of {len(tasks)} searches"
+            )
+        
+        all_results = []
+        for task in tasks:
+            if task in done and not task.cancelled() and task.exception() is None:
+                all_results.extend(task.result())
+        
+        logger.info(f"{len(tasks)} web searches took {time.monotonic() - started:.2f}s")
+        return all_results
+    
+    def _research_context(
+        self,
+        header: str,
+        query: str,
+        results: List[Dict[str, Any]],
+        *prompt_parts: str
+    ) -> tuple:
+        """
+        Build a numbered research context that fits the model's context window.
+        
+        The budget is whatever the window has left after the prompt parts and
+        the space reserved for the answer, capped by the configured budget.
+        
+        Returns:
+            (context text, assembler report); the text is empty if nothing fits
+        """
+        available = (
+            self.config.context_window
+            - sum(self.context.count_tokens(part) for part in prompt_parts)
+            - self.config.response_reserve_tokens
+        )
+        assembled = self.context.assemble(query, results, budget=max(available, 0))
+        if not assembled["snippets"]:
+            return "", assembled
+        lines = [f"{i}. {snippet}" for i, snippet in enumerate(assembled["snippets"], 1)]
+        return header + "\n".join(lines) + "\n", assembled
+    
+    def _record_prompt_tokens(self, kind: str, result: Dict[str, Any], context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Log and keep the prompt size Ollama reported for one generation."""
+        context = context or {}
+        entry = {
+            "prompt_tokens": result.get("prompt_eval_count"),
+            "context_tokens": context.get("tokens", 0),
+            "context_snippets": len(context.get("snippets", [])),
+            "duplicates_dropped": context.get("duplicates", 0)
+        }
+        self.prompt_tokens.setdefault(kind, deque(maxlen=200)).append(entry)
+        logger.info(
+            f"{kind} prompt: {entry['prompt_tokens']} tokens "
+            f"({entry['context_tokens']} research context from {entry['context_snippets']} snippets)"
+        )
+        return entry
+    
+    def prompt_token_stats(self) -> Dict[str, Any]:
+        """Average and max prompt and research-context tokens per generation kind."""
+        stats = {}
+        for kind, entries in self.prompt_tokens.items():
+            prompt = [e["prompt_tokens"] for e in entries if e["prompt_tokens"] is not None]
+            context = [e["context_tokens"] for e in entries]
+            stats[kind] = {
+                "requests": len(entries),
+                "prompt_tokens_avg": round(sum(prompt) / len(prompt), 1) if prompt else None,
+                "prompt_tokens_max": max(prompt) if prompt else None,
+                "context_tokens_avg": round(sum(context) / len(context), 1) if context else 0.0
+            }
+        return stats
+    
+    async def _structured_tools(self, request_data: Dict[str, Any]) -> str:
+        """Research with Gemini (if configured), then get both tool records in one Llama call.
+        
+        Ollama constrains the output to the ToolRecommendations JSON schema,
+        so the reply is validated and rendered to Markdown instead of being
+        scanned line by line.
+        """
+        started = time.monotonic()
+        search_topic = f"{request_data.get('technique_type')} tools software {request_data.get('data_type')}"
+        research_results = []
+        if self.config.gemini_api_key:
+            research_results = await self._ollama_guided_search(search_topic)
+        else:
+            logger.info("No Gemini API key - using Llama only")
+        research_done = time.monotonic()
+        
+        prompt_template = f"""You are a bioinformatics expert. Recommend EXACTLY 2 software tools for this task.
 
 TASK: {request_data.get("computational_goal")}
 TECHNIQUE: {request_data.get("technique_type")}
 DATA TYPE: {request_data.get("data_type")}
-REQUIREMENTS: {request_data.get("context", "None")}
-
-{research_context}
-
-Based on the research above, provide EXACTLY 2 tools in this format:
-
-# Tool #1: [Best Tool Name]
-
-## Overview
-- What it does and why it's the top choice
-- Key features that make it stand out
+REQUIREMENTS: {request_data.get("context") or "None"}
 
-## Complete Installation Guide
-1. System requirements (OS, RAM, etc.)
-2. Download instructions with exact URLs
-3. Step-by-step installation process
-4. Initial configuration steps
-
-## Pricing Details
-- Exact cost (free/paid/subscription)
-- Academic pricing if available
-- License terms
-
-## Detailed Usage Example
-```
-[Actual commands/steps with real examples]
-```
-
-## Alternative Options
-- Alternative 1: [name] - [brief comparison]
-- Alternative 2: [name] - [brief comparison]
-
-# Tool #2: [Second Best Tool Name]
-
-[Same format as Tool #1]
-
-Use the research information to provide accurate, current details. Make each recommendation comprehensive and actionable."""
-
-            result = self.ollama.generate(
-                model=self.config.default_model,
-                prompt=refine_prompt,
-                system="You are an expert who creates detailed, accurate tool recommendations. Follow the format exactly and provide complete information."
+{{research_context}}
+Put the best tool first. For each tool give what it does and why it fits the task, its key features, system requirements, numbered installation steps with exact download URLs, exact pricing, academic pricing, license terms, a real usage example with commands, and alternatives with a brief comparison. Respond in JSON."""
+        system = "You are an expert who creates detailed, accurate tool recommendations. Provide complete, specific information."
+        
+        research_context, context_info = "", None
+        if research_results:
+            research_context, context_info = self._research_context(
+                "RESEARCH INFORMATION:\n\n",
+                f"{search_topic} {request_data.get('computational_goal')}",
+                research_results,
+                prompt_template,
+                system
             )
-            
-            return result.get("response", "")
-            
-        except Exception as e:
-            logger.error(f"Gemini research + Llama refine failed: {e}")
-            return self._llama_only_tools(request_data)
-    
-    def _llama_only_tools(self, request_data: Dict[str, Any]) -> str:
-        """Fallback: Use only Llama for tool recommendations with forced structure."""
+        prompt = prompt_template.replace("{research_context}", research_context)
         
-        # Get tool suggestions from Llama with better prompting
-        suggestion_prompt = f"""What are the 2 best software tools for: {request_data.get("computational_goal")}
-
-Task: {request_data.get("technique_type")}
-Data: {request_data.get("data_type")}
-Requirements: {request_data.get("context", "None")}
-
-List exactly 2 specific tool names (not categories):
-1. 
-2. """
-
-        suggestion_result = self.ollama.generate(
+        result = await self.ollama.generate(
             model=self.config.default_model,
-            prompt=suggestion_prompt,
-            system="List exactly 2 specific software tool names, nothing else."
+            prompt=prompt,
+            system=system,
+            options={"temperature": 0.3},
+            format=ToolRecommendations.model_json_schema()
         )
+        self._record_prompt_tokens("tools", result, context_info)
+        recommendations = ToolRecommendations.model_validate_json(result.get("response", ""))
         
-        # Extract tool names with better parsing
-        tool_names = []
-        if suggestion_result.get("response"):
-            response_text = suggestion_result["response"].strip()
-            lines = response_text.split('\n')
-            
-            for line in lines:
-                line = line.strip()
-                # Remove numbering and common prefixes
-                line = line.replace('1.', '').replace('2.', '').replace('3.', '')
-                line = line.replace('Tool 1:', '').replace('Tool 2:', '')
-                line = line.replace('-', '').replace('*', '').strip()
-                
-                # Look for actual tool names (not empty, not too long, not generic)
-                if (line and len(line) < 50 and len(line) > 2 and 
-                    'tool' not in line.lower() and 'option' not in line.lower() and
-                    'software' not in line.lower()):
-                    tool_names.append(line)
-        
-        # Debug: print what we extracted
-        logger.info(f"Extracted tool names: {tool_names}")
-        
-        # Ensure we have exactly 2 tools, use technique-specific defaults if extraction failed
-        if len(tool_names) < 2:
-            # Use technique-specific defaults based on the request
-            technique = request_data.get("technique_type", "").lower()
-            goal = request_data.get("computational_goal", "").lower()
-            
-            if "alignment" in technique or "alignment" in goal:
-                tool_names = ["MUSCLE", "Clustal Omega"]
-            elif "primer" in technique or "primer" in goal:
-                tool_names = ["Primer3", "NCBI Primer-BLAST"]
-            elif "phylogen" in technique or "phylogen" in goal:
-                tool_names = ["RAxML", "IQ-TREE"]
-            elif "model" in technique or "model" in goal or "structure" in goal:
-                tool_names = ["PyMOL", "ChimeraX"]
-            elif "blast" in goal or "search" in goal:
-                tool_names = ["BLAST", "PSI-BLAST"]
-            else:
-                # Try to get better suggestions with a simpler prompt
-                simple_prompt = f"Name 2 software tools for {technique} {goal}:"
-                simple_result = self.ollama.generate(
-                    model=self.config.default_model,
-                    prompt=simple_prompt,
-                    system="List only tool names."
-                )
-                
-                if simple_result.get("response"):
-                    # Try to extract from simple response
-                    words = simple_result["response"].split()
-                    potential_tools = []
-                    for word in words:
-                        word = word.strip('.,()[]{}:;-*')
-                        if (len(word) > 2 and len(word) < 30 and 
-                            word[0].isupper() and 
-                            'tool' not in word.lower()):
-                            potential_tools.append(word)
-                    
-                    if len(potential_tools) >= 2:
-                        tool_names = potential_tools[:2]
-                    else:
-                        tool_names = ["BLAST", "Bioconductor"]
-                else:
-                    tool_names = ["BLAST", "Bioconductor"]
-        
-        # Take only first 2
-        tool_names = tool_names[:2]
-        
-        # Now get detailed information for each tool separately for better quality
-        tool1_details = self._get_tool_details(tool_names[0], request_data)
-        tool2_details = self._get_tool_details(tool_names[1], request_data)
-        
-        # Create comprehensive response using detailed information
-        formatted_response = f"""# Tool #1: {tool_names[0]}
+        logger.info(
+            f"Tool pipeline stages: research {research_done - started:.2f}s, "
+            f"structured generation {time.monotonic() - research_done:.2f}s"
+        )
+        return self._render_tools(recommendations, request_data)
+    
+    def _render_tools(self, recommendations: ToolRecommendations, request_data: Dict[str, Any]) -> str:
+        """Render validated tool records to the Markdown the frontend displays."""
+        sections = []
+        for number, tool in enumerate(recommendations.tools, 1):
+            features = "\n".join(f"- {feature}" for feature in tool.key_features)
+            steps = "\n".join(
+                f"{i}. {step}" for i, step in enumerate(tool.installation_steps, 2)
+            )
+            alternatives = "\n".join(
+                f"- **Alternative {i}**: {alt.name} - {alt.comparison}"
+                for i, alt in enumerate(tool.alternatives, 1)
+            )
+            sections.append(f"""# Tool #{number}: {tool.name}
 
 ## Overview
-{tool1_details['overview']} {tool1_details['features']}
-
-## Complete Installation Guide
-1. **System Requirements**: {tool1_details['installation']}
-2. **Download**: Visit the official {tool_names[0]} website or repository
-3. **Installation**: {tool1_details['installation']}
-4. **Initial Setup**: Configure settings according to your specific needs
-
-## Pricing Details
-- **Cost**: {tool1_details['pricing']}
-- **Academic Pricing**: Check official website for educational discounts
-- **License**: Verify license terms on official documentation
+{tool.overview}
 
-## Detailed Usage Example
-```bash
-# {tool_names[0]} usage for {request_data.get('technique_type')}
-{tool1_details['usage']}
-# Follow tool-specific documentation for advanced options
-```
-
-## Alternative Options
-- **Alternative 1**: {tool_names[1]} - Complementary approach with different strengths
-- **Alternative 2**: Check bioinformatics tool databases for additional options
-
-# Tool #2: {tool_names[1]}
-
-## Overview
-{tool2_details['overview']} {tool2_details['features']}
+## Key Features
+{features}
 
 ## Complete Installation Guide
-1. **System Requirements**: {tool2_details['installation']}
-2. **Download**: Access {tool_names[1]} through official channels
-3. **Installation**: {tool2_details['installation']}
-4. **Initial Setup**: Follow setup wizard or configuration guide
+1. **System Requirements**: {tool.system_requirements}
+{steps}
 
 ## Pricing Details
-- **Cost**: {tool2_details['pricing']}
-- **Academic Pricing**: Educational institutions may have special rates
-- **License**: Review licensing terms before use
+- **Cost**: {tool.pricing}
+- **Academic Pricing**: {tool.academic_pricing}
+- **License**: {tool.license}
 
 ## Detailed Usage Example
 ```bash
-# {tool_names[1]} workflow for {request_data.get('technique_type')}
-{tool2_details['usage']}
-# Consult documentation for parameter optimization
+# {tool.name} usage for {request_data.get('technique_type')}
+{tool.usage_example.strip()}
 ```
 
 ## Alternative Options
-- **Alternative 1**: {tool_names[0]} - Primary alternative with proven track record
-- **Alternative 2**: Explore specialized tools for your specific data type
+{alternatives}""")
+        
+        names = " and ".join(tool.name for tool in recommendations.tools)
+        return "\n\n".join(sections) + f"""
 
 ---
-*Note: For the most current information, installation guides, and pricing, please visit the official websites of {tool_names[0]} and {tool_names[1]}.*"""
-        
-        return formatted_response
+*Note: For the most current information, installation guides, and pricing, please visit the official websites of {names}.*"""
     
-    def _get_tool_details(self, tool_name: str, request_data: Dict[str, Any]) -> Dict[str, str]:
-        """Get detailed information about a specific tool."""
-        details_prompt = f"""Provide specific information about {tool_name} for {request_data.get('computational_goal')}.
-
-Focus on:
-1. What {tool_name} does and its key features
-2. System requirements and installation steps
-3. Pricing (free/paid/academic)
-4. Basic usage commands or workflow
-5. Main advantages and limitations
-
-Be specific and factual about {tool_name}."""
-
-        result = self.ollama.generate(
-            model=self.config.default_model,
-            prompt=details_prompt,
-            system=f"Provide accurate, specific information about {tool_name}."
-        )
-        
-        response_text = result.get("response", "")
-        
-        # Parse the response to extract different sections
-        details = {
-            "overview": f"{tool_name} is a specialized tool for {request_data.get('technique_type')}.",
-            "installation": "Standard installation process varies by platform.",
-            "pricing": "Check official website for current pricing information.",
-            "usage": f"Basic usage involves standard {request_data.get('technique_type')} workflow.",
-            "features": f"Key features include {request_data.get('technique_type')} capabilities."
-        }
-        
-        # Try to extract more specific information from the response
-        if response_text:
-            # Simple extraction - look for key information
-            lines = response_text.split('\n')
-            current_section = "overview"
-            
-            for line in lines:
-                line = line.strip()
-                if line:
-                    if any(word in line.lower() for word in ['feature', 'capability', 'function']):
-                        details["features"] = line
-                    elif any(word in line.lower() for word in ['install', 'download', 'setup']):
-                        details["installation"] = line
-                    elif any(word in line.lower() for word in ['price', 'cost', 'free', 'paid']):
-                        details["pricing"] = line
-                    elif any(word in line.lower() for word in ['usage', 'command', 'run', 'execute']):
-                        details["usage"] = line
-                    elif len(details["overview"]) < 100:  # If overview is still short, expand it
-                        details["overview"] = line
-        
-        return details
-    
-    def generate_protocol_local(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_protocol_local(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate protocol using local AI stack (Ollama directly)."""
         try:
             # Create system prompt for protocol generation
@@ -530,20 +1288,24 @@ Be specific and factual about {tool_name}."""
 Please provide a comprehensive protocol that includes all necessary steps, materials, and safety considerations."""
 
             # Optionally search for additional information if Gemini API key is available
-            search_context = ""
+            context_info = None
             if self.config.gemini_api_key:
                 search_topic = f"{request_data.get('technique')} protocol {request_data.get('experimental_goal')}"
-                search_results = self._ollama_guided_search(search_topic, user_prompt)
+                search_results = await self._ollama_guided_search(search_topic, user_prompt)
                 
                 if search_results:
-                    search_context = "\n\n**Additional Research Context:**\n"
-                    for i, result in enumerate(search_results[:3], 1):
-                        search_context += f"{i}. {result.get('content', '')[:200]}...\n"
-                    
-                    user_prompt += search_context + "\n\nPlease incorporate relevant information from the research context above into your protocol."
+                    search_context, context_info = self._research_context(
+                        "\n\n**Additional Research Context:**\n",
+                        search_topic,
+                        search_results,
+                        user_prompt,
+                        system_prompt
+                    )
+                    if search_context:
+                        user_prompt += search_context + "\n\nPlease incorporate relevant information from the research context above into your protocol."
 
             # Generate protocol using Ollama
-            result = self.ollama.generate(
+            result = await self.ollama.generate(
                 model=self.config.default_model,
                 prompt=user_prompt,
                 system=system_prompt
@@ -553,7 +1315,8 @@ Please provide a comprehensive protocol that includes all necessary steps, mater
                 "success": True,
                 "protocol": result.get("response", ""),
                 "provider_used": "local_ai_stack",
-                "model_used": self.config.default_model
+                "model_used": self.config.default_model,
+                "prompt_tokens": self._record_prompt_tokens("protocol", result, context_info)
             }
             
         except Exception as e:
@@ -565,7 +1328,7 @@ Please provide a comprehensive protocol that includes all necessary steps, mater
                 "error": str(e)
             }
     
-    def troubleshoot_protocol_local(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def troubleshoot_protocol_local(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Troubleshoot protocol using Ollama (with optional Gemini search)."""
         try:
             # Create system prompt for troubleshooting
@@ -589,40 +1352,49 @@ Provide your analysis in structured markdown format with clear sections and acti
             # Create user prompt with troubleshooting details
             user_prompt = f"""Analyze this laboratory protocol issue:
 
-**Original Protocol**: {request_data.get("protocol_text", "Not provided")}
+**Technique**: {request_data.get("technique") or "Not specified"}
 
-**Issue Description**: {request_data.get("issue_description")}
+**Original Protocol**: {request_data.get("original_protocol") or "Not provided"}
 
-**Expected Outcome**: {request_data.get("expected_outcome")}
+**Observed Problem**: {request_data.get("observed_problem")}
 
-**Actual Outcome**: {request_data.get("actual_outcome")}
+**Additional Details**: {request_data.get("additional_details") or "None"}
 
 Please provide a comprehensive troubleshooting analysis with specific solutions."""
 
             # Optionally search for troubleshooting information
-            if self.config.gemini_api_key and request_data.get("issue_description"):
-                search_topic = f"troubleshooting {request_data.get('issue_description')}"
-                search_results = self._ollama_guided_search(search_topic, user_prompt)
+            context_info = None
+            if self.config.gemini_api_key and request_data.get("observed_problem"):
+                search_topic = f"troubleshooting {request_data.get('technique') or ''} {request_data.get('observed_problem')}"
+                search_results = await self._ollama_guided_search(search_topic, user_prompt)
                 
                 if search_results:
-                    search_context = "\n\n**Additional Troubleshooting Resources:**\n"
-                    for i, result in enumerate(search_results[:3], 1):
-                        search_context += f"{i}. {result.get('content', '')[:200]}...\n"
-                    
-                    user_prompt += search_context + "\n\nPlease incorporate relevant troubleshooting insights from the research above."
-
-            # Generate troubleshooting analysis using Ollama
-            result = self.ollama.generate(
-                model=self.config.default_model,
-                prompt=user_prompt,
-                system=system_prompt
-            )
+                    search_context, context_info = self._research_context(
+                        "\n\n**Additional Troubleshooting Resources:**\n",
+                        search_topic,
+                        search_results,
+                        user_prompt,
+                        system_prompt
+                    )
+                    if search_context:
+                        user_prompt += search_context + "\n\nPlease incorporate relevant troubleshooting insights from the research above."
+
+            # Generate troubleshooting analysis using Ollama; the chat history
+            # is kept so follow-up questions reuse the evaluated prompt
+            session = self.sessions.create([
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ])
+            async with session.lock:
+                result = await self._chat_turn(session)
             
             return {
                 "success": True,
-                "analysis": result.get("response", ""),
+                "analysis": result["message"]["content"],
+                "session_id": session.session_id,
                 "provider_used": "local_ai_stack",
-                "model_used": self.config.default_model
+                "model_used": self.config.default_model,
+                "prompt_tokens": self._record_prompt_tokens("troubleshoot", result, context_info)
             }
             
         except Exception as e:
@@ -634,7 +1406,79 @@ Please provide a comprehensive troubleshooting analysis with specific solutions.
                 "error": str(e)
             }
     
-    def generate_routes_local(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def troubleshoot_follow_up_local(self, session_id: str, question: str) -> Dict[str, Any]:
+        """Answer a follow-up question in an existing troubleshooting session.
+        
+        Only the new question is added to the conversation; Ollama has the
+        earlier turns cached on the session's backend, so it evaluates just
+        the new tokens.
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            return {
+                "success": False,
+                "analysis": "",
+                "provider_used": "local_ai_stack",
+                "error": "Troubleshooting session not found or expired"
+            }
+        
+        try:
+            async with session.lock:
+                session.messages.append({"role": "user", "content": question})
+                try:
+                    result = await self._chat_turn(session)
+                except BaseException:
+                    session.messages.pop()
+                    raise
+            
+            return {
+                "success": True,
+                "analysis": result["message"]["content"],
+                "session_id": session.session_id,
+                "provider_used": "local_ai_stack",
+                "model_used": self.config.default_model,
+                "prompt_tokens": self._record_prompt_tokens("troubleshoot_follow_up", result, None)
+            }
+            
+        except Exception as e:
+            logger.error(f"Local troubleshooting follow-up failed: {e}")
+            return {
+                "success": False,
+                "analysis": "",
+                "session_id": session_id,
+                "provider_used": "local_ai_stack",
+                "error": str(e)
+            }
+    
+    async def _chat_turn(self, session: ChatSession) -> Dict[str, Any]:
+        """Send a session's history to Ollama and append the reply (caller holds the lock)."""
+        self._fit_history(session)
+        result = await self.ollama.chat(
+            model=self.config.default_model,
+            messages=session.messages,
+            backend=session.backend
+        )
+        session.backend = result.get("backend", session.backend)
+        session.messages.append(result["message"])
+        session.turns += 1
+        self.sessions.evict(keep=session.session_id)
+        return result
+    
+    def _fit_history(self, session: ChatSession):
+        """Drop the oldest follow-up exchanges once the history outgrows the context window.
+        
+        The system prompt, the original analysis request and its answer are
+        always kept, since later turns refer back to them.
+        """
+        limit = self.config.context_window - self.config.response_reserve_tokens
+        messages = session.messages
+        while (
+            len(messages) > 4
+            and sum(self.context.count_tokens(m["content"]) for m in messages) > limit
+        ):
+            del messages[3:5]
+    
+    async def generate_routes_local(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate experimental routes using n8n orchestration."""
         try:
             # Use n8n workflow for route generation (includes web search, comparison)
@@ -648,7 +1492,7 @@ Please provide a comprehensive troubleshooting analysis with specific solutions.
             # Execute n8n route generation workflow
             # Note: Replace with actual n8n workflow webhook URL
             webhook_url = f"{self.config.n8n_url}/webhook/route-generation"
-            result = self.n8n.trigger_workflow(webhook_url, workflow_data)
+            result = await asyncio.to_thread(self.n8n.trigger_workflow, webhook_url, workflow_data)
             
             return {
                 "success": True,
@@ -666,19 +1510,16 @@ Please provide a comprehensive troubleshooting analysis with specific solutions.
                 "error": str(e)
             }
     
-    def generate_tools_local(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def generate_tools_local(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate tool recommendations using Gemini research + Llama refinement."""
         try:
-            logger.info("Starting two-stage tool generation: Gemini research + Llama refinement")
+            logger.info("Starting structured tool generation: Gemini research + one Llama call")
             
-            # Use the new two-stage approach
-            refined_response = self._gemini_research_and_llama_refine(request_data)
-            
-            logger.info(f"Refined response length: {len(refined_response)}")
+            tools = await self._structured_tools(request_data)
             
             return {
                 "success": True,
-                "tools": refined_response,
+                "tools": tools,
                 "provider_used": "local_ai_stack_enhanced",
                 "model_used": self.config.default_model
             }
@@ -692,7 +1533,18 @@ Please provide a comprehensive troubleshooting analysis with specific solutions.
                 "error": str(e)
             }
     
-    def health_check(self) -> Dict[str, Any]:
+    async def probe_ollama(self) -> bool:
+        """True if Ollama answers and has at least one model."""
+        models = await self.ollama.list_models()
+        return len(models) > 0
+    
+    async def probe_n8n(self) -> bool:
+        """True if the n8n REST API answers."""
+        async with httpx.AsyncClient(timeout=3) as client:
+            response = await client.get(f"{self.config.n8n_url}/rest/login")
+        return response.status_code in [200, 401]
+    
+    async def health_check(self) -> Dict[str, Any]:
         """Check health of all local AI stack components."""
         health_status = {
             "ollama": False,
@@ -700,19 +1552,11 @@ Please provide a comprehensive troubleshooting analysis with specific solutions.
             "overall": False
         }
         
-        # Check Ollama
-        try:
-            models = self.ollama.list_models()
-            health_status["ollama"] = len(models) > 0
-        except:
-            pass
-        
-        # Check n8n
-        try:
-            response = requests.get(f"{self.config.n8n_url}/rest/login", timeout=3)
-            health_status["n8n"] = response.status_code in [200, 401]
-        except:
-            pass
+        ollama_ok, n8n_ok = await asyncio.gather(
+            self.probe_ollama(), self.probe_n8n(), return_exceptions=True
+        )
+        health_status["ollama"] = ollama_ok is True
+        health_status["n8n"] = n8n_ok is True
         
         health_status["overall"] = all([
             health_status["ollama"],
@@ -720,100 +1564,19 @@ Please provide a comprehensive troubleshooting analysis with specific solutions.
         ])
         
         return health_status
-    
-    def _format_tool_recommendations(self, raw_response: str, request_data: Dict[str, Any]) -> str:
-        """Format the raw LLM response into exactly 2 comprehensive tool recommendations."""
-        
-        # Extract tool names from the response (simple heuristic)
-        lines = raw_response.split('\n')
-        tool_names = []
-        
-        # Look for tool names in common patterns
-        for line in lines:
-            line = line.strip()
-            if any(pattern in line.lower() for pattern in ['primer', 'blast', 'oligo', 'pcr', 'design']):
-                if any(marker in line for marker in ['**', '##', '1.', '2.', '*']):
-                    # Extract tool name
-                    clean_name = line.replace('*', '').replace('#', '').replace('1.', '').replace('2.', '').strip()
-                    if clean_name and len(clean_name) < 50:  # Reasonable tool name length
-                        tool_names.append(clean_name)
-        
-        # Take first 2 unique tool names
-        unique_tools = []
-        for tool in tool_names:
-            if tool not in unique_tools and len(unique_tools) < 2:
-                unique_tools.append(tool)
-        
-        # If we don't have 2 tools, use defaults
-        if len(unique_tools) < 2:
-            if request_data.get("technique_type", "").lower() == "primer design":
-                unique_tools = ["Primer3", "NCBI Primer-BLAST"]
-            else:
-                unique_tools = ["Tool Option 1", "Tool Option 2"]
-        
-        # Generate formatted response
-        formatted_response = f"""# Tool Recommendation #1: {unique_tools[0]}
-
-## Overview
-{unique_tools[0]} is a highly recommended tool for {request_data.get('technique_type', 'computational analysis')}. It provides comprehensive functionality for {request_data.get('computational_goal', 'your research needs')} with excellent support for {request_data.get('data_type', 'various data formats')}.
-
-## Beginner Installation Guide
-1. **System Requirements**: Windows/Mac/Linux, 4GB RAM minimum
-2. **Download**: Visit the official website or repository
-3. **Installation**: Follow standard installation procedures for your OS
-4. **Initial Setup**: Configure basic settings and verify installation
-
-## Pricing
-- **Cost**: Free (open source) / Check official website for current pricing
-- **Academic Discounts**: Often available for educational institutions
-- **Free Alternatives**: Community versions typically available
-
-## Usage Example
-```
-# Basic usage example for {request_data.get('technique_type', 'analysis')}
-1. Load your {request_data.get('data_type', 'data file')}
-2. Configure analysis parameters
-3. Run the analysis
-4. Review and export results
-```
-
-## Alternatives
-- **Alternative 1**: Similar functionality with different interface options
-- **Alternative 2**: Commercial alternative with additional features
-
-# Tool Recommendation #2: {unique_tools[1]}
-
-## Overview
-{unique_tools[1]} serves as an excellent secondary option for {request_data.get('technique_type', 'computational analysis')}. It offers complementary features and may be preferred for specific use cases or workflow requirements.
-
-## Beginner Installation Guide
-1. **System Requirements**: Standard computer with internet access
-2. **Download**: Available through official channels
-3. **Installation**: User-friendly installation process
-4. **Initial Setup**: Quick setup wizard for new users
-
-## Pricing
-- **Cost**: Varies (check official website for current pricing)
-- **Academic Discounts**: Educational pricing often available
-- **Free Trial**: Many tools offer trial periods
 
-## Usage Example
-```
-# Step-by-step workflow for {request_data.get('technique_type', 'analysis')}
-1. Import {request_data.get('data_type', 'your data')}
-2. Select appropriate analysis method
-3. Adjust parameters as needed
-4. Execute analysis and interpret results
-```
+_local_ai_service: Optional[LocalAIService] = None
 
-## Alternatives
-- **Alternative 1**: Open-source option with community support
-- **Alternative 2**: Enterprise solution with professional support
 
----
-*Note: Pricing and availability may change. Please check official websites for the most current information.*"""
-
-        return formatted_response
-
-# Global instance for use in FastAPI endpoints
-local_ai_service = LocalAIService()
+def get_local_ai_service() -> LocalAIService:
+    """
+    Shared LocalAIService for standalone scripts, created on first use.
+    
+    The backend builds its own instance from its settings; creating one at
+    import time would open a second search cache and connection pools that
+    nothing closes.
+    """
+    global _local_ai_service
+    if _local_ai_service is None:
+        _local_ai_service = LocalAIService()
+    return _local_ai_service
@@ -76,14 +76,14 @@ class LocalAIStarter:
                 
                 if any(model in name for name in model_names):
                     print(f"  ✅ Model {model} already available")
-                    return True
+                    return self.preload_ollama_model(model)
                 else:
                     print(f"  📥 Pulling model {model}...")
                     result = subprocess.run(["ollama", "pull", model], 
                                           capture_output=True, text=True)
                     if result.returncode == 0:
                         print(f"  ✅ Model {model} pulled successfully")
-                        return True
+                        return self.preload_ollama_model(model)
                     else:
                         print(f"  ❌ Failed to pull model: {result.stderr}")
                         return False
@@ -91,6 +91,25 @@ class LocalAIStarter:
             print(f"  ❌ Model check failed: {e}")
             return False
     
+    def preload_ollama_model(self, model="llama3:8b", keep_alive="30m"):
+        """Load the model into memory so the first request doesn't pay for it."""
+        print(f"  🔥 Preloading model {model} (keep_alive={keep_alive})...")
+        
+        try:
+            started = time.time()
+            response = requests.post(
+                "http://localhost:11434/api/generate",
+                json={"model": model, "prompt": "", "stream": False, "keep_alive": keep_alive},
+                timeout=300
+            )
+            response.raise_for_status()
+            load_seconds = response.json().get("load_duration", 0) / 1e9
+            print(f"  ✅ Model {model} loaded in {load_seconds or time.time() - started:.1f}s")
+        except Exception as e:
+            # The model is still usable, it will just load on first request
+            print(f"  ⚠️ Could not preload model: {e}")
+        return True
+    
     def start_langflow(self):
         """Start Langflow server."""
         print("🌊 Starting Langflow server...")